@@ -59,6 +59,7 @@ class FsConstants(AppConstants):
     WINDOW_TITLE_FILE_GENERATOR = "文件批量生成"
     WINDOW_TITLE_FILE_COMPARATOR = "文件比较"
     WINDOW_TITLE_FILE_ENCRYPTOR = "文件批量加密"
+    WINDOW_TITLE_DUPLICATE_FINDER = "重复文件查找"
     WINDOW_TITLE_CREATE_FOLDER = "创建文件夹"
     WINDOW_TITLE_MOVE_FILE = "移动文件"
     WINDOW_TITLE_HASH_CALCULATOR = "HASH校验"
@@ -164,12 +165,17 @@ class FsConstants(AppConstants):
     APP_SQLITE_PATH_KEY = "sqlite.path"
     APP_FLASK_CHECKED_KEY = "flask.checked"
     APP_ICON_FONT_BOLD_CHECKED_KEY = "icon.font.bold.checked"
+    # 哈希读取方式与块大小(MB)，按机器测速后选择
+    APP_HASH_IO_MODE_KEY = "hash.io_mode"
+    APP_HASH_BLOCK_SIZE_KEY = "hash.block_size"
 
     # 默认值
     NEW_CONFIG = {
         APP_SQLITE_PATH_KEY: "",
         APP_FLASK_CHECKED_KEY: False,
         APP_ICON_FONT_BOLD_CHECKED_KEY: False,
+        APP_HASH_IO_MODE_KEY: "readinto",
+        APP_HASH_BLOCK_SIZE_KEY: 4,
     }
     AppConstants.DEFAULT_CONFIG = {**AppConstants.DEFAULT_CONFIG, **NEW_CONFIG}
     # 类型映射
@@ -177,6 +183,8 @@ class FsConstants(AppConstants):
         APP_FLASK_CHECKED_KEY: bool,
         APP_ICON_FONT_BOLD_CHECKED_KEY: bool,
         APP_SQLITE_PATH_KEY: str,
+        APP_HASH_IO_MODE_KEY: str,
+        APP_HASH_BLOCK_SIZE_KEY: int,
     }
     AppConstants.CONFIG_TYPES = {**AppConstants.CONFIG_TYPES, **NEW_CONFIG_TYPES}
     ################### INI设置 #####################
\ No newline at end of file
@@ -0,0 +1,445 @@
+import os
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PySide6.QtCore import Qt, Signal, QThread
+from PySide6.QtGui import QIcon
+from PySide6.QtWidgets import (
+    QApplication, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QFileDialog, QLineEdit, QCheckBox, QSpinBox,
+    QTreeWidget, QTreeWidgetItem, QMessageBox
+)
+from fs_base.message_util import MessageUtil
+from fs_base.widget import CustomProgressBar
+from loguru import logger
+
+from src.const.font_constants import FontConstants
+from src.const.fs_constants import FsConstants
+from src.util.common_util import CommonUtil
+from src.util.hash_cache import HashCache
+from src.util.hash_util import HashUtil, hash_file_worker, IO_MODE_READINTO, DEFAULT_BLOCK_SIZE, QUICK_HASH_NAME
+from src.widget.sub_window_widget import SubWindowWidget
+
+
+class DuplicateFinderThread(QThread):
+    progress_signal = Signal(int)  # 用于更新进度条
+    status_signal = Signal(str)  # 当前阶段
+    finished_signal = Signal(list, object)  # 重复文件组 [(大小, 摘要, [(路径, 修改时间ns)])]，统计信息
+    error_signal = Signal(str)  # 进程池或读取缓存失败，未能完成
+
+    def __init__(self, roots, workers, min_size=1, hash_cache=None, trust_cache=True,
+                 io_mode=IO_MODE_READINTO, block_size=DEFAULT_BLOCK_SIZE):
+        super().__init__()
+        self.roots = roots
+        self.workers = workers
+        self.min_size = max(1, min_size)
+        self.hash_cache = hash_cache
+        self.trust_cache = trust_cache
+        self.io_mode = io_mode
+        self.block_size = block_size
+        self.error_count = 0
+
+    def iter_files(self):
+        """遍历所有根目录下的普通文件，不跟随符号链接，生成 (路径, stat)"""
+        stack = list(reversed(self.roots))
+        while stack:
+            if self.isInterruptionRequested():
+                return
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            elif entry.is_file(follow_symlinks=False):
+                                yield entry.path, entry.stat(follow_symlinks=False)
+                        except OSError as e:
+                            logger.warning(f"读取文件信息失败：{entry.path}，{str(e)}")
+            except OSError as e:
+                logger.warning(f"读取目录失败：{directory}，{str(e)}")
+
+    def run(self):
+        try:
+            stats = {"files": 0, "candidates": 0, "already_linked": 0}
+
+            # 第一遍：只把文件大小记入紧凑数组，每个文件 8 字节
+            self.status_signal.emit("正在统计文件大小...")
+            sizes = array("q")
+            for _, stat in self.iter_files():
+                if stat.st_size >= self.min_size:
+                    sizes.append(stat.st_size)
+            stats["files"] = len(sizes)
+            if self.isInterruptionRequested():
+                self.finished_signal.emit([], stats)
+                return
+            values, counts = np.unique(np.frombuffer(sizes, dtype=np.int64), return_counts=True)
+            candidate_sizes = set(values[counts > 1].tolist())
+            del sizes, values, counts
+
+            # 第二遍：只为大小重复的文件记录路径，同一文件的多个硬链接只保留一个
+            self.status_signal.emit("正在收集大小相同的文件...")
+            buckets = {}
+            seen_inodes = set()
+            for path, stat in self.iter_files():
+                if stat.st_size not in candidate_sizes:
+                    continue
+                if stat.st_ino and stat.st_nlink > 1:
+                    inode = (stat.st_dev, stat.st_ino)
+                    if inode in seen_inodes:
+                        stats["already_linked"] += 1
+                        continue
+                    seen_inodes.add(inode)
+                buckets.setdefault(stat.st_size, []).append((path, stat.st_mtime_ns))
+            del candidate_sizes, seen_inodes
+            groups = [(size, "", entries) for size, entries in buckets.items() if len(entries) > 1]
+            del buckets
+            stats["candidates"] = sum(len(entries) for _, _, entries in groups)
+
+            # 第三遍：快速指纹只读头尾和少量采样，排除大部分大小相同但内容不同的文件
+            self.status_signal.emit("正在计算快速指纹...")
+            groups = self.refine(groups, QUICK_HASH_NAME)
+
+            # 第四遍：完整哈希，快速指纹已覆盖全部内容的小文件无需再读
+            self.status_signal.emit("正在计算完整哈希...")
+            sampled = [group for group in groups if HashUtil.is_fully_sampled(group[0])]
+            groups = sampled + self.refine([group for group in groups if not HashUtil.is_fully_sampled(group[0])],
+                                           "SHA256")
+
+            groups.sort(key=lambda group: group[0] * (len(group[2]) - 1), reverse=True)
+            stats["groups"] = len(groups)
+            stats["duplicates"] = sum(len(entries) - 1 for _, _, entries in groups)
+            stats["reclaimable"] = sum(size * (len(entries) - 1) for size, _, entries in groups)
+            stats["errors"] = self.error_count
+            stats["interrupted"] = self.isInterruptionRequested()
+            self.finished_signal.emit(groups, stats)
+        except Exception as e:
+            logger.error(f"查找重复文件失败：{str(e)}")
+            self.error_signal.emit(str(e))
+
+
+    def refine(self, groups, hash_type):
+        """
+        对每组文件计算摘要并按摘要重新分组，只保留仍有两个以上文件的组。
+        先查哈希缓存，未命中的文件交给进程池
+        :param groups: [(大小, 上一阶段摘要, [(路径, 修改时间ns)])]
+        :return: 同样结构的新分组
+        """
+        entries = {path: (size, mtime_ns) for size, _, group in groups for path, mtime_ns in group}
+        if not entries or self.isInterruptionRequested():
+            return []
+        digests = {}
+        cache_keys = {}
+
+        def iter_jobs():
+            for path in entries:
+                if self.isInterruptionRequested():
+                    return
+                if self.hash_cache:
+                    try:
+                        cache_keys[path] = HashCache.file_key(path)
+                    except OSError as e:
+                        logger.warning(f"读取文件信息失败：{path}，{str(e)}")
+                        continue
+                    cached = self.hash_cache.lookup(cache_keys[path], [hash_type]) if self.trust_cache else {}
+                    if cached:
+                        digests[path] = cached[hash_type]
+                        continue
+                yield path, [hash_type], self.io_mode, self.block_size
+
+        total = len(entries)
+        last_progress = -1
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            results = HashUtil.imap_unordered(executor, hash_file_worker, iter_jobs(), self.workers)
+            for file_path, hashes, error in results:
+                if error:
+                    self.error_count += 1
+                    logger.warning(f"计算哈希失败：{file_path}，{error}")
+                    continue
+                digests[file_path] = hashes[hash_type]
+                if self.hash_cache and file_path in cache_keys:
+                    self.hash_cache.store(cache_keys[file_path], hashes)
+                progress = int(len(digests) / total * 100)
+                if progress != last_progress:
+                    last_progress = progress
+                    self.progress_signal.emit(progress)
+        if self.isInterruptionRequested():
+            return []
+
+        regrouped = {}
+        for path, digest in digests.items():
+            size, mtime_ns = entries[path]
+            regrouped.setdefault((size, digest), []).append((path, mtime_ns))
+        return [(size, digest, sorted(group)) for (size, digest), group in regrouped.items() if len(group) > 1]
+
+
+class HardlinkThread(QThread):
+    progress_signal = Signal(int)
+    finished_signal = Signal(object)  # 统计信息 {"linked", "freed", "skipped", "errors": [...]}
+    error_signal = Signal(str)
+
+    TEMP_SUFFIX = ".fslink.tmp"
+
+    def __init__(self, groups):
+        super().__init__()
+        self.groups = groups
+
+    def run(self):
+        """
+        每组保留第一个文件，其余文件替换为指向它的硬链接。
+        先在同目录创建临时硬链接再原子替换，任何一步失败时原文件保持不变；
+        查找后被修改过的文件跳过
+        """
+        try:
+            result = {"linked": 0, "freed": 0, "skipped": 0, "errors": []}
+            total = sum(len(entries) - 1 for _, _, entries in self.groups)
+            done = 0
+            for size, _, entries in self.groups:
+                original, original_mtime = entries[0]
+                for path, mtime_ns in entries[1:]:
+                    done += 1
+                    self.progress_signal.emit(int(done / total * 100))
+                    try:
+                        original_stat = os.stat(original)
+                        stat = os.stat(path)
+                        if (original_stat.st_size, original_stat.st_mtime_ns) != (size, original_mtime) or \
+                                (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                            result["skipped"] += 1
+                            result["errors"].append(f"{path}: 查找后文件已被修改，已跳过")
+                            continue
+                        if os.path.samefile(original, path):
+                            continue
+                        temp_path = path + self.TEMP_SUFFIX
+                        os.link(original, temp_path)
+                        try:
+                            os.replace(temp_path, path)
+                        except OSError:
+                            os.remove(temp_path)
+                            raise
+                        result["linked"] += 1
+                        result["freed"] += size
+                    except OSError as e:
+                        result["errors"].append(f"{path}: {str(e)}")
+                        logger.warning(f"替换为硬链接失败：{path}，{str(e)}")
+            self.finished_signal.emit(result)
+        except Exception as e:
+            logger.error(f"替换为硬链接失败：{str(e)}")
+            self.error_signal.emit(str(e))
+
+
+class DuplicateFinderApp(SubWindowWidget):
+    # 界面最多显示的重复组数量，硬链接替换仍处理全部分组
+    MAX_DISPLAYED_GROUPS = 5000
+
+    def __init__(self):
+        super().__init__()
+        self.hash_cache = None
+        self.groups = []
+        self.init_ui()
+
+    def init_ui(self):
+        logger.info(f"---- 初始化{FsConstants.WINDOW_TITLE_DUPLICATE_FINDER} ----")
+
+        self.setWindowTitle(FsConstants.WINDOW_TITLE_DUPLICATE_FINDER)
+        self.setWindowIcon(QIcon(CommonUtil.get_ico_full_path()))
+
+        layout = QVBoxLayout()
+        title_label = QLabel("重复文件查找")
+        title_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        title_label.setObjectName("app_title")
+        layout.addWidget(title_label)
+
+        description_label = QLabel("按文件大小分组后依次比较快速指纹和完整哈希，多个目录用 ; 分隔")
+        description_label.setFont(FontConstants.ITALIC_SMALL)
+        layout.addWidget(description_label)
+
+        path_layout = QHBoxLayout()
+        self.path_entry = QLineEdit()
+        self.path_entry.setPlaceholderText("选择一个或多个目录")
+        path_layout.addWidget(self.path_entry)
+        add_button = QPushButton("添加目录")
+        add_button.setObjectName("browse_button")
+        add_button.clicked.connect(self.add_directory)
+        path_layout.addWidget(add_button)
+        layout.addLayout(path_layout)
+
+        option_layout = QHBoxLayout()
+        option_layout.addWidget(QLabel("最小文件(KB):"))
+        self.min_size_spinbox = QSpinBox()
+        self.min_size_spinbox.setRange(0, 1024 * 1024)
+        self.min_size_spinbox.setValue(1)
+        option_layout.addWidget(self.min_size_spinbox)
+        option_layout.addWidget(QLabel("并行进程数:"))
+        self.worker_spinbox = QSpinBox()
+        self.worker_spinbox.setRange(1, 64)
+        self.worker_spinbox.setValue(os.cpu_count() or 1)
+        option_layout.addWidget(self.worker_spinbox)
+        self.trust_cache_checkbox = QCheckBox("信任哈希缓存")
+        self.trust_cache_checkbox.setChecked(True)
+        option_layout.addWidget(self.trust_cache_checkbox)
+        option_layout.addStretch()
+        layout.addLayout(option_layout)
+
+        button_layout = QHBoxLayout()
+        self.find_button = QPushButton("开始查找")
+        self.find_button.clicked.connect(self.start_find)
+        button_layout.addWidget(self.find_button)
+        self.stop_button = QPushButton("停止")
+        self.stop_button.setEnabled(False)
+        self.stop_button.clicked.connect(self.stop_find)
+        button_layout.addWidget(self.stop_button)
+        self.hardlink_button = QPushButton("替换为硬链接")
+        self.hardlink_button.setEnabled(False)
+        self.hardlink_button.clicked.connect(self.replace_with_hardlinks)
+        button_layout.addWidget(self.hardlink_button)
+        layout.addLayout(button_layout)
+
+        self.progress_bar = CustomProgressBar()
+        self.progress_bar.hide()
+        layout.addWidget(self.progress_bar)
+
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+
+        self.result_tree = QTreeWidget()
+        self.result_tree.setHeaderLabels(["文件", "大小"])
+        self.result_tree.setUniformRowHeights(True)
+        self.result_tree.setColumnWidth(0, 420)
+        layout.addWidget(self.result_tree)
+        self.setLayout(layout)
+
+    def add_directory(self):
+        directory = QFileDialog.getExistingDirectory(self, "选择目录")
+        if directory:
+            paths = self.get_selected_paths()
+            if directory not in paths:
+                self.path_entry.setText(";".join(paths + [directory]))
+
+    def get_selected_paths(self):
+        """解析输入框中的一个或多个目录"""
+        return [path.strip() for path in self.path_entry.text().split(";") if path.strip()]
+
+    def start_find(self):
+        roots = self.get_selected_paths()
+        if not roots:
+            MessageUtil.show_warning_message("请先选择目录！")
+            return
+        invalid_paths = [path for path in roots if not os.path.isdir(path)]
+        if invalid_paths:
+            MessageUtil.show_warning_message(f"目录不存在：{invalid_paths[0]}")
+            return
+
+        if self.hash_cache is None:
+            self.hash_cache = HashCache()
+        self.hash_cache.reset_stats()
+        io_mode, block_size = CommonUtil.get_hash_io_config()
+        self.groups = []
+        self.result_tree.clear()
+        self.thread = DuplicateFinderThread(roots, self.worker_spinbox.value(), self.min_size_spinbox.value() * 1024,
+                                            self.hash_cache, self.trust_cache_checkbox.isChecked(),
+                                            io_mode, block_size)
+        self.thread.progress_signal.connect(self.progress_bar.update_progress)
+        self.thread.status_signal.connect(self.status_label.setText)
+        self.thread.finished_signal.connect(self.find_finished)
+        self.thread.error_signal.connect(self.find_error)
+        self.find_button.setEnabled(False)
+        self.hardlink_button.setEnabled(False)
+        self.stop_button.setEnabled(True)
+        self.progress_bar.show()
+        self.thread.start()
+
+    def stop_find(self):
+        self.stop_button.setEnabled(False)
+        self.thread.requestInterruption()
+
+    def find_error(self, error_msg):
+        self.groups = []
+        self.find_button.setEnabled(True)
+        self.stop_button.setEnabled(False)
+        self.progress_bar.hide()
+        self.status_label.setText(f"查找失败: {error_msg}")
+        MessageUtil.show_error_message(f"查找重复文件失败：{error_msg}")
+
+    def find_finished(self, groups, stats):
+        self.groups = groups
+        self.find_button.setEnabled(True)
+        self.stop_button.setEnabled(False)
+        self.progress_bar.hide()
+        if stats.get("interrupted", True):
+            self.groups = []
+            self.status_label.setText("查找已停止")
+            return
+
+        self.result_tree.setUpdatesEnabled(False)
+        for size, _, entries in groups[:self.MAX_DISPLAYED_GROUPS]:
+            group_item = QTreeWidgetItem([
+                f"{len(entries)} 个相同文件，可释放 {CommonUtil.format_size(size * (len(entries) - 1))}",
+                CommonUtil.format_size(size)])
+            for path, _ in entries:
+                group_item.addChild(QTreeWidgetItem([path, ""]))
+            self.result_tree.addTopLevelItem(group_item)
+        self.result_tree.setUpdatesEnabled(True)
+
+        summary = (f"扫描 {stats['files']} 个文件，{stats['candidates']} 个大小重复，"
+                   f"找到 {stats['groups']} 组重复（{stats['duplicates']} 个多余文件），"
+                   f"可释放 {CommonUtil.format_size(stats['reclaimable'])}")
+        if stats["already_linked"]:
+            summary += f"\n已是硬链接而跳过: {stats['already_linked']} 个"
+        if stats["errors"]:
+            summary += f"\n读取失败: {stats['errors']} 个，详见日志"
+        if len(groups) > self.MAX_DISPLAYED_GROUPS:
+            summary += f"\n只显示可释放空间最大的 {self.MAX_DISPLAYED_GROUPS} 组"
+        summary += f"\n{self.hash_cache.stats_text()}"
+        self.status_label.setText(summary)
+        self.hardlink_button.setEnabled(bool(groups))
+
+    def replace_with_hardlinks(self):
+        """确认后把每组的多余文件替换为指向第一个文件的硬链接"""
+        if not self.groups:
+            return
+        duplicates = sum(len(entries) - 1 for _, _, entries in self.groups)
+        reclaimable = sum(size * (len(entries) - 1) for size, _, entries in self.groups)
+        answer = QMessageBox.question(
+            self, "替换为硬链接",
+            f"将把 {duplicates} 个重复文件替换为硬链接，预计释放 {CommonUtil.format_size(reclaimable)}。\n"
+            f"替换后同组文件共享同一份内容，修改任意一个会影响其他文件，是否继续？")
+        if answer != QMessageBox.StandardButton.Yes:
+            return
+
+        self.hardlink_thread = HardlinkThread(self.groups)
+        self.hardlink_thread.progress_signal.connect(self.progress_bar.update_progress)
+        self.hardlink_thread.finished_signal.connect(self.hardlink_finished)
+        self.hardlink_thread.error_signal.connect(self.hardlink_error)
+        self.find_button.setEnabled(False)
+        self.hardlink_button.setEnabled(False)
+        self.progress_bar.show()
+        self.hardlink_thread.start()
+
+    def hardlink_error(self, error_msg):
+        self.groups = []
+        self.find_button.setEnabled(True)
+        self.progress_bar.hide()
+        self.status_label.setText(f"替换失败: {error_msg}")
+        MessageUtil.show_error_message(f"替换为硬链接失败：{error_msg}")
+
+    def hardlink_finished(self, result):
+        self.groups = []
+        self.find_button.setEnabled(True)
+        self.progress_bar.hide()
+        summary = f"已替换 {result['linked']} 个文件，释放 {CommonUtil.format_size(result['freed'])}"
+        if result["skipped"]:
+            summary += f"，跳过已修改的文件 {result['skipped']} 个"
+        self.status_label.setText(summary)
+        if result["errors"]:
+            MessageUtil.show_message("提示", f"{summary}\n部分文件未能替换", message_type="warning",
+                                     details="\n".join(result["errors"]))
+        else:
+            MessageUtil.show_success_message(summary)
+
+
+if __name__ == "__main__":
+    app = QApplication(sys.argv)
+    window = DuplicateFinderApp()
+    window.show()
+    sys.exit(app.exec())
@@ -1,140 +1,577 @@
-import hashlib
+import mmap
 import os
+import sqlite3
 import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
 
-from PySide6.QtCore import Qt, Signal, QThread
+from PySide6.QtCore import (
+    Qt, Signal, QThread, QAbstractTableModel, QModelIndex, QSortFilterProxyModel, QRegularExpression
+)
 from PySide6.QtGui import QIcon
 from PySide6.QtWidgets import (
     QApplication, QVBoxLayout, QHBoxLayout, QPushButton, QFileDialog, QLabel, QWidget, QComboBox,
-    QTextEdit
+    QCheckBox, QSpinBox, QTableView, QHeaderView, QAbstractItemView
 )
 from fs_base.message_util import MessageUtil
 from fs_base.widget import CustomProgressBar
 from loguru import logger
 
-from src.const.color_constants import BLUE, BLACK
+from src.const.color_constants import BLUE, BLACK, RED, ORANGE
 from src.const.font_constants import FontConstants
 from src.const.fs_constants import FsConstants
 from src.util.common_util import CommonUtil
+from src.util.delta_util import DeltaUtil
+from src.util.dir_snapshot import DirSnapshot, SNAPSHOT_SUFFIX
+from src.util.hash_cache import HashCache
+from src.util.hash_util import HashUtil, IO_MODE_MMAP, IO_MODE_READINTO, DEFAULT_BLOCK_SIZE, hash_files_worker
 from src.widget.sub_window_widget import SubWindowWidget
 
 
+STATUS_SAME = "相同"
+STATUS_DIFF = "不同"
+STATUS_SOURCE_ONLY = "仅源目录存在"
+STATUS_TARGET_ONLY = "仅目标目录存在"
+STATUSES = [STATUS_SAME, STATUS_DIFF, STATUS_SOURCE_ONLY, STATUS_TARGET_ONLY]
+
+
+class CompareResultModel(QAbstractTableModel):
+    """
+    比较结果表格模型，每行为 (相对路径, 状态, 说明)
+    结果按批追加，配合 QTableView 只渲染可见行，几十万行时界面仍能保持响应
+    """
+    HEADERS = ["文件", "状态", "说明"]
+    STATUS_COLORS = {STATUS_SAME: BLACK, STATUS_DIFF: RED, STATUS_SOURCE_ONLY: BLUE, STATUS_TARGET_ONLY: ORANGE}
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.records = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.records)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        record = self.records[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return record[index.column()]
+        if role == Qt.ItemDataRole.ForegroundRole and index.column() == 1:
+            return self.STATUS_COLORS.get(record[1])
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def append_records(self, records):
+        """追加一批结果"""
+        if not records:
+            return
+        first = len(self.records)
+        self.beginInsertRows(QModelIndex(), first, first + len(records) - 1)
+        self.records.extend(records)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.records = []
+        self.endResetModel()
+
+
 class CompareThread(QThread):
     progress_signal = Signal(int)     # 更新进度信号
 
-    update_signal = Signal(str)
+    update_signal = Signal(str)       # 状态提示
+    records_signal = Signal(list)     # 一批比较结果 [(相对路径, 状态, 说明)]
     break_signal = Signal(str)
-    done_signal = Signal(int, int)  # 返回比较结果，(相同文件数量, 不同文件数量)
-
-    def __init__(self, source_directory, target_directory, method):
+    done_signal = Signal(int, int, int, int)  # 返回比较结果，(相同文件数量, 不同文件数量, 仅源目录存在, 仅目标目录存在)
+
+    # 结果按批次发送，避免每个文件都刷新一次界面
+    FLUSH_COUNT = 1000
+    FLUSH_INTERVAL = 0.2
+    # 同一设备上同时读取的文件数上限
+    DEVICE_LIMIT = 4
+    # 已完成但还不能按顺序输出的结果上限，避免慢文件阻塞时缓冲无限增长
+    REORDER_LIMIT = 10000
+    # 块级差异分析的结果说明中最多列出的差异区间数
+    DELTA_SHOWN_RANGES = 5
+
+    def __init__(self, source_directory, target_directory, method, hash_cache=None, trust_cache=True,
+                 io_mode=IO_MODE_READINTO, block_size=DEFAULT_BLOCK_SIZE, recursive=True,
+                 workers=None, device_limit=DEVICE_LIMIT):
         super().__init__()
         self.source_directory = source_directory
         self.target_directory = target_directory
         self.method = method
+        self.hash_cache = hash_cache
+        self.trust_cache = trust_cache
+        self.io_mode = io_mode
+        self.block_size = block_size
+        self.recursive = recursive
+        # 任意一侧是快照时按快照记录比较，不使用所选的比较方法
+        self.snapshot_mode = False
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.device_limit = max(1, device_limit)
+
+    @staticmethod
+    def scan_directory(root, recursive=True):
+        """
+        遍历目录，直接使用 scandir 返回的 DirEntry 获取文件大小，不再逐个调用 getsize
+        :param root: 根目录
+        :param recursive: 是否包含子目录
+        :return: {相对路径: (文件大小, 修改时间ns)}
+        """
+        files = {}
+        stack = [(root, "")]
+        while stack:
+            directory, prefix = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        rel_path = prefix + entry.name
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if recursive:
+                                    stack.append((entry.path, rel_path + os.sep))
+                            elif entry.is_file(follow_symlinks=False):
+                                stat = entry.stat(follow_symlinks=False)
+                                files[rel_path] = (stat.st_size, stat.st_mtime_ns)
+                        except OSError as e:
+                            logger.warning(f"读取文件信息失败：{entry.path}，{str(e)}")
+            except OSError as e:
+                logger.warning(f"读取目录失败：{directory}，{str(e)}")
+        return files
+
+    def load_side(self, path):
+        """
+        读取一侧的文件列表：快照文件直接读取记录，目录则实时遍历；不递归时快照也只保留根目录下的文件
+        :return: {相对路径: (大小, 修改时间ns)}，快照记录额外带摘要 (大小, 修改时间ns, 摘要或 None)
+        """
+        if DirSnapshot.is_snapshot(path):
+            self.snapshot_mode = True
+            snapshot = DirSnapshot(path)
+            try:
+                files = snapshot.load()
+            finally:
+                snapshot.close_connection()
+            if not self.recursive:
+                files = {rel_path: record for rel_path, record in files.items() if os.sep not in rel_path}
+            return files
+        return self.scan_directory(path, self.recursive)
+
+    def snapshot_task(self, index, rel_path, file_paths, records):
+        """
+        有一侧是快照时的比较任务：两侧都有摘要时比较摘要；只有快照一侧有摘要时计算实时目录一侧的摘要；
+        都没有摘要时比较大小和修改时间
+        :param file_paths: (源文件路径, 目标文件路径)
+        :param records: 两侧的文件记录，见 load_side
+        """
+        sizes = (records[0][0], records[1][0])
+        digests = [record[2] if len(record) > 2 else None for record in records]
+        if sizes[0] != sizes[1]:
+            return index, rel_path, [], None, (), lambda result: (False, "文件大小不匹配")
+        if digests[0] and digests[1]:
+            same = digests[0] == digests[1]
+            return index, rel_path, [], None, (), lambda result: (same, "摘要相同" if same else "摘要不匹配")
+
+        live_sides = [side for side, record in enumerate(records) if len(record) == 2]
+        if any(digests) and live_sides:
+            side = live_sides[0]
+            expected = digests[1 - side]
+            device = self.source_device if side == 0 else self.target_device
+            return (index, rel_path, [device], self.file_sha256,
+                    (file_paths[side], self.hash_cache, self.trust_cache, self.io_mode, self.block_size),
+                    lambda digest: (digest == expected, "摘要相同" if digest == expected else "摘要不匹配"))
+
+        same = records[0][1] == records[1][1]
+        return index, rel_path, [], None, (), lambda result: (same, "大小和修改时间相同" if same else "修改时间不同")
+
+    def compare_file(self, source_file_path, target_file_path, sizes):
+        """
+        按所选方法比较一对文件
+        :param sizes: 扫描目录时得到的 (源文件大小, 目标文件大小)
+        :return: (是否相同, 结果说明)
+        """
+        if self.method == "文件大小比较":
+            same = sizes[0] == sizes[1]
+            return same, "文件大小相同" if same else "文件大小不匹配"
+
+        if self.method == "哈希算法比较":
+            same = sizes[0] == sizes[1] and self.compare_by_hash(
+                source_file_path, target_file_path, self.hash_cache, self.trust_cache, self.io_mode, self.block_size)
+            return same, "哈希值相同" if same else "哈希值不匹配"
+
+        if self.method == "逐字节比较":
+            same = self.compare_by_bytes(source_file_path, target_file_path, self.io_mode, self.block_size, sizes)
+            return same, "文件内容相同" if same else "文件内容不匹配"
+
+        if self.method == "快速指纹比较":
+            same = self.compare_by_quick_fingerprint(source_file_path, target_file_path, sizes)
+            return same, "快速指纹相同" if same else "快速指纹不匹配"
+
+        if self.method == "自动级联比较":
+            same, tier = self.compare_by_cascade(source_file_path, target_file_path, self.hash_cache,
+                                                 self.trust_cache, self.io_mode, self.block_size, sizes)
+            return same, f"文件内容相同（判定: {tier}）" if same else f"文件内容不匹配（判定: {tier}）"
+
+        if self.method == "块级差异分析":
+            return self.compare_by_delta(source_file_path, target_file_path, sizes)
+
+        same = self.compare_by_checksum(source_file_path, target_file_path, self.io_mode, self.block_size)
+        return same, "校验和相同" if same else "校验和不匹配"
+
+    def iter_tasks(self, common_files, source_files, target_files):
+        """
+        生成比较任务，哈希算法比较在父进程中先查缓存，只把需要计算的文件交给进程池
+        :return: 生成 (序号, 相对路径, 读取的设备列表, 任务函数, 参数, 结果处理函数)，
+                 任务函数为空时由结果处理函数直接给出结果
+        """
+        for index, rel_path in enumerate(common_files):
+            source_file_path = os.path.join(self.source_directory, rel_path)
+            target_file_path = os.path.join(self.target_directory, rel_path)
+            sizes = (source_files[rel_path][0], target_files[rel_path][0])
+
+            if self.snapshot_mode:
+                yield self.snapshot_task(index, rel_path, (source_file_path, target_file_path),
+                                         (source_files[rel_path], target_files[rel_path]))
+                continue
+
+            if self.method == "文件大小比较":
+                # 扫描时已取得文件大小，无需再提交任务
+                yield index, rel_path, [], None, (), lambda result, sizes=sizes: self.compare_file(None, None, sizes)
+                continue
+
+            if self.method != "哈希算法比较":
+                yield (index, rel_path, [self.source_device, self.target_device], self.compare_file,
+                       (source_file_path, target_file_path, sizes), lambda result: result)
+                continue
+
+            if sizes[0] != sizes[1]:
+                yield index, rel_path, [], None, (), lambda result: (False, "哈希值不匹配")
+                continue
+            digests = {}
+            cache_keys = {}
+            if self.hash_cache:
+                for file_path in (source_file_path, target_file_path):
+                    try:
+                        cache_keys[file_path] = HashCache.file_key(file_path)
+                    except OSError:
+                        continue
+                    cached = self.hash_cache.lookup(cache_keys[file_path], ["SHA256"]) if self.trust_cache else {}
+                    if cached:
+                        digests[file_path] = cached["SHA256"]
+            missing = [path for path in (source_file_path, target_file_path) if path not in digests]
+            devices = [self.source_device if path == source_file_path else self.target_device for path in missing]
+            yield (index, rel_path, devices, hash_files_worker if missing else None,
+                   (missing, ["SHA256"], self.io_mode, self.block_size),
+                   lambda results, digests=digests, cache_keys=cache_keys, pair=(source_file_path, target_file_path):
+                   self.finish_hash_pair(results, digests, cache_keys, pair))
+
+    def finish_hash_pair(self, results, digests, cache_keys, pair):
+        """合并进程池的计算结果与缓存中的摘要，并写回缓存"""
+        for file_path, hashes, error in results or []:
+            if error:
+                return False, f"读取失败: {error}"
+            digests[file_path] = hashes["SHA256"]
+            if self.hash_cache and file_path in cache_keys:
+                self.hash_cache.store(cache_keys[file_path], hashes)
+        same = digests[pair[0]] == digests[pair[1]]
+        return same, "哈希值相同" if same else "哈希值不匹配"
+
+    def iter_results(self, common_files, source_files, target_files):
+        """
+        并行比较文件：逐字节等读取密集的比较使用线程池，哈希算法比较使用进程池。
+        每个设备同时读取的文件数不超过 device_limit，因此两个目录位于不同磁盘时各自都能满速读取；
+        结果先放入重排缓冲区，再按 common_files 的顺序产出
+        :return: 生成 (相对路径, 是否相同, 结果说明)
+        """
+        use_processes = self.method == "哈希算法比较" and not self.snapshot_mode
+        executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        ready = {}
+        next_index = 0
+        in_flight = {}
+        device_load = Counter()
+        tasks = self.iter_tasks(common_files, source_files, target_files)
+        task = next(tasks, None)
+
+        with executor_class(max_workers=self.workers) as executor:
+            while task is not None or in_flight:
+                # 在并发数、设备读取数和重排缓冲区都允许时提交任务
+                while task is not None:
+                    index, rel_path, devices, func, args, finish = task
+                    # 不需要读取的任务也受重排缓冲区限制，否则前面有任务未完成时会缓冲整个任务流
+                    if in_flight and index - next_index >= self.REORDER_LIMIT:
+                        break
+                    if func is not None:
+                        if in_flight and (len(in_flight) >= self.workers
+                                          or any(device_load[device] + devices.count(device) > self.device_limit
+                                                 for device in devices)):
+                            break
+                        in_flight[executor.submit(func, *args)] = (index, rel_path, devices, finish)
+                        device_load.update(devices)
+                    else:
+                        ready[index] = (rel_path, *finish(None))
+                    task = next(tasks, None)
+                    # 只比较大小或全部跳过时没有在途任务，结果随时产出，进度和内存都不依赖任务总数
+                    while next_index in ready:
+                        yield ready.pop(next_index)
+                        next_index += 1
+
+                if in_flight:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        index, rel_path, devices, finish = in_flight.pop(future)
+                        device_load.subtract(devices)
+                        try:
+                            ready[index] = (rel_path, *finish(future.result()))
+                        except Exception as e:
+                            ready[index] = (rel_path, False, f"读取失败: {str(e)}")
+
+                while next_index in ready:
+                    yield ready.pop(next_index)
+                    next_index += 1
 
     def run(self):
         """执行文件比较"""
-        source_files = set(os.listdir(self.source_directory))
-        target_files = set(os.listdir(self.target_directory))
-        common_files = list(source_files.intersection(target_files))  # 转为列表以便索引
+        self.update_signal.emit("正在扫描目录...")
+        try:
+            self.source_device = os.stat(self.source_directory).st_dev
+            self.target_device = os.stat(self.target_directory).st_dev
+            source_files = self.load_side(self.source_directory)
+            target_files = self.load_side(self.target_directory)
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"读取比较目录失败：{str(e)}")
+            self.update_signal.emit(f"读取目录或快照失败：{str(e)}")
+            self.break_signal.emit(str(e))
+            return
+        common_files = sorted(source_files.keys() & target_files.keys())
+        source_only = sorted(source_files.keys() - target_files.keys())
+        target_only = sorted(target_files.keys() - source_files.keys())
         total_files = len(common_files)
 
-        if total_files == 0:
-            self.update_signal.emit("没有相同文件名的文件。")
-            self.break_signal.emit("没有相同文件名的文件。")
+        if not (common_files or source_only or target_only):
+            self.update_signal.emit("两个目录中都没有文件。")
+            self.break_signal.emit("两个目录中都没有文件。")
             return
         total_same_files = 0
         total_diff_files = 0
 
-        result = "文件比较结果:\n\n"
+        self.update_signal.emit(f"正在比较 {total_files} 个同名文件...")
+        records = []
+        last_flush = time.monotonic()
+
+        def flush(force=False):
+            nonlocal records, last_flush
+            now = time.monotonic()
+            if records and (force or len(records) >= self.FLUSH_COUNT or now - last_flush >= self.FLUSH_INTERVAL):
+                self.records_signal.emit(records)  # 逐批更新UI
+                records = []
+                last_flush = now
+                return True
+            return False
+
+        for rel_path in source_only:
+            records.append((rel_path, STATUS_SOURCE_ONLY, ""))
+            flush()
+        for rel_path in target_only:
+            records.append((rel_path, STATUS_TARGET_ONLY, ""))
+            flush()
+
+        for index, (rel_path, same, message) in enumerate(
+                self.iter_results(common_files, source_files, target_files)):
+            if same:
+                total_same_files += 1
+            else:
+                total_diff_files += 1
+            records.append((rel_path, STATUS_SAME if same else STATUS_DIFF, message))
+            if flush():
+                self.progress_signal.emit(int((index + 1) / total_files * 100))  # 通过信号更新进度
+
+        flush(force=True)
+        self.progress_signal.emit(100)
+        self.done_signal.emit(total_same_files, total_diff_files, len(source_only), len(target_only))
 
-        for index, file_name in enumerate(common_files):
-            source_file_path = os.path.join(self.source_directory, file_name)
-            target_file_path = os.path.join(self.target_directory, file_name)
-
-            result += f"正在比较文件: {file_name}"
-
-            if self.method == "文件大小比较":
-                if self.compare_by_size(source_file_path, target_file_path):
-                    total_same_files += 1
-                    result += "  文件大小相同\n"
-                else:
-                    total_diff_files += 1
-                    result += "  文件大小不匹配\n"
-
-            elif self.method == "哈希算法比较":
-                if self.compare_by_hash(source_file_path, target_file_path):
-                    total_same_files += 1
-                    result += "  哈希值相同\n"
-                else:
-                    total_diff_files += 1
-                    result += "  哈希值不匹配\n"
-
-            elif self.method == "逐字节比较":
-                if self.compare_by_bytes(source_file_path, target_file_path):
-                    total_same_files += 1
-                    result += "  文件内容相同\n"
-                else:
-                    total_diff_files += 1
-                    result += "  文件内容不匹配\n"
-
-            elif self.method == "校验和比较":
-                if self.compare_by_checksum(source_file_path, target_file_path):
-                    total_same_files += 1
-                    result += "  校验和相同\n"
-                else:
-                    total_diff_files += 1
-                    result += "  校验和不匹配\n"
-                    # 更新进度
-
-            self.update_signal.emit(result)  # 逐步更新UI
-            progress = int((index + 1) / total_files * 100)
-            self.progress_signal.emit(progress)  # 通过信号更新进度
-
-        self.done_signal.emit(total_same_files, total_diff_files)
     @staticmethod
     def compare_by_size(file1, file2):
         """通过文件大小比较"""
         return os.path.getsize(file1) == os.path.getsize(file2)
     @staticmethod
-    def compare_by_hash(file1, file2):
-        """通过哈希算法比较"""
-        def file_hash(file_path):
-            sha256_hash = hashlib.sha256()
-            with open(file_path, "rb") as f:
-                for byte_block in iter(lambda: f.read(4096), b""):
-                    sha256_hash.update(byte_block)
-            return sha256_hash.hexdigest()
-
-        return file_hash(file1) == file_hash(file2)
+    def compare_by_hash(file1, file2, hash_cache=None, trust_cache=True,
+                        io_mode=IO_MODE_READINTO, block_size=DEFAULT_BLOCK_SIZE):
+        """通过哈希算法比较，提供缓存时优先复用未变化文件的摘要"""
+        return CompareThread.file_sha256(file1, hash_cache, trust_cache, io_mode, block_size) == \
+            CompareThread.file_sha256(file2, hash_cache, trust_cache, io_mode, block_size)
+
+    @staticmethod
+    def file_sha256(file_path, hash_cache=None, trust_cache=True,
+                    io_mode=IO_MODE_READINTO, block_size=DEFAULT_BLOCK_SIZE):
+        """计算文件的 SHA256，提供缓存时优先复用未变化文件的摘要"""
+        if hash_cache:
+            cache_key = HashCache.file_key(file_path)
+            cached = hash_cache.lookup(cache_key, ["SHA256"]) if trust_cache else {}
+            if cached:
+                return cached["SHA256"]
+        hashes = HashUtil.hash_file(file_path, ["SHA256"], io_mode, block_size)
+        if hash_cache:
+            hash_cache.store(cache_key, hashes)
+        return hashes["SHA256"]
     @staticmethod
-    def compare_by_bytes(file1, file2):
+    def compare_by_cascade(file1, file2, hash_cache=None, trust_cache=True,
+                           io_mode=IO_MODE_READINTO, block_size=DEFAULT_BLOCK_SIZE, sizes=None):
+        """
+        自动级联比较：依次比较文件大小、快速指纹、完整内容，在第一个能证明不同的层级停止。
+        完整内容优先使用两侧都已缓存的摘要，否则逐字节比较，只读一遍且遇到差异立即停止
+        :param sizes: 已知的 (文件1大小, 文件2大小)，为空时重新读取
+        :return: (是否相同, 判定层级)
+        """
+        file_size, other_size = sizes or (os.path.getsize(file1), os.path.getsize(file2))
+        if file_size != other_size:
+            return False, "文件大小"
+        if file_size == 0:
+            return True, "文件大小"
+
+        if HashUtil.quick_fingerprint(file1) != HashUtil.quick_fingerprint(file2):
+            return False, "快速指纹"
+        if HashUtil.is_fully_sampled(file_size):
+            return True, "快速指纹"
+
+        if hash_cache and trust_cache:
+            cached1 = hash_cache.lookup(HashCache.file_key(file1), ["SHA256"])
+            cached2 = hash_cache.lookup(HashCache.file_key(file2), ["SHA256"]) if cached1 else {}
+            if cached2:
+                return cached1["SHA256"] == cached2["SHA256"], "哈希缓存"
+
+        return CompareThread.compare_by_bytes(file1, file2, io_mode, block_size, sizes), "逐字节"
+
+    @staticmethod
+    def compare_by_quick_fingerprint(file1, file2, sizes=None):
+        """通过快速指纹比较：只读取头尾和内部采样，不同即确定不同，相同则很可能相同"""
+        file_size, other_size = sizes or (os.path.getsize(file1), os.path.getsize(file2))
+        if file_size != other_size:
+            return False
+        return HashUtil.quick_fingerprint(file1) == HashUtil.quick_fingerprint(file2)
+
+    @staticmethod
+    def compare_by_bytes(file1, file2, io_mode=IO_MODE_READINTO, block_size=DEFAULT_BLOCK_SIZE, sizes=None):
         """逐字节比较"""
+        file_size, other_size = sizes or (os.path.getsize(file1), os.path.getsize(file2))
+        if file_size != other_size:
+            return False
         with open(file1, "rb") as f1, open(file2, "rb") as f2:
+            if io_mode == IO_MODE_MMAP:
+                file_size = os.fstat(f1.fileno()).st_size
+                if file_size == 0:
+                    return True
+                with mmap.mmap(f1.fileno(), 0, access=mmap.ACCESS_READ) as m1, \
+                        mmap.mmap(f2.fileno(), 0, access=mmap.ACCESS_READ) as m2:
+                    for offset in range(0, file_size, block_size):
+                        if m1[offset:offset + block_size] != m2[offset:offset + block_size]:
+                            return False
+                    return True
+
+            if io_mode == IO_MODE_READINTO:
+                # 直接比较两个完整的 bytearray 走 memcmp，只有最后一块需要切片
+                buffer1 = bytearray(block_size)
+                buffer2 = bytearray(block_size)
+                while True:
+                    length1 = f1.readinto(buffer1)
+                    length2 = f2.readinto(buffer2)
+                    if length1 != length2:
+                        return False
+                    if length1 == block_size:
+                        if buffer1 != buffer2:
+                            return False
+                        continue
+                    return buffer1[:length1] == buffer2[:length2]
+
             while True:
-                byte1 = f1.read(4096)
-                byte2 = f2.read(4096)
+                byte1 = f1.read(block_size)
+                byte2 = f2.read(block_size)
                 if byte1 != byte2:
                     return False
                 if not byte1:
                     return True
 
     @staticmethod
-    def compare_by_checksum(file1, file2):
-        """通过校验和比较"""
+    def compare_by_checksum(file1, file2, io_mode=IO_MODE_READINTO, block_size=DEFAULT_BLOCK_SIZE):
+        """通过 CRC32 校验和比较，结果与进程无关，可以和其他工具的 CRC32 对照"""
         def file_checksum(file_path):
-            checksum = 0
-            with open(file_path, "rb") as f:
-                while chunk := f.read(4096):
-                    checksum ^= hash(chunk)
-            return checksum
+            return HashUtil.hash_file(file_path, ["CRC32"], io_mode, block_size)["CRC32"]
 
         return file_checksum(file1) == file_checksum(file2)
 
+    @staticmethod
+    def compare_by_delta(file1, file2, sizes=None):
+        """
+        块级差异分析：报告目标文件中与源文件不同的字节区间以及匹配块的比例
+        :return: (是否相同, 结果说明)
+        """
+        file_size, other_size = sizes or (os.path.getsize(file1), os.path.getsize(file2))
+        delta = DeltaUtil.analyze(file1, file2)
+        if file_size == other_size and not delta["diff_ranges"]:
+            return True, "文件内容相同"
+        ranges = delta["diff_ranges"]
+        message = (f"差异 {len(ranges)} 处，共 {delta['diff_bytes']} 字节，"
+                   f"匹配块 {delta['match_percent']:.2f}%（块大小 {delta['block_size']}）")
+        if ranges:
+            shown = ", ".join(f"[{start}, {end})" for start, end in ranges[:CompareThread.DELTA_SHOWN_RANGES])
+            message += f"：{shown}"
+            if len(ranges) > CompareThread.DELTA_SHOWN_RANGES:
+                message += " ..."
+        elif file_size > other_size:
+            message += f"：目标文件缺少源文件末尾 {file_size - other_size} 字节"
+        return False, message
+
+
+class SnapshotThread(QThread):
+    progress_signal = Signal(int)
+    finished_signal = Signal(str)
+    error_signal = Signal(str)
+
+    def __init__(self, root_directory, snapshot_path, with_digest, trust_dir_mtime, workers,
+                 io_mode=IO_MODE_READINTO, block_size=DEFAULT_BLOCK_SIZE):
+        super().__init__()
+        self.root_directory = root_directory
+        self.snapshot_path = snapshot_path
+        self.with_digest = with_digest
+        self.trust_dir_mtime = trust_dir_mtime
+        self.workers = workers
+        self.io_mode = io_mode
+        self.block_size = block_size
+
+    def run(self):
+        """生成或增量刷新目录快照"""
+        snapshot = None
+        try:
+            snapshot = DirSnapshot(self.snapshot_path)
+            stats = snapshot.capture(self.root_directory, self.with_digest, self.trust_dir_mtime, self.workers,
+                                     self.io_mode, self.block_size,
+                                     lambda done, total: self.progress_signal.emit(int(done / total * 100)),
+                                     self.isInterruptionRequested)
+            if stats is None:
+                self.error_signal.emit("快照已停止，原快照未修改")
+                return
+            self.finished_signal.emit(f"快照已保存: {self.snapshot_path}\n"
+                                      f"文件 {stats['files']} 个，目录 {stats['dirs']} 个，"
+                                      f"复用未变化目录 {stats['reused_dirs']} 个，计算摘要 {stats['hashed']} 个")
+        except Exception as e:
+            logger.exception("生成快照失败")
+            self.error_signal.emit(f"生成快照失败：{str(e)}")
+        finally:
+            if snapshot:
+                snapshot.close_connection()
+
 
 class FileComparatorApp(SubWindowWidget):
     def __init__(self):
         super().__init__()
+        self.hash_cache = None
         self.init_ui()
 
     def init_ui(self):
@@ -172,23 +609,100 @@ class FileComparatorApp(SubWindowWidget):
 
         layout.addLayout(button_layout)
 
+        # 任意一侧选择快照时，按快照中的摘要或大小与修改时间比较
+        snapshot_button_layout = QHBoxLayout()
+        self.source_snapshot_button = QPushButton("源快照")
+        self.source_snapshot_button.setObjectName("browse_button")
+        self.source_snapshot_button.clicked.connect(self.select_source_snapshot)
+        snapshot_button_layout.addWidget(self.source_snapshot_button)
+
+        self.target_snapshot_button = QPushButton("目标快照")
+        self.target_snapshot_button.setObjectName("browse_button")
+        self.target_snapshot_button.clicked.connect(self.select_target_snapshot)
+        snapshot_button_layout.addWidget(self.target_snapshot_button)
+
+        self.snapshot_button = QPushButton("生成/刷新快照")
+        self.snapshot_button.clicked.connect(self.create_snapshot)
+        snapshot_button_layout.addWidget(self.snapshot_button)
+        layout.addLayout(snapshot_button_layout)
+
+        snapshot_option_layout = QHBoxLayout()
+        self.snapshot_digest_checkbox = QCheckBox("快照包含摘要")
+        snapshot_option_layout.addWidget(self.snapshot_digest_checkbox)
+        # 目录修改时间只反映条目的增删改名，文件被原地改写时不会变化
+        self.trust_dir_mtime_checkbox = QCheckBox("信任目录修改时间")
+        snapshot_option_layout.addWidget(self.trust_dir_mtime_checkbox)
+        snapshot_option_layout.addStretch()
+        layout.addLayout(snapshot_option_layout)
+
         self.method_label = QLabel("请选择比较方法:")
         layout.addWidget(self.method_label)
 
         self.method_combo = QComboBox()
-        self.method_combo.addItems(["文件大小比较", "哈希算法比较", "逐字节比较", "校验和比较"])
+        self.method_combo.addItems(["自动级联比较", "文件大小比较", "快速指纹比较", "哈希算法比较", "逐字节比较",
+                                    "校验和比较", "块级差异分析"])
         layout.addWidget(self.method_combo)
 
+        # 哈希算法比较时复用 HASH 校验的持久化缓存，不勾选时强制重新计算
+        self.trust_cache_checkbox = QCheckBox("信任哈希缓存")
+        self.trust_cache_checkbox.setChecked(True)
+        layout.addWidget(self.trust_cache_checkbox)
+
+        self.recursive_checkbox = QCheckBox("包含子目录")
+        self.recursive_checkbox.setChecked(True)
+        layout.addWidget(self.recursive_checkbox)
+
+        # 哈希算法比较使用进程池，其余比较使用线程池；每个设备同时读取的文件数单独限制
+        worker_layout = QHBoxLayout()
+        worker_layout.addWidget(QLabel("并行数:"))
+        self.worker_spinbox = QSpinBox()
+        self.worker_spinbox.setRange(1, 64)
+        self.worker_spinbox.setValue(os.cpu_count() or 1)
+        worker_layout.addWidget(self.worker_spinbox)
+        worker_layout.addWidget(QLabel("单设备并发读取:"))
+        self.device_limit_spinbox = QSpinBox()
+        self.device_limit_spinbox.setRange(1, 64)
+        self.device_limit_spinbox.setValue(CompareThread.DEVICE_LIMIT)
+        worker_layout.addWidget(self.device_limit_spinbox)
+        worker_layout.addStretch()
+        layout.addLayout(worker_layout)
+
         self.compare_button = QPushButton("开始比较")
         self.compare_button.clicked.connect(self.start_comparison)
         layout.addWidget(self.compare_button)
         self.progress_bar = CustomProgressBar()
         self.progress_bar.hide()
         layout.addWidget(self.progress_bar)
-        self.result_text = QTextEdit()
 
-        self.result_text.setReadOnly(True)
-        layout.addWidget(self.result_text)
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(QLabel("按状态筛选:"))
+        self.status_filter_combo = QComboBox()
+        self.status_filter_combo.addItems(["全部"] + STATUSES)
+        self.status_filter_combo.currentTextChanged.connect(self.filter_results)
+        filter_layout.addWidget(self.status_filter_combo)
+        filter_layout.addStretch()
+        layout.addLayout(filter_layout)
+
+        # 结果表格：模型按批追加，代理模型负责排序和按状态筛选
+        self.result_model = CompareResultModel(self)
+        self.result_proxy = QSortFilterProxyModel(self)
+        self.result_proxy.setSourceModel(self.result_model)
+        self.result_proxy.setFilterKeyColumn(1)
+        self.result_view = QTableView()
+        self.result_view.setModel(self.result_proxy)
+        self.result_view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.result_view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.result_view.verticalHeader().hide()
+        # 固定行高，视图无需逐行测量
+        self.result_view.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.result_view.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        # 默认保持比较顺序，点击表头后再排序
+        self.result_view.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+        self.result_view.setSortingEnabled(True)
+        layout.addWidget(self.result_view)
         self.setLayout(layout)
 
         self.source_directory = None
@@ -208,35 +722,113 @@ class FileComparatorApp(SubWindowWidget):
             self.target_directory = directory
             self.target_label.setText(f"目标目录: {directory}")
 
+    def select_snapshot(self, title):
+        file_path, _ = QFileDialog.getOpenFileName(self, title, "", f"目录快照 (*{SNAPSHOT_SUFFIX})")
+        return file_path
+
+    def select_source_snapshot(self):
+        """选择源快照"""
+        file_path = self.select_snapshot("选择源快照")
+        if file_path:
+            self.source_directory = file_path
+            self.source_label.setText(f"源快照: {file_path}")
+
+    def select_target_snapshot(self):
+        """选择目标快照"""
+        file_path = self.select_snapshot("选择目标快照")
+        if file_path:
+            self.target_directory = file_path
+            self.target_label.setText(f"目标快照: {file_path}")
+
+    def create_snapshot(self):
+        """为目录生成快照，选择已有的快照文件时增量刷新"""
+        directory = QFileDialog.getExistingDirectory(self, "选择要生成快照的目录")
+        if not directory:
+            return
+        default_path = os.path.join(os.path.dirname(directory), os.path.basename(directory) + SNAPSHOT_SUFFIX)
+        snapshot_path, _ = QFileDialog.getSaveFileName(
+            self, "保存快照", default_path, f"目录快照 (*{SNAPSHOT_SUFFIX})",
+            options=QFileDialog.Option.DontConfirmOverwrite)
+        if not snapshot_path:
+            return
+        if not snapshot_path.lower().endswith(SNAPSHOT_SUFFIX):
+            snapshot_path += SNAPSHOT_SUFFIX
+        io_mode, block_size = CommonUtil.get_hash_io_config()
+        self.snapshot_thread = SnapshotThread(directory, snapshot_path, self.snapshot_digest_checkbox.isChecked(),
+                                              self.trust_dir_mtime_checkbox.isChecked(), self.worker_spinbox.value(),
+                                              io_mode, block_size)
+        self.snapshot_thread.progress_signal.connect(self.progress_bar.update_progress)
+        self.snapshot_thread.finished_signal.connect(self.snapshot_finished)
+        self.snapshot_thread.error_signal.connect(self.snapshot_failed)
+        self.snapshot_button.setEnabled(False)
+        self.compare_button.setEnabled(False)
+        self.status_label.setText("正在生成快照...")
+        self.progress_bar.show()
+        self.snapshot_thread.start()
+
+    def snapshot_finished(self, summary):
+        self.status_label.setText(summary)
+        self.snapshot_button.setEnabled(True)
+        self.compare_button.setEnabled(True)
+        self.progress_bar.hide()
+
+    def snapshot_failed(self, message):
+        self.status_label.setText(message)
+        MessageUtil.show_warning_message(message)
+        self.snapshot_button.setEnabled(True)
+        self.compare_button.setEnabled(True)
+        self.progress_bar.hide()
+
     def start_comparison(self):
         """开始比较文件"""
         if not self.source_directory or not self.target_directory:
-            MessageUtil.show_warning_message("请先选择源目录和目标目录！")
+            MessageUtil.show_warning_message("请先选择源目录（或快照）和目标目录（或快照）！")
             return
         self.compare_button.setEnabled(False)
         method = self.method_combo.currentText()
-        self.compare_thread = CompareThread(self.source_directory, self.target_directory, method)
-        self.compare_thread.update_signal.connect(self.update_result)
+        if self.hash_cache is None:
+            self.hash_cache = HashCache()
+        self.hash_cache.reset_stats()
+        io_mode, block_size = CommonUtil.get_hash_io_config()
+        self.compare_thread = CompareThread(self.source_directory, self.target_directory, method,
+                                            self.hash_cache, self.trust_cache_checkbox.isChecked(),
+                                            io_mode, block_size, self.recursive_checkbox.isChecked(),
+                                            self.worker_spinbox.value(), self.device_limit_spinbox.value())
+        self.result_model.clear()
+        # 比较过程中暂停排序，逐批插入时不必维护排序映射，完成后再按表头排序
+        self.result_view.setSortingEnabled(False)
+        self.result_proxy.sort(-1)
+        self.compare_thread.update_signal.connect(self.update_status)
+        self.compare_thread.records_signal.connect(self.result_model.append_records)
         self.compare_thread.progress_signal.connect(self.progress_bar.update_progress)
         self.compare_thread.done_signal.connect(self.display_summary)
         self.compare_thread.break_signal.connect(self.break_summary)
         self.compare_thread.start()
         self.progress_bar.show()
 
-    def update_result(self, result):
-        """更新结果"""
-        self.result_text.setText(result)
+    def update_status(self, text):
+        """更新状态提示"""
+        self.status_label.setText(text)
+
+    def filter_results(self, status):
+        """按状态筛选结果"""
+        pattern = "" if status == "全部" else f"^{QRegularExpression.escape(status)}$"
+        self.result_proxy.setFilterRegularExpression(pattern)
 
     def break_summary(self, result):
         """中断结果"""
+        self.result_view.setSortingEnabled(True)
         self.compare_button.setEnabled(True)
         self.progress_bar.hide()
 
-    def display_summary(self, same_count, diff_count):
+    def display_summary(self, same_count, diff_count, source_only_count, target_only_count):
         """显示比较总结"""
-        summary = f"相同文件数量: {same_count} 个文件\n"
-        summary += f"不同文件数量: {diff_count} 个文件\n"
-        self.result_text.append(summary)
+        summary = f"相同: {same_count}，不同: {diff_count}，"
+        summary += f"仅源目录存在: {source_only_count}，仅目标目录存在: {target_only_count}"
+        if self.compare_thread.method in ("哈希算法比较", "自动级联比较"):
+            summary += f"\n{self.hash_cache.stats_text()}"
+        self.status_label.setText(summary)
+        self.result_view.setSortingEnabled(True)
         self.compare_button.setEnabled(True)
         self.progress_bar.hide()
 
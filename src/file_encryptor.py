@@ -1,14 +1,14 @@
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 
-from Crypto.Cipher import AES
-from Crypto.Hash import SHA256
-from Crypto.Protocol.KDF import PBKDF2
-from Crypto.Util.Padding import pad, unpad
-from PySide6.QtCore import Qt, Signal, QThread
+from PySide6.QtCore import (
+    Qt, Signal, QThread, QAbstractTableModel, QModelIndex, QSortFilterProxyModel, QDateTime
+)
 from PySide6.QtGui import QIcon
 from PySide6.QtWidgets import (
-    QApplication, QLabel, QVBoxLayout, QLineEdit, QPushButton, QFileDialog, QWidget, QComboBox, QHBoxLayout
+    QApplication, QLabel, QVBoxLayout, QLineEdit, QPushButton, QFileDialog, QWidget, QComboBox, QHBoxLayout, QSpinBox,
+    QDialog, QTableView, QAbstractItemView, QHeaderView, QCheckBox
 )
 from fs_base.message_util import MessageUtil
 from fs_base.widget import CustomProgressBar, TransparentTextBox
@@ -18,96 +18,460 @@ from src.const.color_constants import BLUE, BLACK
 from src.const.font_constants import FontConstants
 from src.const.fs_constants import FsConstants
 from src.util.common_util import CommonUtil
+from src.util.crypto_container import (
+    DEFAULT_KDF_ITERATIONS, MIN_KDF_ITERATIONS, DEFAULT_KDF_TARGET_SECONDS, PARALLEL_THRESHOLD, SALT_SIZE,
+    COMPRESSION_NONE, COMPRESSION_ZLIB, COMPRESSION_LZMA, DURABILITY_FILE, DURABILITY_BATCH, DURABILITY_END,
+    DEFAULT_SYNC_BATCH, TEMP_SUFFIX, KEY_CACHE, calibrate_iterations, encrypt_files_worker, decrypt_files_worker
+)
+from src.util.encrypt_manifest import EncryptManifest
+from src.util.fs_util import FsUtil
+from src.util.crypto_vault import VAULT_SUFFIX, CryptoVault, VaultReader
+from src.util.hash_util import HashUtil
 from src.widget.sub_window_widget import SubWindowWidget
 
 
-class EncryptThread(QThread):
+class FileCryptoThread(QThread):
+    """
+    批量加密/解密的公共流程：先收集文件，再按批分发给工作函数。
+    并行进程数大于 1 时小文件交给进程池，大文件在本线程内按分块多线程处理，
+    单个文件失败只记录错误，不中断其余文件。
+    输出文件都是写完后改名生成的；按落盘策略同步输出文件之后才删除源文件，任何时刻中断都至少保留一份完整数据
+    """
     progress = Signal(int)  # 信号用于传递进度
-    finished = Signal()     # 信号用于标记加密完成
+    finished = Signal()     # 信号用于标记处理完成
     error = Signal(str)    # 信号用于报告错误
-
-    def __init__(self, folder_path, key, parent=None):
+    file_errors = Signal(list)  # 处理失败的文件 [(文件路径, 错误信息)]
+
+    # 每个任务最多包含的文件数和字节数，小文件合并提交以减少进程间通信
+    BATCH_FILES = 64
+    BATCH_BYTES = 64 * 1024 * 1024
+    # 工作函数，签名为 worker(任务列表, *worker_args, 文件内并行线程数)，
+    # 返回 [(文件路径, 错误信息或 None, 清单记录或 None)]
+    worker = None
+
+    def __init__(self, folder_path, password, key_length, workers=1, iterations=DEFAULT_KDF_ITERATIONS,
+                 compression=COMPRESSION_NONE, durability=DURABILITY_FILE, sync_batch=DEFAULT_SYNC_BATCH,
+                 parent=None):
+        """
+        :param key_length: 密钥字节数
+        :param iterations: 加密时 PBKDF2 的迭代次数，解密时以文件头为准
+        :param compression: 加密前的压缩算法，解密时以文件头为准
+        :param durability: 落盘策略 DURABILITY_FILE / DURABILITY_BATCH / DURABILITY_END
+        :param sync_batch: DURABILITY_BATCH 时每多少个文件同步一次
+        """
         super().__init__(parent)
         self.folder_path = folder_path
-        self.key = key
+        self.password = password
+        self.key_length = key_length
+        self.iterations = iterations
+        self.compression = compression
+        self.durability = durability
+        self.sync_batch = max(1, sync_batch)
+        self.workers = max(1, workers)
+        self.worker_args = ()
+        self.skipped_files = 0
+        # 已生成输出、等待同步后删除源文件的 [(源文件路径, 清单记录)]
+        self.pending = []
+        self.errors = []
+
+    def prepare(self):
+        """在后台线程中准备工作函数的参数（密码、密钥等）"""
+        return ()
+
+    def accept(self, file_name):
+        """是否处理该文件，中断后残留的临时文件不处理"""
+        return not file_name.endswith(TEMP_SUFFIX)
+
+    def output_path(self, file_path):
+        """源文件对应的输出文件路径"""
+        raise NotImplementedError
+
+    def collect_files(self):
+        """
+        递归收集待处理的文件
+        :return: [(文件路径, 文件大小, 修改时间ns)]
+        """
+        files = []
+        stack = [self.folder_path]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False) and self.accept(entry.name):
+                        stat = entry.stat(follow_symlinks=False)
+                        files.append((entry.path, stat.st_size, stat.st_mtime_ns))
+        return files
+
+    def plan(self, files):
+        """
+        决定哪些文件需要交给工作函数
+        :return: ([(任务, 文件大小)], 无需处理的文件数, 无需处理的字节数, [(文件路径, 错误信息)])
+        """
+        return [(file_path, file_size) for file_path, file_size, _ in files], 0, 0, []
+
+    def store_records(self, records):
+        """保存工作函数返回的清单记录 [(文件路径, 清单记录)]"""
+
+    def iter_batches(self, jobs):
+        batch = []
+        batch_bytes = 0
+        for job, file_size in jobs:
+            batch.append(job)
+            batch_bytes += file_size
+            if len(batch) >= self.BATCH_FILES or batch_bytes >= self.BATCH_BYTES:
+                yield (batch, *self.worker_args)
+                batch = []
+                batch_bytes = 0
+        if batch:
+            yield (batch, *self.worker_args)
 
     def run(self):
         try:
-            total_files = sum([len(files) for _, _, files in os.walk(self.folder_path)])
-            processed_files = 0
-
-            for root, _, files in os.walk(self.folder_path):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    with open(file_path, "rb") as f:
-                        data = f.read()
+            self.worker_args = self.prepare()
+            files = self.collect_files()
+            jobs, self.skipped_files, skipped_bytes, self.errors = self.plan(files)
+            # 进度按字节计算，大文件和小文件混在一起时也能平稳推进
+            self.sizes = {self.job_path(job): file_size for job, file_size in jobs}
+            self.total_bytes = skipped_bytes + sum(self.sizes.values())
+            self.done_bytes = skipped_bytes
+            self.last_progress = -1
+
+            if self.workers > 1:
+                # 大文件单独处理，避免一个进程长时间只用一个核心
+                large_jobs = [job for job, file_size in jobs if file_size >= PARALLEL_THRESHOLD]
+                small_jobs = [(job, file_size) for job, file_size in jobs if file_size < PARALLEL_THRESHOLD]
+                if small_jobs:
+                    with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                        for results in HashUtil.imap_unordered(executor, self.worker,
+                                                               self.iter_batches(small_jobs), self.workers):
+                            self.report(results)
+                for job in large_jobs:
+                    self.report(self.worker([job], *self.worker_args, self.workers))
+            else:
+                for batch in self.iter_batches(jobs):
+                    self.report(self.worker(*batch))
+            self.commit_pending()
 
-                    # 使用 AES 加密
-                    cipher = AES.new(self.key, AES.MODE_CBC)
-                    ciphertext = cipher.encrypt(pad(data, AES.block_size))
+            if self.errors:
+                self.file_errors.emit(self.errors)
+            self.finished.emit()  # 处理完成信号
 
-                    encrypted_file = file_path + ".enc"
-                    with open(encrypted_file, "wb") as f:
-                        f.write(cipher.iv)  # 写入初始化向量
-                        f.write(ciphertext)
+        except Exception as e:
+            logger.error(f"Exception = {e}")
+            self.error.emit(str(e))  # 发送错误信息
 
-                    # 删除原文件
+    @staticmethod
+    def job_path(job):
+        return job
+
+    def commit_pending(self):
+        """
+        同步等待中的输出文件所在的目录，然后删除对应的源文件并保存清单记录；
+        输出文件的内容已由工作函数在关闭前同步，DURABILITY_FILE 时工作函数已逐个同步目录并删除了源文件
+        """
+        if not self.pending:
+            return
+        if self.durability != DURABILITY_FILE:
+            directories = {os.path.dirname(os.path.abspath(self.output_path(file_path)))
+                           for file_path, _ in self.pending}
+            for directory in directories:
+                FsUtil.fsync_directory(directory)
+            for file_path, _ in self.pending:
+                try:
                     os.remove(file_path)
+                except OSError as e:
+                    self.errors.append((file_path, str(e)))
+        self.store_records([(file_path, record) for file_path, record in self.pending if record])
+        self.pending = []
+
+    def report(self, results):
+        """记录一批结果，按落盘策略提交，并更新进度"""
+        for file_path, error, record in results:
+            self.done_bytes += self.sizes.get(file_path, 0)
+            if error:
+                logger.warning(f"处理文件失败：{file_path}，{error}")
+                self.errors.append((file_path, error))
+            else:
+                self.pending.append((file_path, record))
+        if self.durability == DURABILITY_FILE or (
+                self.durability == DURABILITY_BATCH and len(self.pending) >= self.sync_batch):
+            self.commit_pending()
+        progress = int(self.done_bytes / self.total_bytes * 100) if self.total_bytes else 100
+        if progress != self.last_progress:
+            self.last_progress = progress
+            self.progress.emit(progress)  # 更新进度条
+
+
+class EncryptThread(FileCryptoThread):
+    """
+    分块 AES-GCM 流式加密，成功后删除原文件。
+    增量模式下对照加密清单，内容未变化且 .enc 文件完好的源文件不再重新加密，只删除源文件
+    """
+    worker = staticmethod(encrypt_files_worker)
+
+    def __init__(self, folder_path, password, key_length, workers=1, iterations=DEFAULT_KDF_ITERATIONS,
+                 compression=COMPRESSION_NONE, incremental=True, manifest=None, durability=DURABILITY_FILE,
+                 sync_batch=DEFAULT_SYNC_BATCH, parent=None):
+        """
+        :param incremental: 是否跳过未变化的文件
+        :param manifest: EncryptManifest，为空时使用应用数据库
+        """
+        super().__init__(folder_path, password, key_length, workers, iterations, compression, durability,
+                         sync_batch, parent)
+        self.incremental = incremental
+        self.manifest = manifest
+
+    def accept(self, file_name):
+        # 已加密的文件不再重复加密
+        return super().accept(file_name) and not file_name.endswith(".enc")
+
+    def output_path(self, file_path):
+        return file_path + ".enc"
 
-                    processed_files += 1
-                    self.progress.emit(int((processed_files / total_files) * 100))  # 更新进度条
+    @staticmethod
+    def job_path(job):
+        return job[0]
+
+    def plan(self, files):
+        if not self.incremental:
+            return [((file_path, None, None), file_size) for file_path, file_size, _ in files], 0, 0, []
+        manifest_records = self.manifest.load(self.folder_path)
+        jobs = []
+        skipped_files = 0
+        skipped_bytes = 0
+        errors = []
+        for file_path, file_size, mtime_ns in files:
+            record = manifest_records.get(os.path.abspath(file_path))
+            state = EncryptManifest.check(file_path, file_size, mtime_ns, record, self.password, self.key_length)
+            if state == "unchanged":
+                # 与 .enc 中的内容一致且 .enc 由当前密码生成，达到和重新加密相同的结果只需删除源文件
+                try:
+                    os.remove(file_path)
+                    skipped_files += 1
+                    skipped_bytes += file_size
+                except OSError as e:
+                    errors.append((file_path, str(e)))
+                continue
+            known = (record[2], record[5]) if state == "verify" else (None, None)
+            jobs.append(((file_path, *known), file_size))
+        logger.info(f"增量加密：{len(files)} 个文件，{skipped_files} 个未变化")
+        return jobs, skipped_files, skipped_bytes, errors
+
+    def store_records(self, records):
+        if self.incremental and records:
+            self.manifest.store([(os.path.abspath(file_path), record) for file_path, record in records])
+
+    def prepare(self):
+        if self.incremental and not self.manifest:
+            try:
+                self.manifest = EncryptManifest()
+            except Exception as e:
+                logger.warning(f"打开加密清单失败，本次全部重新加密：{str(e)}")
+                self.incremental = False
+        # 每次加密生成新的随机盐，本次的所有文件共用一个盐，密钥只派生一次
+        salt = os.urandom(SALT_SIZE)
+        key = KEY_CACHE.get(self.password, salt, self.iterations, self.key_length)
+        # 只有使用加密清单时才计算明文摘要
+        return key, salt, self.iterations, self.compression, self.durability, self.incremental
+
+
+class DecryptThread(FileCryptoThread):
+    # 自动识别分块容器格式和旧的 IV + CBC 格式，成功后删除加密文件
+    worker = staticmethod(decrypt_files_worker)
+
+    def accept(self, file_name):
+        return file_name.endswith(".enc")
+
+    def prepare(self):
+        # 每个文件的盐和迭代次数不同，由工作函数按文件头派生并缓存密钥
+        return self.password, self.key_length, self.durability
+
+    def output_path(self, file_path):
+        return file_path[:-len(".enc")]
+
+
+class CalibrateThread(QThread):
+    """测量本机 PBKDF2 速度，计算达到目标耗时的迭代次数"""
+    finished_signal = Signal(int)
+
+    def __init__(self, target_seconds, key_length, parent=None):
+        super().__init__(parent)
+        self.target_seconds = target_seconds
+        self.key_length = key_length
 
-            self.finished.emit()  # 加密完成信号
+    def run(self):
+        self.finished_signal.emit(calibrate_iterations(self.target_seconds, self.key_length))
 
-        except Exception as e:
-            self.error.emit(str(e))  # 发送错误信息
-            self.finished.emit()
 
-class DecryptThread(QThread):
-    progress = Signal(int)  # 信号用于传递进度
-    finished = Signal()     # 信号用于标记解密完成
-    error = Signal(str)    # 信号用于报告错误
+class VaultPackThread(QThread):
+    """把目录打包为一个保险库，原文件保留"""
+    progress_signal = Signal(int)
+    finished_signal = Signal(int, list)  # (打包的文件数, [(文件路径, 错误信息)])
+    error_signal = Signal(str)
 
-    def __init__(self, folder_path, key, parent=None):
+    def __init__(self, folder_path, vault_path, password, key_length, iterations=DEFAULT_KDF_ITERATIONS,
+                 parent=None):
         super().__init__(parent)
         self.folder_path = folder_path
-        self.key = key
+        self.vault_path = vault_path
+        self.password = password
+        self.key_length = key_length
+        self.iterations = iterations
+        self.last_progress = -1
 
     def run(self):
         try:
-            total_files = sum([len(files) for _, _, files in os.walk(self.folder_path)])
-            processed_files = 0
+            salt = os.urandom(SALT_SIZE)
+            key = KEY_CACHE.get(self.password, salt, self.iterations, self.key_length)
+            result = CryptoVault.pack(self.folder_path, self.vault_path, key, salt, self.iterations,
+                                      progress_callback=self.report, is_interrupted=self.isInterruptionRequested)
+            if result is not None:
+                self.finished_signal.emit(*result)
+        except Exception as e:
+            logger.error(f"Exception = {e}")
+            self.error_signal.emit(str(e))
 
-            for root, _, files in os.walk(self.folder_path):
-                for file in files:
-                    if not file.endswith(".enc"):
-                        continue
+    def report(self, done, total):
+        progress = int(done / total * 100) if total else 100
+        if progress != self.last_progress:
+            self.last_progress = progress
+            self.progress_signal.emit(progress)
 
-                    file_path = os.path.join(root, file)
-                    with open(file_path, "rb") as f:
-                        iv = f.read(16)  # 读取初始化向量
-                        ciphertext = f.read()
 
-                    # 使用 AES 解密
-                    cipher = AES.new(self.key, AES.MODE_CBC, iv)
-                    plaintext = unpad(cipher.decrypt(ciphertext), AES.block_size)
+class VaultOpenThread(QThread):
+    """派生密钥并解密保险库索引"""
+    finished_signal = Signal(list)  # [(相对路径, 大小, 修改时间ns, 数据流偏移)]
+    error_signal = Signal(str)
 
-                    decrypted_file = file_path.replace(".enc", "")
-                    with open(decrypted_file, "wb") as f:
-                        f.write(plaintext)
+    def __init__(self, vault_path, password, parent=None):
+        super().__init__(parent)
+        self.vault_path = vault_path
+        self.password = password
 
-                    # 删除加密文件
-                    os.remove(file_path)
+    def run(self):
+        try:
+            with VaultReader(self.vault_path, self.password) as reader:
+                self.finished_signal.emit(reader.entries)
+        except Exception as e:
+            logger.error(f"Exception = {e}")
+            self.error_signal.emit(str(e))
 
-                    processed_files += 1
-                    self.progress.emit(int((processed_files / total_files) * 100))  # 更新进度条
 
-            self.finished.emit()  # 解密完成信号
+class VaultExtractThread(QThread):
+    """从保险库提取全部或部分文件"""
+    progress_signal = Signal(int)
+    finished_signal = Signal(list)  # [(相对路径, 错误信息)]
+    error_signal = Signal(str)
+
+    def __init__(self, vault_path, password, dest, entries=None, parent=None):
+        super().__init__(parent)
+        self.vault_path = vault_path
+        self.password = password
+        self.dest = dest
+        self.entries = entries
+        self.last_progress = -1
 
+    def run(self):
+        try:
+            with VaultReader(self.vault_path, self.password) as reader:
+                errors = reader.extract(self.dest, self.entries, self.report, self.isInterruptionRequested)
+            self.finished_signal.emit(errors)
         except Exception as e:
             logger.error(f"Exception = {e}")
-            self.error.emit(str(e))  # 发送错误信息
-            self.finished.emit()
+            self.error_signal.emit(str(e))
+
+    def report(self, done, total):
+        progress = int(done / total * 100) if total else 100
+        if progress != self.last_progress:
+            self.last_progress = progress
+            self.progress_signal.emit(progress)
+
+
+class VaultEntryModel(QAbstractTableModel):
+    """保险库文件列表，每行为索引项 (相对路径, 大小, 修改时间ns, 数据流偏移)"""
+    HEADERS = ["文件", "大小", "修改时间"]
+
+    def __init__(self, entries, parent=None):
+        super().__init__(parent)
+        self.entries = entries
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.entries)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        rel_path, size, mtime_ns, _ = self.entries[index.row()]
+        if index.column() == 0:
+            return rel_path
+        if index.column() == 1:
+            return CommonUtil.format_size(size)
+        return QDateTime.fromMSecsSinceEpoch(mtime_ns // 1000000).toString("yyyy-MM-dd HH:mm:ss")
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+
+class VaultDialog(QDialog):
+    """
+    浏览保险库内容，选择要提取的文件；
+    确认后 selected_entries 为选中的索引项，选择全部提取时为 None
+    """
+
+    def __init__(self, vault_path, entries, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"保险库 - {os.path.basename(vault_path)}")
+        self.resize(720, 480)
+        self.selected_entries = None
+
+        layout = QVBoxLayout()
+        total_size = sum(entry[1] for entry in entries)
+        layout.addWidget(QLabel(f"共 {len(entries)} 个文件，{CommonUtil.format_size(total_size)}"))
+
+        self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText("按路径筛选")
+        layout.addWidget(self.filter_input)
+
+        self.model = VaultEntryModel(entries, self)
+        self.proxy = QSortFilterProxyModel(self)
+        self.proxy.setSourceModel(self.model)
+        self.proxy.setFilterKeyColumn(0)
+        self.proxy.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.filter_input.textChanged.connect(self.proxy.setFilterFixedString)
+
+        self.table_view = QTableView()
+        self.table_view.setModel(self.proxy)
+        self.table_view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table_view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table_view.verticalHeader().hide()
+        self.table_view.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.table_view.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.table_view)
+
+        button_layout = QHBoxLayout()
+        extract_selected_button = QPushButton("提取选中")
+        extract_selected_button.clicked.connect(self.extract_selected)
+        button_layout.addWidget(extract_selected_button)
+        extract_all_button = QPushButton("全部提取")
+        extract_all_button.clicked.connect(self.accept)
+        button_layout.addWidget(extract_all_button)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+
+    def extract_selected(self):
+        rows = self.table_view.selectionModel().selectedRows()
+        if not rows:
+            MessageUtil.show_warning_message("请先选择要提取的文件！")
+            return
+        self.selected_entries = [self.model.entries[self.proxy.mapToSource(row).row()] for row in rows]
+        self.accept()
+
 
 class FileEncryptorApp(SubWindowWidget):
 
@@ -178,6 +542,69 @@ class FileEncryptorApp(SubWindowWidget):
         password_input_layout.addWidget(self.show_password_button)
         layout.addLayout(password_input_layout)
 
+        # 密钥派生迭代次数，越大越能抵抗暴力破解，派生也越慢；解密时以文件头中记录的次数为准
+        iteration_layout = QHBoxLayout()
+        iteration_layout.addWidget(QLabel("密钥派生迭代次数:"))
+        self.iteration_spinbox = QSpinBox()
+        self.iteration_spinbox.setRange(MIN_KDF_ITERATIONS, 100000000)
+        self.iteration_spinbox.setSingleStep(10000)
+        self.iteration_spinbox.setValue(DEFAULT_KDF_ITERATIONS)
+        iteration_layout.addWidget(self.iteration_spinbox)
+        self.calibrate_button = QPushButton("校准")
+        self.calibrate_button.setToolTip(f"按本机速度选择派生一次密钥约耗时 {DEFAULT_KDF_TARGET_SECONDS} 秒的迭代次数")
+        self.calibrate_button.clicked.connect(self.calibrate_iterations)
+        iteration_layout.addWidget(self.calibrate_button)
+        iteration_layout.addStretch()
+        layout.addLayout(iteration_layout)
+
+        # 加密前压缩，图片、视频、压缩包等已压缩的数据会自动跳过
+        compression_layout = QHBoxLayout()
+        compression_layout.addWidget(QLabel("加密前压缩:"))
+        self.compression_combo = QComboBox()
+        self.compression_combo.addItem("不压缩", COMPRESSION_NONE)
+        self.compression_combo.addItem("zlib（较快）", COMPRESSION_ZLIB)
+        self.compression_combo.addItem("lzma（压缩率高）", COMPRESSION_LZMA)
+        self.compression_combo.setToolTip("文本等可压缩的文件会明显变小，适合写入慢速的网络存储；\n"
+                                          "启用压缩后大文件不再在文件内部并行加密")
+        compression_layout.addWidget(self.compression_combo)
+        # 对照加密清单，内容没有变化的文件不再重新加密
+        self.incremental_checkbox = QCheckBox("跳过未变化的文件")
+        self.incremental_checkbox.setChecked(True)
+        self.incremental_checkbox.setToolTip("源文件与上次加密时的大小、修改时间或摘要一致，且 .enc 文件未被改动时，\n"
+                                             "直接删除源文件，不再重新加密")
+        compression_layout.addWidget(self.incremental_checkbox)
+        compression_layout.addStretch()
+        layout.addLayout(compression_layout)
+
+        # 落盘策略：输出文件同步到磁盘之后才删除源文件，同步越少越快，断电时需要重新处理的文件越多
+        durability_layout = QHBoxLayout()
+        durability_layout.addWidget(QLabel("落盘策略:"))
+        self.durability_combo = QComboBox()
+        self.durability_combo.addItem("每个文件同步", DURABILITY_FILE)
+        self.durability_combo.addItem("每批文件同步", DURABILITY_BATCH)
+        self.durability_combo.addItem("全部完成后同步", DURABILITY_END)
+        self.durability_combo.setCurrentIndex(1)
+        self.durability_combo.setToolTip("未同步前源文件和输出文件同时保留，中断后重新运行即可继续")
+        durability_layout.addWidget(self.durability_combo)
+        durability_layout.addWidget(QLabel("每批文件数:"))
+        self.sync_batch_spinbox = QSpinBox()
+        self.sync_batch_spinbox.setRange(1, 1000000)
+        self.sync_batch_spinbox.setValue(DEFAULT_SYNC_BATCH)
+        durability_layout.addWidget(self.sync_batch_spinbox)
+        self.durability_combo.currentIndexChanged.connect(
+            lambda: self.sync_batch_spinbox.setEnabled(self.durability_combo.currentData() == DURABILITY_BATCH))
+        durability_layout.addStretch()
+        layout.addLayout(durability_layout)
+
+        # 多个文件分散到进程池，为 1 时在后台线程中逐个处理
+        worker_layout = QHBoxLayout()
+        worker_layout.addWidget(QLabel("并行进程数:"))
+        self.worker_spinbox = QSpinBox()
+        self.worker_spinbox.setRange(1, 64)
+        self.worker_spinbox.setValue(os.cpu_count() or 1)
+        worker_layout.addWidget(self.worker_spinbox)
+        worker_layout.addStretch()
+        layout.addLayout(worker_layout)
 
         button_layout = QHBoxLayout()
 
@@ -192,6 +619,18 @@ class FileEncryptorApp(SubWindowWidget):
         button_layout.addWidget(self.decrypt_button)
 
         layout.addLayout(button_layout)
+
+        # 保险库：整个目录打包成一个加密文件，可以只提取其中的部分文件
+        vault_layout = QHBoxLayout()
+        self.pack_vault_button = QPushButton("打包为保险库")
+        self.pack_vault_button.setToolTip("将目录下的所有文件打包为一个加密文件，原文件保留，适合大量小文件")
+        self.pack_vault_button.clicked.connect(self.pack_vault)
+        vault_layout.addWidget(self.pack_vault_button)
+        self.open_vault_button = QPushButton("打开保险库")
+        self.open_vault_button.clicked.connect(self.open_vault)
+        vault_layout.addWidget(self.open_vault_button)
+        layout.addLayout(vault_layout)
+
         # 进度条
         self.progress_bar = CustomProgressBar()
         self.progress_bar.hide()
@@ -234,10 +673,15 @@ class FileEncryptorApp(SubWindowWidget):
             MessageUtil.show_warning_message("密码长度必须至少8个字符！")
             return
 
-        key_length = int(self.key_length_combo.currentText())
-        key = self.derive_key(password, key_length)
+        key_length = int(self.key_length_combo.currentText()) // 8
         self.setEnabled(False)
-        self.encrypt_thread = EncryptThread(self.selected_folder, key)
+        self.file_errors = []
+        self.encrypt_thread = EncryptThread(self.selected_folder, password, key_length, self.worker_spinbox.value(),
+                                            self.iteration_spinbox.value(), self.compression_combo.currentData(),
+                                            self.incremental_checkbox.isChecked(),
+                                            durability=self.durability_combo.currentData(),
+                                            sync_batch=self.sync_batch_spinbox.value())
+        self.encrypt_thread.file_errors.connect(self.collect_file_errors)
         self.encrypt_thread.progress.connect(self.progress_bar.update_progress)  # 连接进度更新
         self.encrypt_thread.finished.connect(self.encryption_finished)  # 加密完成处理
         self.encrypt_thread.error.connect(self.encryption_error)  # 错误处理
@@ -255,11 +699,14 @@ class FileEncryptorApp(SubWindowWidget):
             MessageUtil.show_warning_message("密码长度必须至少8个字符！")
             return
 
-        key_length = int(self.key_length_combo.currentText())
-        key = self.derive_key(password, key_length)
+        key_length = int(self.key_length_combo.currentText()) // 8
         self.progress_bar.show()
         self.setEnabled(False)
-        self.decrypt_thread = DecryptThread(self.selected_folder, key)
+        self.file_errors = []
+        self.decrypt_thread = DecryptThread(self.selected_folder, password, key_length, self.worker_spinbox.value(),
+                                            durability=self.durability_combo.currentData(),
+                                            sync_batch=self.sync_batch_spinbox.value())
+        self.decrypt_thread.file_errors.connect(self.collect_file_errors)
         self.decrypt_thread.progress.connect(self.progress_bar.update_progress)  # 连接进度更新
         self.decrypt_thread.finished.connect(self.decryption_finished)  # 解密完成处理
         self.decrypt_thread.error.connect(self.decryption_error)  # 错误处理
@@ -267,11 +714,27 @@ class FileEncryptorApp(SubWindowWidget):
 
 
 
+    def collect_file_errors(self, errors):
+        self.file_errors = errors
+
+    def show_file_errors(self, action):
+        """部分文件处理失败时汇总提示，详细信息中列出每个文件的错误"""
+        details = "\n".join(f"{file_path}: {error}" for file_path, error in self.file_errors)
+        MessageUtil.show_message("警告", f"{len(self.file_errors)} 个文件{action}失败，其余文件已处理完成。",
+                                 message_type="warning", details=details)
+
     def encryption_finished(self):
         self.setEnabled(True)
         self.progress_bar.hide()
 
         """加密完成后的提示"""
+        if self.file_errors:
+            self.show_file_errors("加密")
+            return
+        skipped_files = self.encrypt_thread.skipped_files
+        if skipped_files:
+            MessageUtil.show_success_message(f"文件夹内的文件已成功加密！其中 {skipped_files} 个文件未变化，未重新加密。")
+            return
         MessageUtil.show_success_message("文件夹内的文件已成功加密！")
 
     def decryption_finished(self):
@@ -279,6 +742,9 @@ class FileEncryptorApp(SubWindowWidget):
         self.progress_bar.hide()
 
         """解密完成后的提示"""
+        if self.file_errors:
+            self.show_file_errors("解密")
+            return
         MessageUtil.show_success_message("文件夹内的文件已成功解密！")
 
     def encryption_error(self, error_msg):
@@ -295,11 +761,101 @@ class FileEncryptorApp(SubWindowWidget):
         """解密错误提示"""
         MessageUtil.show_error_message(f"解密过程中发生错误: {error_msg}")
 
-    @staticmethod
-    def derive_key(password: str, key_length: int):
-        """通过 PBKDF2 生成密钥"""
-        salt = b'fs_tool_salt'  # 可以随机生成并保存到文件中
-        return PBKDF2(password, salt, dkLen=key_length // 8, count=100000, hmac_hash_module=SHA256)
+    def pack_vault(self):
+        """把选择的目录打包为保险库"""
+        if not self.selected_folder:
+            MessageUtil.show_warning_message("请先选择一个文件夹！")
+            return
+        password = self.password_input.text()
+        if len(password) < 8:
+            MessageUtil.show_warning_message("密码长度必须至少8个字符！")
+            return
+        default_path = self.selected_folder.rstrip("/\\") + VAULT_SUFFIX
+        vault_path, _ = QFileDialog.getSaveFileName(self, "保存保险库", default_path, f"保险库 (*{VAULT_SUFFIX})")
+        if not vault_path:
+            return
+
+        key_length = int(self.key_length_combo.currentText()) // 8
+        self.setEnabled(False)
+        self.vault_thread = VaultPackThread(self.selected_folder, vault_path, password, key_length,
+                                            self.iteration_spinbox.value())
+        self.vault_thread.progress_signal.connect(self.progress_bar.update_progress)
+        self.vault_thread.finished_signal.connect(self.vault_pack_finished)
+        self.vault_thread.error_signal.connect(self.vault_error)
+        self.vault_thread.start()
+        self.progress_bar.show()
+
+    def vault_pack_finished(self, count, errors):
+        self.setEnabled(True)
+        self.progress_bar.hide()
+        if errors:
+            self.file_errors = errors
+            self.show_file_errors("打包")
+            return
+        MessageUtil.show_success_message(f"已将 {count} 个文件打包为保险库！")
+
+    def open_vault(self):
+        """解密保险库索引并显示文件列表"""
+        password = self.password_input.text()
+        if len(password) < 8:
+            MessageUtil.show_warning_message("密码长度必须至少8个字符！")
+            return
+        vault_path, _ = QFileDialog.getOpenFileName(self, "打开保险库", "", f"保险库 (*{VAULT_SUFFIX})")
+        if not vault_path:
+            return
+
+        self.setEnabled(False)
+        self.vault_path = vault_path
+        self.vault_thread = VaultOpenThread(vault_path, password)
+        self.vault_thread.finished_signal.connect(self.vault_opened)
+        self.vault_thread.error_signal.connect(self.vault_error)
+        self.vault_thread.start()
+
+    def vault_opened(self, entries):
+        self.setEnabled(True)
+        dialog = VaultDialog(self.vault_path, entries, self)
+        if dialog.exec() != QDialog.DialogCode.Accepted:
+            return
+        dest = QFileDialog.getExistingDirectory(self, "选择提取到的目录")
+        if not dest:
+            return
+
+        self.setEnabled(False)
+        self.vault_thread = VaultExtractThread(self.vault_path, self.password_input.text(), dest,
+                                               dialog.selected_entries)
+        self.vault_thread.progress_signal.connect(self.progress_bar.update_progress)
+        self.vault_thread.finished_signal.connect(self.vault_extract_finished)
+        self.vault_thread.error_signal.connect(self.vault_error)
+        self.vault_thread.start()
+        self.progress_bar.show()
+
+    def vault_extract_finished(self, errors):
+        self.setEnabled(True)
+        self.progress_bar.hide()
+        if errors:
+            self.file_errors = errors
+            self.show_file_errors("提取")
+            return
+        MessageUtil.show_success_message("保险库中的文件已提取完成！")
+
+    def vault_error(self, error_msg):
+        self.setEnabled(True)
+        self.progress_bar.hide()
+        MessageUtil.show_error_message(f"保险库操作失败: {error_msg}")
+
+    def calibrate_iterations(self):
+        """在后台测量密钥派生速度并填入迭代次数"""
+        self.calibrate_button.setEnabled(False)
+        self.calibrate_button.setText("校准中...")
+        self.calibrate_thread = CalibrateThread(DEFAULT_KDF_TARGET_SECONDS,
+                                                int(self.key_length_combo.currentText()) // 8)
+        self.calibrate_thread.finished_signal.connect(self.calibration_finished)
+        self.calibrate_thread.start()
+
+    def calibration_finished(self, iterations):
+        self.iteration_spinbox.setValue(iterations)
+        self.calibrate_button.setText("校准")
+        self.calibrate_button.setEnabled(True)
 
 
     def toggle_password_visibility(self):
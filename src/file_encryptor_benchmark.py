@@ -0,0 +1,321 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from loguru import logger
+
+from src.const.fs_constants import FsConstants
+from src.file_encryptor import EncryptThread, DecryptThread
+from src.util.crypto_container import (
+    COMPRESSION_NONE, COMPRESSION_ZLIB, COMPRESSION_LZMA, DURABILITY_FILE, DURABILITY_BATCH, DURABILITY_END,
+    MIN_KDF_ITERATIONS, PARALLEL_THRESHOLD, SALT_SIZE, KEY_CACHE, encrypt_files_worker, decrypt_files_worker
+)
+from src.util.crypto_vault import CryptoVault, VaultReader, VAULT_SUFFIX
+from src.util.fs_util import FsUtil
+from src.util.hash_util import HashUtil
+
+# 合成目录树：(小文件数, 小文件大小, 大文件数, 大文件大小)
+BENCHMARK_TREES = {
+    "small_files": (5000, 16 * 1024, 0, 0),
+    "large_files": (0, 0, 2, 2 * PARALLEL_THRESHOLD),
+    "mixed": (2000, 16 * 1024, 1, PARALLEL_THRESHOLD + PARALLEL_THRESHOLD // 2),
+}
+# 运行方式：single 为加密/解密线程单进程逐个处理整个目录；pool 为小于 PARALLEL_THRESHOLD 的文件分批交给进程池；
+# chunked 为不小于 PARALLEL_THRESHOLD 的文件逐个在文件内部分块并行；vault 为整个目录打包成保险库再全部提取。
+# chunked 和 vault 不压缩，只在不压缩时运行；目录树中没有对应文件时跳过 pool / chunked
+BENCHMARK_MODES = ["single", "pool", "chunked", "vault"]
+COMPRESSIONS = {"none": COMPRESSION_NONE, "zlib": COMPRESSION_ZLIB, "lzma": COMPRESSION_LZMA}
+DURABILITIES = [DURABILITY_FILE, DURABILITY_BATCH, DURABILITY_END]
+BENCHMARK_PASSWORD = "benchmark-password"
+
+
+class FileEncryptorBenchmark:
+    """
+    加密/解密吞吐量基准测试，不需要界面：
+    生成合成目录树，按每种运行方式加密再解密（保险库为打包再提取），记录 MB/s 与 文件/s，
+    并用 SHA256 校验解密结果与原文件一致。
+    数据在页缓存中，结果反映的是 CPU 和文件系统开销，适合比较不同版本之间的变化
+    """
+
+    @staticmethod
+    def text_block(size):
+        """可压缩的文本内容，用于观察压缩的效果"""
+        line = b"The quick brown fox jumps over the lazy dog 0123456789\n"
+        return (line * (size // len(line) + 1))[:size]
+
+    @staticmethod
+    def generate_tree(root, small_count, small_size, large_count, large_size):
+        """
+        生成合成目录树：小文件一半为文本一半为随机数据，每 500 个放入一个子目录；大文件为随机数据
+        :return: {文件路径: SHA256}
+        """
+        os.makedirs(root, exist_ok=True)
+        text = FileEncryptorBenchmark.text_block(small_size)
+        for i in range(small_count):
+            directory = os.path.join(root, f"dir{i // 500:04d}")
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, f"file{i:06d}.dat"), "wb") as file:
+                file.write(text if i % 2 else os.urandom(small_size))
+        for i in range(large_count):
+            with open(os.path.join(root, f"large{i:02d}.bin"), "wb") as file:
+                remaining = large_size
+                while remaining > 0:
+                    block = os.urandom(min(remaining, 16 * 1024 * 1024))
+                    file.write(block)
+                    remaining -= len(block)
+        return FileEncryptorBenchmark.digest_tree(root)
+
+    @staticmethod
+    def digest_tree(root):
+        digests = {}
+        for directory, _, file_names in os.walk(root):
+            for file_name in file_names:
+                file_path = os.path.join(directory, file_name)
+                digests[file_path] = HashUtil.hash_file(file_path, ["SHA256"])["SHA256"]
+        return digests
+
+    @staticmethod
+    def run_thread(thread):
+        """在当前线程中同步执行加密/解密线程的 run，返回 (耗时秒数, [错误])"""
+        errors = []
+        thread.error.connect(lambda message: errors.append(("", message)))
+        thread.file_errors.connect(errors.extend)
+        start = time.perf_counter()
+        thread.run()
+        return time.perf_counter() - start, errors
+
+    @staticmethod
+    def rate(seconds, total_bytes, file_count):
+        seconds = max(seconds, 1e-9)
+        return {
+            "seconds": round(seconds, 4),
+            "mb_per_s": round(total_bytes / 1024 / 1024 / seconds, 2),
+            "files_per_s": round(file_count / seconds, 2),
+        }
+
+    @staticmethod
+    def run_batches(func, batches, workers, pooled, output_path, durability):
+        """
+        执行加密/解密工作函数，返回 (耗时秒数, [错误])。
+        与加密/解密线程一样，非 DURABILITY_FILE 策略下最后同步输出文件所在目录再删除源文件
+        :param batches: 工作函数的参数元组列表
+        :param pooled: 为 True 时分批交给进程池，否则在当前进程中逐批执行，大文件在文件内部用 workers 个线程并行
+        :param output_path: output_path(源文件路径) 返回输出文件路径
+        """
+        done = []
+        errors = []
+
+        def collect(results):
+            for file_path, error, _ in results:
+                if error:
+                    errors.append((file_path, error))
+                else:
+                    done.append(file_path)
+
+        start = time.perf_counter()
+        if pooled:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for results in HashUtil.imap_unordered(executor, func, batches, workers):
+                    collect(results)
+        else:
+            for batch in batches:
+                collect(func(*batch, workers))
+        if durability != DURABILITY_FILE:
+            for directory in {os.path.dirname(os.path.abspath(output_path(file_path))) for file_path in done}:
+                FsUtil.fsync_directory(directory)
+            for file_path in done:
+                os.remove(file_path)
+        return time.perf_counter() - start, errors
+
+    @staticmethod
+    def run_files(root, digests, mode, workers, compression, durability, iterations):
+        """
+        直接调用加密/解密工作函数，只处理对应大小的文件：pool 为小文件分批走进程池，chunked 为大文件在文件内部并行
+        :return: (参与的文件数, 字节数, 加密后字节数, 加密耗时, 解密耗时, [错误])，没有对应文件时返回 None
+        """
+        pooled = mode == "pool"
+        sizes = {file_path: os.path.getsize(file_path) for file_path in digests}
+        file_paths = [file_path for file_path, size in sizes.items() if (size < PARALLEL_THRESHOLD) == pooled]
+        if not file_paths:
+            return None
+        batch_size = EncryptThread.BATCH_FILES if pooled else 1
+        salt = os.urandom(SALT_SIZE)
+        key = KEY_CACHE.get(BENCHMARK_PASSWORD, salt, iterations, 32)
+        encrypt_batches = [([(file_path, None, None) for file_path in file_paths[i:i + batch_size]],
+                            key, salt, iterations, COMPRESSIONS[compression], durability, False)
+                           for i in range(0, len(file_paths), batch_size)]
+        encrypt_seconds, encrypt_errors = FileEncryptorBenchmark.run_batches(
+            encrypt_files_worker, encrypt_batches, workers, pooled, lambda file_path: file_path + ".enc", durability)
+        enc_paths = [file_path + ".enc" for file_path in file_paths if os.path.exists(file_path + ".enc")]
+        encrypted_bytes = sum(os.path.getsize(enc_path) for enc_path in enc_paths)
+        decrypt_batches = [(enc_paths[i:i + batch_size], BENCHMARK_PASSWORD, 32, durability)
+                           for i in range(0, len(enc_paths), batch_size)]
+        decrypt_seconds, decrypt_errors = FileEncryptorBenchmark.run_batches(
+            decrypt_files_worker, decrypt_batches, workers, pooled, lambda enc_path: enc_path[:-len(".enc")],
+            durability)
+        return (len(file_paths), sum(sizes[file_path] for file_path in file_paths), encrypted_bytes,
+                encrypt_seconds, decrypt_seconds, encrypt_errors + decrypt_errors)
+
+    @staticmethod
+    def run_vault(root, digests, iterations):
+        """
+        把目录打包成保险库，再全部提取到旁边的目录，按相对路径校验提取结果
+        :return: (文件数, 字节数, 保险库字节数, 打包耗时, 提取耗时, [错误], 是否一致)
+        """
+        vault_path = root + VAULT_SUFFIX
+        extract_dir = root + "_extract"
+        try:
+            salt = os.urandom(SALT_SIZE)
+            key = KEY_CACHE.get(BENCHMARK_PASSWORD, salt, iterations, 32)
+            start = time.perf_counter()
+            file_count, pack_errors = CryptoVault.pack(root, vault_path, key, salt, iterations)
+            pack_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            with VaultReader(vault_path, BENCHMARK_PASSWORD) as reader:
+                extract_errors = reader.extract(extract_dir)
+            extract_seconds = time.perf_counter() - start
+            expected = {os.path.relpath(file_path, root): digest for file_path, digest in digests.items()}
+            extracted = {os.path.relpath(file_path, extract_dir): digest
+                         for file_path, digest in FileEncryptorBenchmark.digest_tree(extract_dir).items()}
+            return (file_count, sum(os.path.getsize(file_path) for file_path in digests), os.path.getsize(vault_path),
+                    pack_seconds, extract_seconds, pack_errors + extract_errors, extracted == expected)
+        finally:
+            FsUtil.remove_quietly(vault_path)
+            shutil.rmtree(extract_dir, ignore_errors=True)
+
+    @staticmethod
+    def run_case(root, digests, mode, workers, compression, durability, iterations):
+        """
+        对目录加密再解密一轮，解密后目录恢复原样，可以继续下一轮
+        :return: 单条结果，该运行方式在目录树中没有对应文件时返回 None
+        """
+        case_workers = 1 if mode == "single" else workers
+        verified = None
+        if mode == "single":
+            file_count = len(digests)
+            total_bytes = sum(os.path.getsize(file_path) for file_path in digests)
+            encrypt_seconds, encrypt_errors = FileEncryptorBenchmark.run_thread(EncryptThread(
+                root, BENCHMARK_PASSWORD, 32, case_workers, iterations, COMPRESSIONS[compression],
+                incremental=False, durability=durability))
+            encrypted_bytes = sum(os.path.getsize(file_path + ".enc") for file_path in digests
+                                  if os.path.exists(file_path + ".enc"))
+            decrypt_seconds, decrypt_errors = FileEncryptorBenchmark.run_thread(DecryptThread(
+                root, BENCHMARK_PASSWORD, 32, case_workers, durability=durability))
+            errors = encrypt_errors + decrypt_errors
+        elif mode == "vault":
+            (file_count, total_bytes, encrypted_bytes, encrypt_seconds, decrypt_seconds, errors,
+             verified) = FileEncryptorBenchmark.run_vault(root, digests, iterations)
+        else:
+            result = FileEncryptorBenchmark.run_files(root, digests, mode, workers, compression, durability,
+                                                      iterations)
+            if result is None:
+                return None
+            file_count, total_bytes, encrypted_bytes, encrypt_seconds, decrypt_seconds, errors = result
+        if verified is None:
+            verified = FileEncryptorBenchmark.digest_tree(root) == digests
+        return {
+            "mode": mode,
+            "workers": case_workers,
+            "compression": compression,
+            "durability": durability,
+            "files": file_count,
+            "bytes": total_bytes,
+            "encrypted_bytes": encrypted_bytes,
+            "encrypt": FileEncryptorBenchmark.rate(encrypt_seconds, total_bytes, file_count),
+            "decrypt": FileEncryptorBenchmark.rate(decrypt_seconds, total_bytes, file_count),
+            "verified": verified,
+            "errors": [f"{file_path}: {error}" for file_path, error in errors],
+        }
+
+    @staticmethod
+    def run(work_dir, trees=None, modes=None, compressions=("none",), durability=DURABILITY_END,
+            workers=None, scale=1.0, iterations=MIN_KDF_ITERATIONS):
+        """
+        运行基准测试
+        :param work_dir: 生成合成目录树的目录
+        :param trees: BENCHMARK_TREES 中的名称列表，为空时全部运行
+        :param modes: BENCHMARK_MODES 中的名称列表，为空时全部运行
+        :param scale: 小文件数量和大文件大小的缩放比例，大文件不小于 PARALLEL_THRESHOLD，保证会走分块并行
+        :return: 可直接序列化为 JSON 的结果
+        """
+        workers = workers or os.cpu_count() or 1
+        results = []
+        for tree in trees or list(BENCHMARK_TREES):
+            small_count, small_size, large_count, large_size = BENCHMARK_TREES[tree]
+            small_count = int(small_count * scale)
+            if large_count:
+                large_size = max(PARALLEL_THRESHOLD, int(large_size * scale))
+            root = os.path.join(work_dir, tree)
+            logger.info(f"生成目录树 {tree}：{small_count} 个小文件，{large_count} 个大文件")
+            digests = FileEncryptorBenchmark.generate_tree(root, small_count, small_size, large_count, large_size)
+            for compression in compressions:
+                for mode in modes or BENCHMARK_MODES:
+                    if mode in ("chunked", "vault") and compression != "none":
+                        continue
+                    logger.info(f"运行 {tree} / {mode} / {compression}")
+                    result = FileEncryptorBenchmark.run_case(root, digests, mode, workers, compression, durability,
+                                                            iterations)
+                    if result is None:
+                        logger.info(f"目录树 {tree} 中没有适用于 {mode} 的文件，已跳过")
+                        continue
+                    result["tree"] = tree
+                    results.append(result)
+                    if not result["verified"]:
+                        logger.error(f"往返校验失败：{tree} / {mode} / {compression}，{result['errors'][:5]}")
+            shutil.rmtree(root, ignore_errors=True)
+        return {
+            "app_version": FsConstants.VERSION,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "config": {
+                "workers": workers,
+                "scale": scale,
+                "durability": durability,
+                "iterations": iterations,
+                "parallel_threshold": PARALLEL_THRESHOLD,
+            },
+            "results": results,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="文件批量加密吞吐量基准测试")
+    parser.add_argument("-o", "--output", help="结果 JSON 文件，不指定时输出到标准输出")
+    parser.add_argument("--work-dir", help="生成测试文件的目录，默认使用临时目录")
+    parser.add_argument("--trees", nargs="+", choices=list(BENCHMARK_TREES), help="要测试的目录树")
+    parser.add_argument("--modes", nargs="+", choices=BENCHMARK_MODES, help="要测试的运行方式")
+    parser.add_argument("--compression", nargs="+", choices=list(COMPRESSIONS), default=["none"],
+                        help="加密前压缩算法，可以指定多个")
+    parser.add_argument("--durability", choices=DURABILITIES, default=DURABILITY_END, help="落盘策略")
+    parser.add_argument("--workers", type=int, help="并行进程数，默认等于 CPU 核心数")
+    parser.add_argument("--scale", type=float, default=1.0, help="测试数据规模的缩放比例")
+    parser.add_argument("--iterations", type=int, default=MIN_KDF_ITERATIONS, help="密钥派生迭代次数")
+    args = parser.parse_args(argv)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="fs_encrypt_benchmark_")
+    try:
+        report = FileEncryptorBenchmark.run(work_dir, args.trees, args.modes, args.compression, args.durability,
+                                            args.workers, args.scale, args.iterations)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text)
+    else:
+        print(text)
+    return 0 if all(result["verified"] and not result["errors"] for result in report["results"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,6 +7,7 @@ from loguru import logger
 
 from src.const.fs_constants import FsConstants
 from src.create_folder import CreateFolderApp
+from src.duplicate_finder import DuplicateFinderApp
 from src.file_comparator import FileComparatorApp
 from src.file_encryptor import FileEncryptorApp
 from src.file_generator import FileGeneratorApp
@@ -67,6 +68,7 @@ class FileToolApp(SubWindowWidget):
                 (FileGeneratorApp(), "文件生成"),
                 (FileComparatorApp(), "文件比较"),
                 (FileEncryptorApp(), "文件加密(递归)"),
+                (DuplicateFinderApp(), "重复文件"),
             ]),
         ]
 
@@ -1,14 +1,15 @@
-import hashlib
 import os
 import sys
-import zlib
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 from PySide6.QtCore import Qt, Signal, QThread
 from PySide6.QtGui import QIcon
 from PySide6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout,
-    QPushButton, QLabel, QFileDialog, QLineEdit, QTextEdit, QCheckBox
+    QPushButton, QLabel, QFileDialog, QLineEdit, QTextEdit, QCheckBox, QSpinBox, QComboBox
 )
+from fs_base.config_manager import ConfigManager
 from fs_base.message_util import MessageUtil
 from fs_base.widget import CustomProgressBar
 from loguru import logger
@@ -17,6 +18,11 @@ from src.const.color_constants import BLACK
 from src.const.font_constants import FontConstants
 from src.const.fs_constants import FsConstants
 from src.util.common_util import CommonUtil
+from src.util.hash_cache import HashCache, TreeHashCheckpoint
+from src.util.hash_util import (
+    HashUtil, hash_file_worker, HASH_TYPES, IO_MODES, IO_MODE_READINTO, BLOCK_SIZES_MB, DEFAULT_BLOCK_SIZE,
+    TREE_CHUNK_SIZE, TREE_HASH_NAME, MANIFEST_HASH_TYPES, QUICK_HASH_NAME
+)
 from src.widget.sub_window_widget import SubWindowWidget
 
 
@@ -24,57 +30,42 @@ class HashCalculatorThread(QThread):
     progress_signal = Signal(int)  # 用于更新进度条
     result_signal = Signal(dict, dict)  # 传递文件信息和哈希结果
 
-    def __init__(self, file_path, hash_types):
+    def __init__(self, file_path, hash_types, hash_cache=None, trust_cache=True,
+                 io_mode=IO_MODE_READINTO, block_size=DEFAULT_BLOCK_SIZE):
         super().__init__()
         self.file_path = file_path
         self.hash_types = hash_types
+        self.hash_cache = hash_cache
+        self.trust_cache = trust_cache
+        self.io_mode = io_mode
+        self.block_size = block_size
 
     def run(self):
         try:
             # 获取文件信息
             file_info = HashCalculatorApp.get_file_info(self.file_path)
 
-            # 计算哈希值
+            # 先查询缓存，只计算未命中的算法
             hashes = {}
-            file_size = os.path.getsize(self.file_path)
-            processed_size = 0
-
-            with open(self.file_path, "rb") as f:
-                while chunk := f.read(4096):  # 按 4KB 分块读取文件
-                    processed_size += len(chunk)
-
-                    # 根据选择计算哈希
-                    if "MD5" in self.hash_types:
-                        if "md5" not in hashes:
-                            hashes["md5"] = hashlib.md5()
-                        hashes["md5"].update(chunk)
-
-                    if "SHA1" in self.hash_types:
-                        if "sha1" not in hashes:
-                            hashes["sha1"] = hashlib.sha1()
-                        hashes["sha1"].update(chunk)
-
-                    if "SHA256" in self.hash_types:
-                        if "sha256" not in hashes:
-                            hashes["sha256"] = hashlib.sha256()
-                        hashes["sha256"].update(chunk)
-
-                    if "CRC32" in self.hash_types:
-                        if "crc32" not in hashes:
-                            hashes["crc32"] = 0
-                        hashes["crc32"] = zlib.crc32(chunk, hashes["crc32"])
-
-                    # 发出进度信号
-                    progress = int((processed_size / file_size) * 100)
-                    self.progress_signal.emit(progress)
+            if self.hash_cache:
+                cache_key = HashCache.file_key(self.file_path)
+                if self.trust_cache:
+                    hashes = self.hash_cache.lookup(cache_key, self.hash_types)
+            remaining_types = [hash_type for hash_type in self.hash_types if hash_type not in hashes]
+
+            # 读取与各算法的摘要计算在流水线中并行进行
+            self.last_progress = -1
+            if remaining_types:
+                computed = HashUtil.hash_file_pipeline(self.file_path, remaining_types, self.report_progress,
+                                                       self.io_mode, self.block_size)
+                if self.hash_cache:
+                    self.hash_cache.store(cache_key, computed)
+                hashes.update(computed)
+            else:
+                self.progress_signal.emit(100)
 
             # 格式化哈希值
-            results = {
-                "MD5": hashes["md5"].hexdigest() if "md5" in hashes else None,
-                "SHA1": hashes["sha1"].hexdigest() if "sha1" in hashes else None,
-                "SHA256": hashes["sha256"].hexdigest() if "sha256" in hashes else None,
-                "CRC32": format(hashes["crc32"] & 0xFFFFFFFF, "08x").upper() if "crc32" in hashes else None,
-            }
+            results = {hash_type: hashes.get(hash_type) for hash_type in HASH_TYPES}
 
             # 发出结果信号
             self.result_signal.emit(file_info, results)
@@ -82,11 +73,364 @@ class HashCalculatorThread(QThread):
         except Exception as e:
             MessageUtil.show_error_message(f"计算哈希失败：{str(e)}")
 
+    def report_progress(self, processed_size, file_size):
+        """仅在百分比变化时发出进度信号"""
+        progress = int(processed_size / file_size * 100) if file_size else 100
+        if progress != self.last_progress:
+            self.last_progress = progress
+            self.progress_signal.emit(progress)
+
+
+class BatchHashCalculatorThread(QThread):
+    progress_signal = Signal(int)  # 用于更新进度条
+    file_result_signal = Signal(str, dict, str)  # 单个文件完成：文件路径、哈希结果、错误信息
+    finished_signal = Signal(int, int)  # 全部完成：(成功数量, 失败数量)
+    error_signal = Signal(str)  # 进程池或收集文件失败，未能完成
+
+    def __init__(self, paths, hash_types, workers, hash_cache=None, trust_cache=True,
+                 io_mode=IO_MODE_READINTO, block_size=DEFAULT_BLOCK_SIZE):
+        super().__init__()
+        self.paths = paths
+        self.hash_types = hash_types
+        self.workers = workers
+        self.hash_cache = hash_cache
+        self.trust_cache = trust_cache
+        self.io_mode = io_mode
+        self.block_size = block_size
+        self.cache_keys = {}
+        self.cached_hashes = {}
+
+    def run(self):
+        try:
+            files = HashUtil.collect_files(self.paths)
+            total_files = len(files)
+            if total_files == 0:
+                self.finished_signal.emit(0, 0)
+                return
+
+            self.total_files = total_files
+            self.done_files = 0
+            self.success_count = 0
+            self.error_count = 0
+            self.last_progress = -1
+            # 多个文件分散到进程池，每个文件完成后立即回传结果
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                results = HashUtil.imap_unordered(executor, hash_file_worker, self.iter_jobs(files), self.workers)
+                for file_path, hashes, error in results:
+                    if not error and self.hash_cache:
+                        self.hash_cache.store(self.cache_keys.pop(file_path), hashes)
+                        hashes = {**hashes, **self.cached_hashes.pop(file_path, {})}
+                    self.report_file(file_path, hashes, error)
+
+            self.finished_signal.emit(self.success_count, self.error_count)
+        except Exception as e:
+            logger.error(f"批量计算哈希失败：{str(e)}")
+            self.error_signal.emit(str(e))
+
+    def iter_jobs(self, files):
+        """
+        惰性生成进程池任务，缓存全部命中的文件直接回传，不再提交
+        """
+        for file_path in files:
+            # 停止后不再提交新任务，已提交的任务完成后正常回传
+            if self.isInterruptionRequested():
+                return
+            if not self.hash_cache:
+                yield file_path, self.hash_types, self.io_mode, self.block_size
+                continue
+            try:
+                cache_key = HashCache.file_key(file_path)
+            except OSError as e:
+                self.report_file(file_path, {}, str(e))
+                continue
+            cached = self.hash_cache.lookup(cache_key, self.hash_types) if self.trust_cache else {}
+            remaining_types = [hash_type for hash_type in self.hash_types if hash_type not in cached]
+            if not remaining_types:
+                self.report_file(file_path, cached, None)
+                continue
+            self.cache_keys[file_path] = cache_key
+            if cached:
+                self.cached_hashes[file_path] = cached
+            yield file_path, remaining_types, self.io_mode, self.block_size
+
+    def report_file(self, file_path, hashes, error):
+        if error:
+            self.error_count += 1
+            self.cache_keys.pop(file_path, None)
+            self.cached_hashes.pop(file_path, None)
+            logger.warning(f"计算哈希失败：{file_path}，{error}")
+        else:
+            self.success_count += 1
+        self.file_result_signal.emit(file_path, hashes, error or "")
+
+        self.done_files += 1
+        progress = int(self.done_files / self.total_files * 100)
+        if progress != self.last_progress:
+            self.last_progress = progress
+            self.progress_signal.emit(progress)
+
+
+class TreeHashCalculatorThread(QThread):
+    progress_signal = Signal(int)  # 用于更新进度条
+    result_signal = Signal(dict, dict)  # 传递文件信息和哈希结果
+    interrupted_signal = Signal(str)  # 中断或失败时的说明
+
+    def __init__(self, file_path, workers, hash_cache, checkpoint, trust_cache=True,
+                 block_size=DEFAULT_BLOCK_SIZE):
+        super().__init__()
+        self.file_path = file_path
+        self.workers = workers
+        self.hash_cache = hash_cache
+        self.checkpoint = checkpoint
+        self.trust_cache = trust_cache
+        self.block_size = block_size
+        self.last_progress = -1
+
+    def run(self):
+        try:
+            file_info = HashCalculatorApp.get_file_info(self.file_path)
+            cache_key = HashCache.file_key(self.file_path)
+            root = None
+            if self.trust_cache:
+                root = self.hash_cache.lookup(cache_key, [TREE_HASH_NAME]).get(TREE_HASH_NAME)
+            if root is None:
+                root = self.compute_root(cache_key)
+                if root is None:
+                    return
+                self.hash_cache.store(cache_key, {TREE_HASH_NAME: root})
+
+            self.progress_signal.emit(100)
+            self.result_signal.emit(file_info, {TREE_HASH_NAME: root})
+        except Exception as e:
+            logger.error(f"计算树哈希失败：{e}")
+            self.interrupted_signal.emit(f"计算树哈希失败：{e}")
+
+    def compute_root(self, cache_key):
+        """
+        多线程并行计算各分块摘要，每完成一块写入检查点
+        :return: 十六进制根摘要，中断时返回 None
+        """
+        chunk_count = (cache_key[1] + TREE_CHUNK_SIZE - 1) // TREE_CHUNK_SIZE
+        chunks = self.checkpoint.load(cache_key, TREE_CHUNK_SIZE)
+        if not self.trust_cache:
+            chunks = {}
+        if chunks:
+            logger.info(f"从检查点继续计算树哈希：{self.file_path}，已完成 {len(chunks)}/{chunk_count} 块")
+        self.report_progress(len(chunks), chunk_count)
+
+        def iter_jobs():
+            for index in range(chunk_count):
+                # 停止后不再提交新分块，已在计算的分块完成后仍写入检查点
+                if self.isInterruptionRequested():
+                    return
+                if index not in chunks:
+                    yield self.file_path, index, TREE_CHUNK_SIZE, self.block_size
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = HashUtil.imap_unordered(executor, HashUtil.hash_tree_chunk, iter_jobs(), self.workers,
+                                              window=self.workers * 2)
+            for index, digest in results:
+                chunks[index] = digest
+                self.checkpoint.save(cache_key, TREE_CHUNK_SIZE, [(index, digest)])
+                self.report_progress(len(chunks), chunk_count)
+
+        if len(chunks) < chunk_count:
+            self.interrupted_signal.emit(f"已停止：完成 {len(chunks)}/{chunk_count} 个分块，"
+                                         f"检查点已保存，再次计算将从断点继续")
+            return None
+
+        self.checkpoint.clear(cache_key)
+        return HashUtil.merkle_root([chunks[index] for index in range(chunk_count)])
+
+    def report_progress(self, done_count, chunk_count):
+        progress = int(done_count / chunk_count * 100) if chunk_count else 100
+        if progress != self.last_progress:
+            self.last_progress = progress
+            self.progress_signal.emit(progress)
+
+
+class ManifestGenerateThread(QThread):
+    progress_signal = Signal(int)  # 用于更新进度条
+    finished_signal = Signal(str)  # 完成后的汇总信息
+    error_signal = Signal(str)
+
+    def __init__(self, root_directory, manifest_path, hash_type, workers,
+                 io_mode=IO_MODE_READINTO, block_size=DEFAULT_BLOCK_SIZE):
+        super().__init__()
+        self.root_directory = root_directory
+        self.manifest_path = manifest_path
+        self.hash_type = hash_type
+        self.workers = workers
+        self.io_mode = io_mode
+        self.block_size = block_size
+
+    def run(self):
+        try:
+            manifest_path = os.path.abspath(self.manifest_path)
+            files = [file_path for file_path in HashUtil.collect_files([self.root_directory])
+                     if os.path.abspath(file_path) != manifest_path]
+            total_files = len(files)
+            digests = {}
+            errors = []
+            last_progress = -1
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                jobs = ((file_path, [self.hash_type], self.io_mode, self.block_size) for file_path in files
+                        if not self.isInterruptionRequested())
+                for file_path, hashes, error in HashUtil.imap_unordered(executor, hash_file_worker, jobs, self.workers):
+                    relative_path = os.path.relpath(file_path, self.root_directory)
+                    if error:
+                        errors.append(relative_path)
+                        logger.warning(f"生成清单时读取失败：{file_path}，{error}")
+                    else:
+                        digests[relative_path] = hashes[self.hash_type].lower()
+
+                    progress = int((len(digests) + len(errors)) / total_files * 100)
+                    if progress != last_progress:
+                        last_progress = progress
+                        self.progress_signal.emit(progress)
+
+            if self.isInterruptionRequested():
+                self.finished_signal.emit("已停止，未写入清单")
+                return
+
+            # 按路径排序写出，清单内容不受完成顺序影响
+            with open(self.manifest_path, "w", encoding="utf-8", errors="surrogateescape", newline="\n") as f:
+                for relative_path in sorted(digests):
+                    f.write(HashUtil.format_manifest_line(digests[relative_path], relative_path))
+
+            summary = f"清单已生成：{self.manifest_path}\n{self.hash_type}，共 {len(digests)} 个文件"
+            if errors:
+                summary += f"，{len(errors)} 个文件读取失败未写入：\n" + "\n".join(errors[:100])
+            self.finished_signal.emit(summary)
+        except Exception as e:
+            logger.error(f"生成清单失败：{e}")
+            self.error_signal.emit(str(e))
+
+
+class ManifestVerifyThread(QThread):
+    progress_signal = Signal(int)  # 用于更新进度条
+    problem_signal = Signal(list)  # 分批回传问题行：不匹配、缺失、读取失败
+    finished_signal = Signal(str)  # 完成后的汇总信息
+    error_signal = Signal(str)
+
+    # 问题行攒够数量或超过间隔时间再发出，避免频繁刷新界面
+    FLUSH_COUNT = 200
+    FLUSH_INTERVAL = 0.2
+
+    def __init__(self, manifest_path, workers, io_mode=IO_MODE_READINTO, block_size=DEFAULT_BLOCK_SIZE):
+        super().__init__()
+        self.manifest_path = manifest_path
+        self.workers = workers
+        self.io_mode = io_mode
+        self.block_size = block_size
+        self.root_directory = os.path.dirname(os.path.abspath(manifest_path))
+        self.expected = {}
+        self.problems = []
+        self.last_flush = 0
+
+    def run(self):
+        try:
+            # 先数一遍行数用于进度，之后逐行流式读取，不把整个清单载入内存
+            with open(self.manifest_path, "r", encoding="utf-8", errors="surrogateescape") as f:
+                total_lines = max(1, sum(1 for _ in f))
+
+            counts = {"ok": 0, "mismatch": 0, "missing": 0, "error": 0}
+            last_progress = -1
+            done_lines = 0
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                results = HashUtil.imap_unordered(executor, hash_file_worker, self.iter_jobs(counts), self.workers)
+                for file_path, hashes, error in results:
+                    relative_path, digest = self.expected.pop(file_path)
+                    if error:
+                        status = "missing" if not os.path.exists(file_path) else "error"
+                        self.add_problem(f"{'缺失' if status == 'missing' else '读取失败'}: {relative_path}")
+                    elif next(iter(hashes.values())).lower() != digest:
+                        status = "mismatch"
+                        self.add_problem(f"不匹配: {relative_path}")
+                    else:
+                        status = "ok"
+                    counts[status] += 1
+
+                    done_lines = sum(counts.values())
+                    progress = min(100, int(done_lines / total_lines * 100))
+                    if progress != last_progress:
+                        last_progress = progress
+                        self.progress_signal.emit(progress)
+            self.flush_problems(force=True)
+
+            summary = (f"校验完成：通过 {counts['ok']} 个，不匹配 {counts['mismatch']} 个，"
+                       f"缺失 {counts['missing']} 个，读取失败 {counts['error']} 个")
+            if self.isInterruptionRequested():
+                summary = "已停止，" + summary
+            self.finished_signal.emit(summary)
+        except Exception as e:
+            logger.error(f"校验清单失败：{e}")
+            self.error_signal.emit(str(e))
+
+    def iter_jobs(self, counts):
+        """逐行读取清单并生成任务，格式错误的行直接记为问题"""
+        with open(self.manifest_path, "r", encoding="utf-8", errors="surrogateescape") as f:
+            for line_number, line in enumerate(f, 1):
+                if self.isInterruptionRequested():
+                    return
+                try:
+                    entry = HashUtil.parse_manifest_line(line)
+                except ValueError:
+                    counts["error"] += 1
+                    self.add_problem(f"格式错误: 第 {line_number} 行")
+                    continue
+                if entry is None:
+                    continue
+                digest, relative_path = entry
+                file_path = os.path.normpath(os.path.join(self.root_directory, relative_path))
+                if file_path in self.expected:
+                    # 同一文件在清单中出现多次，只校验一次在途任务
+                    counts["error"] += 1
+                    self.add_problem(f"重复条目: {relative_path}")
+                    continue
+                self.expected[file_path] = (relative_path, digest)
+                yield file_path, [MANIFEST_HASH_TYPES[len(digest)]], self.io_mode, self.block_size
+
+    def add_problem(self, message):
+        logger.warning(f"清单校验：{message}")
+        self.problems.append(message)
+        self.flush_problems()
+
+    def flush_problems(self, force=False):
+        now = time.monotonic()
+        if self.problems and (force or len(self.problems) >= self.FLUSH_COUNT
+                              or now - self.last_flush >= self.FLUSH_INTERVAL):
+            self.problem_signal.emit(self.problems)
+            self.problems = []
+            self.last_flush = now
+
+
+class IoBenchmarkThread(QThread):
+    result_signal = Signal(dict)  # {读取方式: MB/s}
+    error_signal = Signal(str)
+
+    def __init__(self, file_path, hash_type, block_size):
+        super().__init__()
+        self.file_path = file_path
+        self.hash_type = hash_type
+        self.block_size = block_size
+
+    def run(self):
+        try:
+            self.result_signal.emit(HashUtil.benchmark_io(self.file_path, self.hash_type, self.block_size))
+        except Exception as e:
+            logger.error(f"读取方式测速失败：{e}")
+            self.error_signal.emit(str(e))
+
 
 class HashCalculatorApp(SubWindowWidget):
+    # 校验清单时结果框最多显示的问题条数
+    MAX_DISPLAYED_PROBLEMS = 1000
 
     def __init__(self):
         super().__init__()
+        self.hash_cache = None
+        self.tree_checkpoint = None
         self.init_ui()
 
     def init_ui(self):
@@ -94,7 +438,7 @@ class HashCalculatorApp(SubWindowWidget):
 
         self.setWindowTitle(FsConstants.WINDOW_TITLE_HASH_CALCULATOR)
         self.setWindowIcon(QIcon(CommonUtil.get_ico_full_path()))
-        self.setFixedSize(500, 450)
+        self.setFixedSize(500, 600)
         self.setAcceptDrops(True)
 
         layout = QVBoxLayout()
@@ -105,7 +449,7 @@ class HashCalculatorApp(SubWindowWidget):
         title_label.setObjectName("app_title")
         layout.addWidget(title_label)
 
-        file_label = QLabel("选择的文件:")
+        file_label = QLabel("选择的文件(可多选文件或选择目录，多个路径用 ; 分隔):")
         layout.addWidget(file_label)
 
         file_layout = QHBoxLayout()
@@ -113,9 +457,45 @@ class HashCalculatorApp(SubWindowWidget):
         browse_button = QPushButton("选择")
         browse_button.setObjectName("browse_button")
         browse_button.clicked.connect(self.browse_file)
+        browse_folder_button = QPushButton("目录")
+        browse_folder_button.setObjectName("browse_button")
+        browse_folder_button.clicked.connect(self.browse_folder)
 
         file_layout.addWidget(self.file_path_entry)
         file_layout.addWidget(browse_button)
+        file_layout.addWidget(browse_folder_button)
+
+        # 批量模式并行进程数
+        worker_layout = QHBoxLayout()
+        worker_layout.addWidget(QLabel("批量并行进程数:"))
+        self.worker_spinbox = QSpinBox()
+        self.worker_spinbox.setRange(1, 64)
+        self.worker_spinbox.setValue(os.cpu_count() or 1)
+        worker_layout.addWidget(self.worker_spinbox)
+        worker_layout.addStretch()
+        # 不勾选时强制重新计算，结果仍会写入缓存
+        self.trust_cache_checkbox = QCheckBox("信任缓存")
+        self.trust_cache_checkbox.setChecked(True)
+        worker_layout.addWidget(self.trust_cache_checkbox)
+
+        # 读取方式与块大小，保存到配置文件，文件比较也使用同一设置
+        config_manager = ConfigManager()
+        io_layout = QHBoxLayout()
+        io_layout.addWidget(QLabel("读取方式:"))
+        self.io_mode_combo = QComboBox()
+        self.io_mode_combo.addItems(IO_MODES)
+        self.io_mode_combo.setCurrentText(config_manager.get_config(FsConstants.APP_HASH_IO_MODE_KEY))
+        self.io_mode_combo.currentTextChanged.connect(self.save_io_config)
+        io_layout.addWidget(self.io_mode_combo)
+        io_layout.addWidget(QLabel("块大小:"))
+        self.block_size_combo = QComboBox()
+        self.block_size_combo.addItems([f"{size} MB" for size in BLOCK_SIZES_MB])
+        self.block_size_combo.setCurrentText(f"{config_manager.get_config(FsConstants.APP_HASH_BLOCK_SIZE_KEY)} MB")
+        self.block_size_combo.currentTextChanged.connect(self.save_io_config)
+        io_layout.addWidget(self.block_size_combo)
+        self.benchmark_button = QPushButton("测速")
+        self.benchmark_button.clicked.connect(self.start_benchmark)
+        io_layout.addWidget(self.benchmark_button)
 
         # 哈希类型选择布局
         hash_selection_layout = QHBoxLayout()
@@ -127,17 +507,37 @@ class HashCalculatorApp(SubWindowWidget):
         self.sha256_checkbox.setChecked(True)
         self.crc32_checkbox = QCheckBox("CRC32")
         self.crc32_checkbox.setChecked(True)
+        self.quick_checkbox = QCheckBox("快速指纹")
+        self.quick_checkbox.setToolTip("只读取文件大小、头尾及内部采样，适合在完整校验前快速排除不同的文件")
 
         hash_selection_layout.addWidget(self.md5_checkbox)
         hash_selection_layout.addWidget(self.sha1_checkbox)
         hash_selection_layout.addWidget(self.sha256_checkbox)
         hash_selection_layout.addWidget(self.crc32_checkbox)
+        hash_selection_layout.addWidget(self.quick_checkbox)
+
+        # 树哈希：固定大小分块并行计算后合并为 Merkle 根，可中断续算，仅用于快速比对是否一致
+        self.tree_checkbox = QCheckBox(f"树哈希({TREE_CHUNK_SIZE // 1024 // 1024}MB分块，可续传)")
+        self.tree_checkbox.setToolTip("勾选后对单个文件只计算树哈希，与常规摘要不通用")
 
         # 按钮布局
         button_layout = QHBoxLayout()
         self.calculate_button = QPushButton("计算")
         self.calculate_button.clicked.connect(self.start_hash_calculation)
         button_layout.addWidget(self.calculate_button)
+        self.stop_button = QPushButton("停止")
+        self.stop_button.setEnabled(False)
+        self.stop_button.clicked.connect(self.stop_hash_calculation)
+        button_layout.addWidget(self.stop_button)
+
+        # 校验清单：与 sha256sum/md5sum 兼容
+        manifest_layout = QHBoxLayout()
+        self.generate_manifest_button = QPushButton("生成清单")
+        self.generate_manifest_button.clicked.connect(self.start_generate_manifest)
+        manifest_layout.addWidget(self.generate_manifest_button)
+        self.verify_manifest_button = QPushButton("校验清单")
+        self.verify_manifest_button.clicked.connect(self.start_verify_manifest)
+        manifest_layout.addWidget(self.verify_manifest_button)
 
         # 文件信息显示框
         self.file_info_text = QTextEdit()
@@ -148,8 +548,12 @@ class HashCalculatorApp(SubWindowWidget):
         # 布局组合
         layout.addLayout(file_layout)
         layout.addLayout(hash_selection_layout)
+        layout.addWidget(self.tree_checkbox)
+        layout.addLayout(worker_layout)
+        layout.addLayout(io_layout)
         layout.addWidget(self.file_info_text)
         layout.addLayout(button_layout)
+        layout.addLayout(manifest_layout)
         # 进度条
         self.progress_bar = CustomProgressBar()
         self.progress_bar.hide()
@@ -157,9 +561,14 @@ class HashCalculatorApp(SubWindowWidget):
         self.setLayout(layout)
 
     def browse_file(self):
-        file_path, _ = QFileDialog.getOpenFileName(self, "选择文件", "", "所有文件 (*.*)")
-        if file_path:
-            self.file_path_entry.setText(file_path)
+        file_paths, _ = QFileDialog.getOpenFileNames(self, "选择文件", "", "所有文件 (*.*)")
+        if file_paths:
+            self.file_path_entry.setText("; ".join(file_paths))
+
+    def browse_folder(self):
+        folder_path = QFileDialog.getExistingDirectory(self, "选择目录")
+        if folder_path:
+            self.file_path_entry.setText(folder_path)
 
     def dragEnterEvent(self, event):
         if event.mimeData().hasUrls():
@@ -169,18 +578,23 @@ class HashCalculatorApp(SubWindowWidget):
 
     def dropEvent(self, event):
         if event.mimeData().hasUrls():
-            file_path = event.mimeData().urls()[0].toLocalFile()
-            if os.path.isfile(file_path):
-                self.file_path_entry.setText(file_path)
+            paths = [url.toLocalFile() for url in event.mimeData().urls()]
+            paths = [path for path in paths if os.path.isfile(path) or os.path.isdir(path)]
+            if paths:
+                self.file_path_entry.setText("; ".join(paths))
             else:
-                MessageUtil.show_warning_message("拖入的不是有效文件！")
+                MessageUtil.show_warning_message("拖入的不是有效文件或目录！")
 
-    def start_hash_calculation(self):
-        file_path = self.file_path_entry.text()
-        if not file_path:
-            MessageUtil.show_warning_message("请先选择一个文件！")
-            return
+    def save_io_config(self):
+        """保存读取方式与块大小"""
+        config_manager = ConfigManager()
+        config_manager.set_config(FsConstants.APP_HASH_IO_MODE_KEY, self.io_mode_combo.currentText())
+        config_manager.set_config(FsConstants.APP_HASH_BLOCK_SIZE_KEY, self.get_block_size() // 1024 // 1024)
 
+    def get_block_size(self):
+        return int(self.block_size_combo.currentText().split()[0]) * 1024 * 1024
+
+    def get_hash_types(self):
         hash_types = []
         if self.md5_checkbox.isChecked():
             hash_types.append("MD5")
@@ -190,24 +604,203 @@ class HashCalculatorApp(SubWindowWidget):
             hash_types.append("SHA256")
         if self.crc32_checkbox.isChecked():
             hash_types.append("CRC32")
+        if self.quick_checkbox.isChecked():
+            hash_types.append(QUICK_HASH_NAME)
+        return hash_types
+
+    def start_benchmark(self):
+        """用选中的文件测试各读取方式的吞吐量"""
+        paths = self.get_selected_paths()
+        if len(paths) != 1 or not os.path.isfile(paths[0]):
+            MessageUtil.show_warning_message("请选择一个文件用于测速，文件越大结果越准确！")
+            return
+        hash_types = self.get_hash_types() or ["SHA256"]
+        self.benchmark_button.setEnabled(False)
+        self.calculate_button.setEnabled(False)
+        self.file_info_text.setText(f"正在测速（{hash_types[0]}，{self.block_size_combo.currentText()} 块）...")
+        self.benchmark_thread = IoBenchmarkThread(paths[0], hash_types[0], self.get_block_size())
+        self.benchmark_thread.result_signal.connect(self.display_benchmark)
+        self.benchmark_thread.error_signal.connect(self.benchmark_error)
+        self.benchmark_thread.start()
+
+    def display_benchmark(self, results):
+        fastest = max(results, key=results.get)
+        lines = [f"{io_mode}: {speed:.1f} MB/s{'（最快）' if io_mode == fastest else ''}"
+                 for io_mode, speed in results.items()]
+        self.file_info_text.append("\n".join(lines))
+        self.benchmark_button.setEnabled(True)
+        self.calculate_button.setEnabled(True)
 
-        if not hash_types:
+    def benchmark_error(self, error_msg):
+        self.file_info_text.append(f"测速失败: {error_msg}")
+        self.benchmark_button.setEnabled(True)
+        self.calculate_button.setEnabled(True)
+
+    def get_selected_paths(self):
+        """解析输入框中的一个或多个路径"""
+        return [path.strip() for path in self.file_path_entry.text().split(";") if path.strip()]
+
+    def start_hash_calculation(self):
+        paths = self.get_selected_paths()
+        if not paths:
+            MessageUtil.show_warning_message("请先选择一个文件！")
+            return
+        invalid_paths = [path for path in paths if not os.path.exists(path)]
+        if invalid_paths:
+            MessageUtil.show_warning_message(f"路径不存在：{invalid_paths[0]}")
+            return
+
+        tree_mode = self.tree_checkbox.isChecked()
+        if tree_mode and (len(paths) != 1 or not os.path.isfile(paths[0])):
+            MessageUtil.show_warning_message("树哈希模式只支持单个文件！")
+            return
+
+        hash_types = self.get_hash_types()
+        if not hash_types and not tree_mode:
             MessageUtil.show_warning_message("请至少选择一种哈希类型！")
             return
 
         self.calculate_button.setEnabled(False)
-        # 创建并启动线程
-        self.thread = HashCalculatorThread(file_path, hash_types)
+        self.file_info_text.clear()
+        if self.hash_cache is None:
+            self.hash_cache = HashCache()
+        self.hash_cache.reset_stats()
+        trust_cache = self.trust_cache_checkbox.isChecked()
+        io_mode = self.io_mode_combo.currentText()
+        block_size = self.get_block_size()
+        # 创建并启动线程：单个文件沿用原流程，多个文件或目录进入批量模式
+        if tree_mode:
+            if self.tree_checkpoint is None:
+                self.tree_checkpoint = TreeHashCheckpoint()
+            self.thread = TreeHashCalculatorThread(paths[0], self.worker_spinbox.value(), self.hash_cache,
+                                                   self.tree_checkpoint, trust_cache, block_size)
+            self.thread.result_signal.connect(self.display_file_info)
+            self.thread.interrupted_signal.connect(self.hash_interrupted)
+            self.stop_button.setEnabled(True)
+        elif len(paths) == 1 and os.path.isfile(paths[0]):
+            self.thread = HashCalculatorThread(paths[0], hash_types, self.hash_cache, trust_cache,
+                                               io_mode, block_size)
+            self.thread.result_signal.connect(self.display_file_info)
+        else:
+            self.thread = BatchHashCalculatorThread(paths, hash_types, self.worker_spinbox.value(),
+                                                    self.hash_cache, trust_cache, io_mode, block_size)
+            self.thread.file_result_signal.connect(self.append_file_result)
+            self.thread.finished_signal.connect(self.batch_finished)
+            self.thread.error_signal.connect(self.batch_error)
+            self.stop_button.setEnabled(True)
         self.thread.progress_signal.connect(self.progress_bar.update_progress)
-        self.thread.result_signal.connect(self.display_file_info)
         self.thread.start()
         self.progress_bar.show()
 
+    def start_generate_manifest(self):
+        """为选中的目录生成清单"""
+        paths = self.get_selected_paths()
+        if len(paths) != 1 or not os.path.isdir(paths[0]):
+            MessageUtil.show_warning_message("请先选择一个目录！")
+            return
+        hash_types = [hash_type for hash_type in ["SHA256", "SHA1", "MD5"] if hash_type in self.get_hash_types()]
+        if not hash_types:
+            MessageUtil.show_warning_message("清单只支持 SHA256、SHA1 或 MD5，请至少勾选一种！")
+            return
+        hash_type = hash_types[0]
+        default_path = os.path.join(paths[0], f"{hash_type}SUMS")
+        manifest_path, _ = QFileDialog.getSaveFileName(self, "保存清单", default_path, "所有文件 (*)")
+        if not manifest_path:
+            return
+
+        io_mode, block_size = self.io_mode_combo.currentText(), self.get_block_size()
+        self.file_info_text.setText(f"正在生成清单（{hash_type}）...")
+        self.thread = ManifestGenerateThread(paths[0], manifest_path, hash_type, self.worker_spinbox.value(),
+                                             io_mode, block_size)
+        self.start_manifest_thread()
+
+    def start_verify_manifest(self):
+        """按清单校验其所在目录下的文件"""
+        manifest_path, _ = QFileDialog.getOpenFileName(self, "选择清单", "", "所有文件 (*)")
+        if not manifest_path:
+            return
+
+        io_mode, block_size = self.io_mode_combo.currentText(), self.get_block_size()
+        self.file_info_text.setText(f"正在校验清单：{manifest_path}")
+        self.displayed_problems = 0
+        self.thread = ManifestVerifyThread(manifest_path, self.worker_spinbox.value(), io_mode, block_size)
+        self.thread.problem_signal.connect(self.append_manifest_problems)
+        self.start_manifest_thread()
+
+    def start_manifest_thread(self):
+        self.thread.progress_signal.connect(self.progress_bar.update_progress)
+        self.thread.finished_signal.connect(self.manifest_finished)
+        self.thread.error_signal.connect(self.manifest_error)
+        self.calculate_button.setEnabled(False)
+        self.generate_manifest_button.setEnabled(False)
+        self.verify_manifest_button.setEnabled(False)
+        self.stop_button.setEnabled(True)
+        self.thread.start()
+        self.progress_bar.show()
+
+    def append_manifest_problems(self, problems):
+        """结果框只显示前若干条问题，完整记录见日志"""
+        shown = problems[:max(0, self.MAX_DISPLAYED_PROBLEMS - self.displayed_problems)]
+        if shown:
+            self.file_info_text.append("\n".join(shown))
+        if len(shown) < len(problems) and self.displayed_problems <= self.MAX_DISPLAYED_PROBLEMS:
+            self.file_info_text.append(f"问题超过 {self.MAX_DISPLAYED_PROBLEMS} 条，其余只记录到日志")
+        self.displayed_problems += len(problems)
+
+    def manifest_finished(self, summary):
+        self.file_info_text.append(summary)
+        self.manifest_done()
+
+    def manifest_error(self, error_msg):
+        self.file_info_text.append(f"失败: {error_msg}")
+        self.manifest_done()
+
+    def manifest_done(self):
+        self.calculate_button.setEnabled(True)
+        self.generate_manifest_button.setEnabled(True)
+        self.verify_manifest_button.setEnabled(True)
+        self.stop_button.setEnabled(False)
+        self.progress_bar.hide()
+
     def display_file_info(self, file_info, hashes):
         info_text = "\n".join([f"{key}: {value}" for key, value in file_info.items()])
         hash_text = "\n".join([f"{key}: {value}" for key, value in hashes.items() if value])
-        self.file_info_text.setText(f"{info_text}\n\n{hash_text}")
+        self.file_info_text.setText(f"{info_text}\n\n{hash_text}\n\n{self.hash_cache.stats_text()}")
+        self.calculate_button.setEnabled(True)
+        self.stop_button.setEnabled(False)
+
+    def stop_hash_calculation(self):
+        """请求停止批量或树哈希计算"""
+        self.stop_button.setEnabled(False)
+        self.thread.requestInterruption()
+
+    def hash_interrupted(self, message):
+        """树哈希中断或失败"""
+        self.file_info_text.append(message)
+        self.calculate_button.setEnabled(True)
+        self.stop_button.setEnabled(False)
+        self.progress_bar.hide()
+
+    def append_file_result(self, file_path, hashes, error):
+        """批量模式下逐个追加文件结果"""
+        if error:
+            self.file_info_text.append(f"{file_path}\n失败: {error}\n")
+            return
+        hash_text = "\n".join([f"{key}: {value}" for key, value in hashes.items() if value])
+        self.file_info_text.append(f"{file_path}\n{hash_text}\n")
+
+    def batch_finished(self, success_count, error_count):
+        """批量模式完成"""
+        status = "已停止" if self.thread.isInterruptionRequested() else "完成"
+        self.file_info_text.append(f"{status}: 成功 {success_count} 个，失败 {error_count} 个")
+        self.file_info_text.append(self.hash_cache.stats_text())
         self.calculate_button.setEnabled(True)
+        self.stop_button.setEnabled(False)
+        self.progress_bar.hide()
+
+    def batch_error(self, error_msg):
+        """批量模式未能完成，已回传的文件结果保留在结果框中"""
+        self.hash_interrupted(f"失败: {error_msg}")
 
     @staticmethod
     def get_file_info(file_path):
@@ -1,16 +1,23 @@
 import os
-import shutil
 import sys
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 
 from PySide6.QtCore import Qt, Signal, QThread
 from PySide6.QtGui import QIcon
-from PySide6.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QFileDialog
+from PySide6.QtWidgets import (
+    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QFileDialog, QSpinBox, QCheckBox
+)
+from fs_base.message_util import MessageUtil
 from fs_base.widget import CustomProgressBar, TransparentTextBox
 from loguru import logger
 
 from src.const.font_constants import FontConstants
 from src.const.fs_constants import FsConstants
 from src.util.common_util import CommonUtil
+from src.util.copy_engine import DEFAULT_COPY_STREAMS, PARALLEL_COPY_THRESHOLD, move_file_worker
+from src.util.hash_util import HashUtil
 from src.widget.sub_window_widget import SubWindowWidget
 
 
@@ -58,6 +65,20 @@ class MoveFileApp(SubWindowWidget):
         dest_layout.addWidget(self.dest_entry)
         dest_layout.addWidget(browse_dest_button)
 
+        # 跨磁盘移动（例如移动到 NAS）时需要复制，多个文件同时复制才能跑满网络带宽
+        option_layout = QHBoxLayout()
+        option_layout.addWidget(QLabel("并行复制数:"))
+        self.worker_spinbox = QSpinBox()
+        self.worker_spinbox.setRange(1, 64)
+        self.worker_spinbox.setValue(8)
+        self.worker_spinbox.setToolTip("跨磁盘移动时同时复制的小文件数，大文件在文件内部分段并行复制")
+        option_layout.addWidget(self.worker_spinbox)
+        self.verify_checkbox = QCheckBox("复制后校验")
+        self.verify_checkbox.setToolTip("跨磁盘移动时比较源文件和目标文件的 SHA256，一致后才删除源文件；\n"
+                                        "需要把目标文件完整读回一次")
+        option_layout.addWidget(self.verify_checkbox)
+        option_layout.addStretch()
+
         # 操作按钮
         button_layout = QHBoxLayout()
         start_button = QPushButton("开始")
@@ -70,7 +91,7 @@ class MoveFileApp(SubWindowWidget):
         layout.addLayout(src_layout)
         layout.addWidget(dest_label)
         layout.addLayout(dest_layout)
-
+        layout.addLayout(option_layout)
 
         layout.addLayout(button_layout)
         self.progress_bar = CustomProgressBar()
@@ -107,16 +128,27 @@ class MoveFileApp(SubWindowWidget):
             return
 
         self.setEnabled(False)
-        self.worker_thread = FileMoveThread(src_folder, dest_folder)
+        self.file_errors = []
+        self.worker_thread = FileMoveThread(src_folder, dest_folder, self.worker_spinbox.value(),
+                                            self.verify_checkbox.isChecked())
         self.worker_thread.progress_signal.connect(self.progress_bar.update_progress)
+        self.worker_thread.file_errors.connect(self.collect_file_errors)
         self.worker_thread.finished_signal.connect(self.operation_finished)
         self.worker_thread.error_signal.connect(self.operation_error)
         self.worker_thread.start()
         self.progress_bar.show()
 
+    def collect_file_errors(self, errors):
+        self.file_errors = errors
+
     def operation_finished(self):
         self.setEnabled(True)
         self.progress_bar.hide()
+        if self.file_errors:
+            details = "\n".join(f"{file_path}: {error}" for file_path, error in self.file_errors)
+            MessageUtil.show_message("警告", f"{len(self.file_errors)} 个文件移动失败，源文件已保留，其余文件已移动完成。",
+                                     message_type="warning", details=details)
+            return
         self.show_message("成功", "文件移动完成！")
 
     def operation_error(self, error_msg):
@@ -133,60 +165,154 @@ class MoveFileApp(SubWindowWidget):
 
 
 
+class DestinationNameIndex:
+    """
+    目标目录的文件名索引：开始前扫描一次目标目录，之后重名判断和序号分配都在内存中完成。
+    每个 (文件名, 扩展名) 记录下一个可用序号，大量同名文件也不必从 1 开始逐个尝试
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        # 已占用的文件名（比较用的形式）
+        self.names = set()
+        # (文件名, 扩展名) 的比较形式 -> 下一个尝试的序号
+        self.next_counters = {}
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                self.names.add(self.name_key(entry.name))
+
+    @staticmethod
+    def name_key(name):
+        """
+        文件名的比较形式，与文件系统判断重名的规则一致：
+        Windows 不区分大小写（normcase），macOS 默认不区分大小写且按 Unicode 规范化后比较
+        """
+        if sys.platform == "darwin":
+            return unicodedata.normalize("NFC", name).casefold()
+        return os.path.normcase(name)
+
+    def reserve(self, file_name):
+        """
+        为文件分配目标目录中不重名的路径并标记为已占用，重名时在扩展名前加 _序号
+        :return: 目标路径
+        """
+        key = self.name_key(file_name)
+        if key not in self.names:
+            self.names.add(key)
+            return os.path.join(self.directory, file_name)
+
+        base, ext = os.path.splitext(file_name)
+        counter_key = (self.name_key(base), self.name_key(ext))
+        counter = self.next_counters.get(counter_key, 1)
+        # 目标目录中原本就有 xxx_1 这类文件时跳过它们，之后从记录的位置继续
+        while self.name_key(f"{base}_{counter}{ext}") in self.names:
+            counter += 1
+        unique_name = f"{base}_{counter}{ext}"
+        self.names.add(self.name_key(unique_name))
+        self.next_counters[counter_key] = counter + 1
+        return os.path.join(self.directory, unique_name)
+
+
 class FileMoveThread(QThread):
+    """
+    移动目录下的所有文件到保存目录：与保存目录在同一设备上的文件直接改名；
+    其他文件由 CopyEngine 复制后再删除源文件，小文件在线程池中并行复制，大文件逐个处理、在文件内部分段并行
+    """
     progress_signal = Signal(int)
-
+    file_errors = Signal(list)  # 移动失败的文件 [(文件路径, 错误信息)]
     finished_signal = Signal()
     error_signal = Signal(str)
 
-    def __init__(self, src_folder, dest_folder):
+    def __init__(self, src_folder, dest_folder, workers=8, verify=False):
         super().__init__()
         self.src_folder = src_folder
         self.dest_folder = dest_folder
+        self.workers = max(1, workers)
+        self.verify = verify
+        self.lock = threading.Lock()
+        self.total_bytes = 0
+        self.done_bytes = 0
+        self.last_progress = -1
+
+    @staticmethod
+    def collect_files(folder):
+        """
+        收集普通文件和符号链接（链接本身，不跟随），其他类型（管道、设备文件等）不移动
+        :return: ([(文件路径, 大小, 所在设备)], [(未移动的路径, 原因)])
+        """
+        files = []
+        skipped = []
+        stack = [folder]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False) or entry.is_symlink():
+                        stat = entry.stat(follow_symlinks=False)
+                        files.append((entry.path, stat.st_size, stat.st_dev))
+                    else:
+                        skipped.append((entry.path, "不是普通文件或符号链接，未移动"))
+        return files, skipped
+
+    def add_progress(self, byte_count):
+        """按已移动字节数更新进度，复制线程中也会调用"""
+        with self.lock:
+            self.done_bytes += byte_count
+            progress = int(self.done_bytes / max(self.total_bytes, 1) * 100)
+            if progress == self.last_progress:
+                return
+            self.last_progress = progress
+        self.progress_signal.emit(min(progress, 100))
 
     def run(self):
         try:
             logger.info("---- 开始移动文件 ----")
-            files_to_move = []
-            for root, _, files in os.walk(self.src_folder):
-                for file in files:
-                    files_to_move.append(os.path.join(root, file))
-
-            total_files = len(files_to_move)
-            if total_files == 0:
+            files_to_move, errors = self.collect_files(self.src_folder)
+            if not files_to_move:
+                if errors:
+                    self.file_errors.emit(errors)
                 self.finished_signal.emit()
                 return
-
-            for index, src_path in enumerate(files_to_move):
-                file_name = os.path.basename(src_path)
-                dest_path = os.path.join(self.dest_folder, file_name)
-
-                # 如果文件已存在，重命名目标文件
-                dest_path = self.get_unique_path(dest_path)
-
-                shutil.move(src_path, dest_path)
-                logger.info(f"移动文件：{src_path} -> {dest_path}")
-
-                # 更新进度
-                progress = int((index + 1) / total_files * 100)
-                self.progress_signal.emit(progress)
-
+            self.total_bytes = sum(size for _, size, _ in files_to_move)
+            dest_device = os.stat(self.dest_folder).st_dev
+
+            # 扫描一次目标目录，之后在内存中处理重名；目标路径在分发任务前统一分配，并行复制时不会冲突
+            name_index = DestinationNameIndex(self.dest_folder)
+            renames, small_copies, large_copies = [], [], []
+            for src_path, size, device in files_to_move:
+                dest_path = name_index.reserve(os.path.basename(src_path))
+                if device == dest_device:
+                    renames.append((src_path, dest_path, True, 1, self.verify, self.add_progress))
+                elif size >= PARALLEL_COPY_THRESHOLD:
+                    large_copies.append((src_path, dest_path, False, DEFAULT_COPY_STREAMS, self.verify,
+                                         self.add_progress))
+                else:
+                    small_copies.append((src_path, dest_path, False, 1, self.verify, self.add_progress))
+            logger.info(f"同设备改名 {len(renames)} 个，跨设备复制 {len(small_copies) + len(large_copies)} 个文件")
+
+            def handle(result):
+                src_path, dest_path, error = result
+                if error:
+                    logger.warning(f"移动文件失败：{src_path}，{error}")
+                    errors.append((src_path, error))
+                else:
+                    logger.info(f"移动文件：{src_path} -> {dest_path}")
+
+            for job in renames + large_copies:
+                handle(move_file_worker(*job))
+            if small_copies:
+                with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                    for result in HashUtil.imap_unordered(executor, move_file_worker, small_copies, self.workers):
+                        handle(result)
+
+            if errors:
+                self.file_errors.emit(errors)
             self.finished_signal.emit()
         except Exception as e:
             logger.error(f"文件移动时出现异常：{e}")
             self.error_signal.emit(str(e))
 
-    @staticmethod
-    def get_unique_path(dest_path):
-        """
-        如果目标路径已存在，生成一个唯一的文件名。
-        """
-        base, ext = os.path.splitext(dest_path)
-        counter = 1
-        while os.path.exists(dest_path):
-            dest_path = f"{base}_{counter}{ext}"
-            counter += 1
-        return dest_path
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
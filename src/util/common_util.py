@@ -4,8 +4,10 @@ import datetime
 import socket
 
 from fs_base.base_util import BaseUtil
+from fs_base.config_manager import ConfigManager
 from loguru import logger
 from src.const.fs_constants import FsConstants
+from src.util.hash_util import IO_MODES, IO_MODE_READINTO
 
 
 class CommonUtil(BaseUtil):
@@ -36,4 +38,29 @@ class CommonUtil(BaseUtil):
     def get_sqlite_dir():
         # 使用内置配置路径
         data_path = CommonUtil.get_external_path()
-        return os.path.join(data_path, FsConstants.EXTERNAL_DATABASE_FILE)
\ No newline at end of file
+        return os.path.join(data_path, FsConstants.EXTERNAL_DATABASE_FILE)
+
+    # 获得SQLite数据库路径，首选项未配置时使用默认路径
+    @staticmethod
+    def get_sqlite_path():
+        sqlite_path = ConfigManager().get_config(FsConstants.APP_SQLITE_PATH_KEY)
+        return sqlite_path or CommonUtil.get_sqlite_dir()
+
+    # 获得哈希读取方式和块大小(字节)
+    @staticmethod
+    def get_hash_io_config():
+        config_manager = ConfigManager()
+        io_mode = config_manager.get_config(FsConstants.APP_HASH_IO_MODE_KEY)
+        block_size_mb = config_manager.get_config(FsConstants.APP_HASH_BLOCK_SIZE_KEY)
+        if io_mode not in IO_MODES:
+            io_mode = IO_MODE_READINTO
+        return io_mode, max(1, block_size_mb or 1) * 1024 * 1024
+
+    # 将字节数格式化为易读的大小
+    @staticmethod
+    def format_size(size):
+        for unit in ("B", "KB", "MB", "GB"):
+            if size < 1024:
+                return f"{size:.0f} {unit}" if unit == "B" else f"{size:.2f} {unit}"
+            size /= 1024
+        return f"{size:.2f} TB"
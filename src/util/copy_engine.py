@@ -0,0 +1,159 @@
+import errno
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from src.util.fs_util import FsUtil
+from src.util.hash_util import HashUtil
+
+# 复制时先写入带该后缀的临时文件，复制、同步、校验都完成后再改名，中断时不会留下不完整的目标文件
+COPY_TEMP_SUFFIX = ".fscopy.tmp"
+# 每次系统调用复制的字节数
+COPY_BLOCK_SIZE = 8 * 1024 * 1024
+# 不小于该大小的文件按区间分成多路并行复制
+PARALLEL_COPY_THRESHOLD = 256 * 1024 * 1024
+DEFAULT_COPY_STREAMS = 4
+# copy_file_range 在这些错误下表示当前文件系统组合不支持，改用 pread/pwrite
+KERNEL_COPY_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP}
+
+
+class CopyEngine:
+    """
+    跨设备移动文件：同一设备上直接改名；否则复制到临时文件，同步到磁盘、可选校验后改名，最后才删除源文件。
+    复制优先使用 os.copy_file_range，数据不经过用户态，NFS/SMB 等支持服务器端复制时甚至不经过网络；
+    大文件分成几个区间并行复制，多路并发能更好地利用网络存储的带宽
+    """
+
+    @staticmethod
+    def positional_supported():
+        return hasattr(os, "pread") and hasattr(os, "pwrite")
+
+    @staticmethod
+    def copy_range(src_fd, dst_fd, offset, length, progress_callback=None):
+        """
+        把源文件 [offset, offset+length) 复制到目标文件的相同位置，不依赖文件的读写位置，多个线程可以同时复制不同区间
+        :param progress_callback: 每复制一块回调本次复制的字节数
+        """
+        end = offset + length
+        use_kernel_copy = hasattr(os, "copy_file_range")
+        while offset < end:
+            count = min(COPY_BLOCK_SIZE, end - offset)
+            if use_kernel_copy:
+                try:
+                    copied = os.copy_file_range(src_fd, dst_fd, count, offset, offset)
+                except OSError as e:
+                    if e.errno not in KERNEL_COPY_UNSUPPORTED:
+                        raise
+                    use_kernel_copy = False
+                    continue
+            else:
+                data = os.pread(src_fd, count, offset)
+                copied = len(data)
+                view = memoryview(data)
+                position = offset
+                while view:
+                    written = os.pwrite(dst_fd, view, position)
+                    view = view[written:]
+                    position += written
+            if not copied:
+                raise OSError(errno.EIO, "源文件在复制过程中被截断")
+            offset += copied
+            if progress_callback:
+                progress_callback(copied)
+
+    @staticmethod
+    def split_ranges(file_size, streams):
+        """按 COPY_BLOCK_SIZE 对齐把文件分成最多 streams 个区间，空文件没有区间"""
+        if file_size <= 0:
+            return []
+        blocks = -(-file_size // COPY_BLOCK_SIZE)
+        per_stream = -(-blocks // max(1, streams)) * COPY_BLOCK_SIZE
+        return [(offset, min(per_stream, file_size - offset)) for offset in range(0, file_size, per_stream)]
+
+    @staticmethod
+    def copy_file(src_path, dst_path, streams=1, verify=False, progress_callback=None):
+        """
+        复制单个文件并复制修改时间和权限，内容和目录项都同步到磁盘后才返回，之后删除源文件是安全的
+        :param streams: 文件不小于 PARALLEL_COPY_THRESHOLD 时并行复制的区间数
+        :param verify: 复制后比较源文件和目标文件的 SHA256
+        :param progress_callback: 回调本次复制的字节数，可能在多个线程中调用
+        """
+        temp_path = dst_path + COPY_TEMP_SUFFIX
+        try:
+            file_size = os.path.getsize(src_path)
+            if CopyEngine.positional_supported():
+                with open(src_path, "rb", buffering=0) as src, open(temp_path, "wb", buffering=0) as dst:
+                    src_fd, dst_fd = src.fileno(), dst.fileno()
+                    if streams > 1 and file_size >= PARALLEL_COPY_THRESHOLD:
+                        # 先设定文件长度，各区间按偏移写入
+                        os.ftruncate(dst_fd, file_size)
+                        ranges = CopyEngine.split_ranges(file_size, streams)
+                        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+                            futures = [executor.submit(CopyEngine.copy_range, src_fd, dst_fd, offset, length,
+                                                       progress_callback) for offset, length in ranges]
+                            for future in futures:
+                                future.result()
+                    else:
+                        CopyEngine.copy_range(src_fd, dst_fd, 0, file_size, progress_callback)
+                    os.fsync(dst_fd)
+            else:
+                # 不支持按偏移读写的平台（Windows）使用 shutil.copyfile，由它选择平台的快速复制方式
+                shutil.copyfile(src_path, temp_path)
+                with open(temp_path, "rb+") as dst:
+                    os.fsync(dst.fileno())
+                if progress_callback:
+                    progress_callback(file_size)
+            shutil.copystat(src_path, temp_path)
+            if os.path.getsize(temp_path) != file_size:
+                raise OSError(errno.EIO, "复制后文件大小不一致")
+            if verify and HashUtil.hash_file(src_path, ["SHA256"]) != HashUtil.hash_file(temp_path, ["SHA256"]):
+                raise OSError(errno.EIO, "复制校验失败，源文件与目标文件内容不一致")
+            FsUtil.commit_temp(temp_path, dst_path, durable=True)
+        except BaseException:
+            FsUtil.remove_quietly(temp_path)
+            raise
+
+    @staticmethod
+    def copy_symlink(src_path, dst_path):
+        """在目标位置创建指向相同目标的符号链接，链接本身不跟随"""
+        target = os.readlink(src_path)
+        # Windows 创建指向目录的链接时需要指明
+        os.symlink(target, dst_path, target_is_directory=os.path.isdir(src_path))
+
+    @staticmethod
+    def move_file(src_path, dst_path, same_device=True, streams=1, verify=False, progress_callback=None):
+        """
+        移动单个文件或符号链接，调用方需保证目标路径不存在；符号链接跨设备时按原样重建链接，不复制其指向的内容
+        :param same_device: 源文件与目标目录在同一设备上时先尝试直接改名
+        :return: 是否通过改名完成
+        """
+        file_size = os.lstat(src_path).st_size
+        if same_device:
+            try:
+                os.rename(src_path, dst_path)
+                if progress_callback:
+                    progress_callback(file_size)
+                return True
+            except OSError:
+                pass
+        if os.path.islink(src_path):
+            CopyEngine.copy_symlink(src_path, dst_path)
+            FsUtil.fsync_directory(os.path.dirname(os.path.abspath(dst_path)))
+            if progress_callback:
+                progress_callback(file_size)
+        else:
+            CopyEngine.copy_file(src_path, dst_path, streams, verify, progress_callback)
+        os.remove(src_path)
+        return False
+
+
+def move_file_worker(src_path, dst_path, same_device=True, streams=1, verify=False, progress_callback=None):
+    """
+    线程池工作函数，单个文件失败不抛出异常
+    :return: (源文件路径, 目标路径, 错误信息或 None)
+    """
+    try:
+        CopyEngine.move_file(src_path, dst_path, same_device, streams, verify, progress_callback)
+        return src_path, dst_path, None
+    except Exception as e:
+        return src_path, dst_path, str(e)
@@ -0,0 +1,653 @@
+import hashlib
+import lzma
+import os
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from Crypto.Cipher import AES
+from Crypto.Hash import SHA256
+from Crypto.Protocol.KDF import PBKDF2
+from Crypto.Util.Padding import unpad
+
+from src.util.fs_util import FsUtil
+from src.util.hash_util import HashUtil
+
+# 分块加密容器格式：
+#   文件头：魔数、版本、密钥派生算法与迭代次数、密钥长度、分块大小、随机 nonce 前缀、盐，
+#          版本 2 在盐之后多一个字节记录压缩算法
+#   记录：标志(1 字节) + 密文长度(4 字节) + 密文 + GCM 标签(16 字节)
+#   启用压缩时每个分块先压缩再加密，压缩无效的分块保持原样，由记录标志区分，记录长度因此不固定
+# 每个分块独立做 AES-GCM 认证，nonce 为 nonce 前缀 + 分块序号；
+# 附加认证数据包含完整文件头、分块序号和标志，因此分块不能被重排、替换到其他文件，
+# 最后一块带结束标志，截断的文件无法通过校验
+CONTAINER_MAGIC = b"FSENC\x00"
+CONTAINER_VERSION = 1
+CONTAINER_VERSION_COMPRESSED = 2
+KDF_PBKDF2_SHA256 = 1
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_KDF_ITERATIONS = 100000
+# 旧版本使用的固定盐，只用于解密旧格式文件
+LEGACY_SALT = b"fs_tool_salt"
+SALT_SIZE = 16
+# 校准迭代次数时的下限与默认目标耗时
+MIN_KDF_ITERATIONS = 100000
+DEFAULT_KDF_TARGET_SECONDS = 0.5
+# 派生密钥在内存中的缓存时间
+KEY_CACHE_TTL = 10 * 60
+NONCE_PREFIX_SIZE = 8
+TAG_SIZE = 16
+RECORD_FINAL = 0x01
+# 0x02 由保险库的索引记录使用
+RECORD_ZLIB = 0x04
+RECORD_LZMA = 0x08
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_LZMA = 2
+COMPRESSION_FLAGS = {COMPRESSION_ZLIB: RECORD_ZLIB, COMPRESSION_LZMA: RECORD_LZMA}
+# 压缩探测：先用最快的 zlib 压缩分块开头的样本，压缩率达不到要求的分块直接按原样加密
+COMPRESSION_PROBE_SIZE = 64 * 1024
+COMPRESSION_PROBE_RATIO = 0.9
+# 压缩后至少要比原数据小这个比例才保留压缩结果
+COMPRESSION_MIN_SAVING = 0.05
+# 本身已经压缩过的文件格式，不再尝试压缩
+COMPRESSED_EXTENSIONS = {
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".avif",
+    ".mp3", ".aac", ".ogg", ".flac", ".m4a", ".opus",
+    ".mp4", ".mkv", ".mov", ".avi", ".webm", ".wmv", ".flv",
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".7z", ".rar", ".zst", ".lz4", ".br",
+    ".docx", ".xlsx", ".pptx", ".jar", ".apk", ".enc", ".fsvault",
+}
+HEADER_STRUCT = struct.Struct("<6sBBIBI8sB")
+RECORD_STRUCT = struct.Struct("<BI")
+AAD_STRUCT = struct.Struct("<QB")
+# 旧格式（IV + AES-CBC）流式解密时每次读取的字节数，必须是 16 的倍数
+LEGACY_READ_SIZE = 1024 * 1024
+# 输出先写入带该后缀的临时文件，写完后再改名，崩溃时不会留下不完整的目标文件
+TEMP_SUFFIX = ".fstmp"
+# 落盘策略：输出文件的内容总在写完时同步，策略决定目录项何时同步、源文件何时删除：
+# 每个文件同步目录后立即删除源文件；每处理一批文件同步一次目录再删除这批源文件；全部完成后统一同步再删除
+DURABILITY_FILE = "file"
+DURABILITY_BATCH = "batch"
+DURABILITY_END = "end"
+DEFAULT_SYNC_BATCH = 1000
+# 不小于该大小的文件在文件内部按分块并行加密/解密
+PARALLEL_THRESHOLD = 64 * 1024 * 1024
+# 并行时每个任务连续处理的分块数
+PARALLEL_TASK_CHUNKS = 8
+# 密钥校验值的上下文前缀，校验值记录在加密清单中，用于确认已有的 .enc 文件由当前密码生成
+KEY_CHECK_CONTEXT = b"fs_tool key check"
+
+
+class ContainerHeader:
+    """
+    容器文件头，同一个文件的所有分块共用
+    """
+    def __init__(self, salt, iterations=DEFAULT_KDF_ITERATIONS, key_length=32, chunk_size=DEFAULT_CHUNK_SIZE,
+                 nonce_prefix=None, kdf=KDF_PBKDF2_SHA256, version=None, magic=CONTAINER_MAGIC,
+                 compression=COMPRESSION_NONE):
+        # 魔数区分单文件容器和保险库，且在附加认证数据中，两者的分块不能互换
+        self.magic = magic
+        # 不压缩时仍写版本 1，旧版本程序可以解密
+        self.version = version or (CONTAINER_VERSION_COMPRESSED if compression else CONTAINER_VERSION)
+        self.compression = compression
+        self.kdf = kdf
+        self.iterations = iterations
+        self.key_length = key_length
+        self.chunk_size = chunk_size
+        # 同一密钥会加密很多文件，nonce 前缀必须每个文件随机生成
+        self.nonce_prefix = nonce_prefix or os.urandom(NONCE_PREFIX_SIZE)
+        self.salt = salt
+        self.packed = self.pack()
+
+    def pack(self):
+        return HEADER_STRUCT.pack(self.magic, self.version, self.kdf, self.iterations, self.key_length,
+                                  self.chunk_size, self.nonce_prefix, len(self.salt)) + self.salt + (
+            bytes([self.compression]) if self.version >= CONTAINER_VERSION_COMPRESSED else b"")
+
+    @property
+    def fixed_records(self):
+        """除最后一块外记录长度是否固定，固定时才能按偏移并行处理"""
+        return self.compression == COMPRESSION_NONE
+
+    @staticmethod
+    def read(file, magic=CONTAINER_MAGIC):
+        """
+        从文件开头读取文件头
+        :param magic: 期望的魔数
+        :return: ContainerHeader，不是容器格式时返回 None 并把读取位置恢复到开头
+        """
+        data = file.read(HEADER_STRUCT.size)
+        if len(data) < HEADER_STRUCT.size or not data.startswith(magic):
+            file.seek(0)
+            return None
+        magic, version, kdf, iterations, key_length, chunk_size, nonce_prefix, salt_length = \
+            HEADER_STRUCT.unpack(data)
+        if version not in (CONTAINER_VERSION, CONTAINER_VERSION_COMPRESSED) or kdf != KDF_PBKDF2_SHA256:
+            raise ValueError(f"不支持的加密文件版本：{version}")
+        salt = file.read(salt_length)
+        if len(salt) < salt_length:
+            raise ValueError("加密文件头不完整")
+        compression = COMPRESSION_NONE
+        if version >= CONTAINER_VERSION_COMPRESSED:
+            data = file.read(1)
+            if not data:
+                raise ValueError("加密文件头不完整")
+            compression = data[0]
+            if compression not in COMPRESSION_FLAGS:
+                raise ValueError(f"不支持的压缩算法：{compression}")
+        return ContainerHeader(salt, iterations, key_length, chunk_size, nonce_prefix, kdf, version, magic,
+                               compression)
+
+    def nonce(self, index):
+        return self.nonce_prefix + struct.pack("<I", index)
+
+
+class KeyCache:
+    """
+    派生密钥的内存缓存，按 (盐, 迭代次数, 密钥长度, 密码的 SHA256) 索引，超时自动失效。
+    同一次加密的所有文件共用一个盐，解密时只需为每个不同的盐派生一次密钥
+    """
+    def __init__(self, ttl=KEY_CACHE_TTL):
+        self.ttl = ttl
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def cache_key(password, salt, iterations, key_length):
+        return salt, iterations, key_length, hashlib.sha256(password.encode("utf-8")).digest()
+
+    def get(self, password, salt, iterations, key_length):
+        """
+        :param key_length: 密钥字节数
+        :return: 缓存中的密钥，没有则派生后放入缓存
+        """
+        cache_key = self.cache_key(password, salt, iterations, key_length)
+        now = time.monotonic()
+        with self.lock:
+            for expired in [k for k, (_, expires) in self.entries.items() if expires <= now]:
+                del self.entries[expired]
+            entry = self.entries.get(cache_key)
+            if entry:
+                return entry[0]
+        # 派生耗时较长，不持有锁，同一密钥偶尔被重复派生也不影响结果
+        key = derive_key(password, salt, iterations, key_length)
+        with self.lock:
+            self.entries[cache_key] = (key, time.monotonic() + self.ttl)
+        return key
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def derive_key(password, salt, iterations=DEFAULT_KDF_ITERATIONS, key_length=32):
+    """
+    通过 PBKDF2-SHA256 派生密钥
+    :param key_length: 密钥字节数
+    """
+    return PBKDF2(password, salt, dkLen=key_length, count=iterations, hmac_hash_module=SHA256)
+
+
+def calibrate_iterations(target_seconds=DEFAULT_KDF_TARGET_SECONDS, key_length=32):
+    """
+    测量本机 PBKDF2 速度，计算派生一次密钥约耗时 target_seconds 的迭代次数
+    :return: 取整到千位且不低于 MIN_KDF_ITERATIONS 的迭代次数
+    """
+    probe = 10000
+    while True:
+        start = time.perf_counter()
+        derive_key("calibration", os.urandom(SALT_SIZE), probe, key_length)
+        elapsed = time.perf_counter() - start
+        # 测量时间太短时误差大，加大迭代次数重新测量
+        if elapsed >= 0.05 or probe >= 10000000:
+            break
+        probe *= 4
+    iterations = int(probe * target_seconds / max(elapsed, 1e-6))
+    return max(MIN_KDF_ITERATIONS, round(iterations / 1000) * 1000)
+
+
+def key_check_value(key):
+    """密钥的校验值，只能用来比较两个密钥是否相同，不能反推出密钥"""
+    return hashlib.sha256(KEY_CHECK_CONTEXT + key).hexdigest()
+
+
+# 每个进程一份，进程池中的工作进程各自缓存
+KEY_CACHE = KeyCache()
+
+
+class PositionalFile:
+    """
+    按偏移读写文件，多个线程互不干扰：
+    支持 os.pread/os.pwrite 的平台直接按偏移读写，不共享文件位置；其他平台加锁后 seek 再读写
+    """
+    def __init__(self, file):
+        self.file = file
+        self.fd = file.fileno()
+        self.lock = threading.Lock()
+        self.positional = hasattr(os, "pread") and hasattr(os, "pwrite")
+
+    def read_at(self, offset, length):
+        if not self.positional:
+            with self.lock:
+                self.file.seek(offset)
+                return self.file.read(length)
+        data = os.pread(self.fd, length, offset)
+        # 普通文件只有到达末尾才会少读，这里仍按短读处理
+        while 0 < len(data) < length:
+            more = os.pread(self.fd, length - len(data), offset + len(data))
+            if not more:
+                break
+            data += more
+        return data
+
+    def write_at(self, offset, data):
+        if not self.positional:
+            with self.lock:
+                self.file.seek(offset)
+                self.file.write(data)
+            return
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(self.fd, view, offset)
+            view = view[written:]
+            offset += written
+
+
+class OrderedHasher:
+    """
+    并行加密时分块乱序完成，按分块序号顺序更新哈希对象，明文不必再读一遍。
+    领先最早未完成分块 limit 个以上的分块先等待，缓冲的明文不超过 limit 个分块；
+    某个任务失败时调用 abort 唤醒所有等待的线程
+    """
+    def __init__(self, hasher, limit):
+        self.hasher = hasher
+        self.limit = limit
+        self.next_index = 0
+        self.pending = {}
+        self.aborted = False
+        self.condition = threading.Condition()
+
+    def wait_turn(self, index):
+        with self.condition:
+            self.condition.wait_for(lambda: self.aborted or index - self.next_index < self.limit)
+            if self.aborted:
+                raise ValueError("并行加密已中止")
+
+    def update(self, index, data):
+        with self.condition:
+            self.pending[index] = data
+            while self.next_index in self.pending:
+                self.hasher.update(self.pending.pop(self.next_index))
+                self.next_index += 1
+            self.condition.notify_all()
+
+    def abort(self):
+        with self.condition:
+            self.aborted = True
+            self.condition.notify_all()
+
+
+class CryptoContainer:
+
+    @staticmethod
+    def seal_record(key, header, index, flags, data):
+        """加密一个分块，返回完整的记录字节"""
+        cipher = AES.new(key, AES.MODE_GCM, nonce=header.nonce(index), mac_len=TAG_SIZE)
+        cipher.update(header.packed + AAD_STRUCT.pack(index, flags))
+        ciphertext, tag = cipher.encrypt_and_digest(data)
+        return RECORD_STRUCT.pack(flags, len(ciphertext)) + ciphertext + tag
+
+    @staticmethod
+    def open_record(key, header, index, flags, ciphertext, tag):
+        """解密并校验一个分块"""
+        cipher = AES.new(key, AES.MODE_GCM, nonce=header.nonce(index), mac_len=TAG_SIZE)
+        cipher.update(header.packed + AAD_STRUCT.pack(index, flags))
+        try:
+            return cipher.decrypt_and_verify(ciphertext, tag)
+        except ValueError:
+            raise ValueError("密码错误或加密文件已损坏") from None
+
+    @staticmethod
+    def compress_chunk(data, compression):
+        """
+        按文件头指定的算法压缩一个分块，样本压缩率不够或压缩后没有明显变小时返回原数据
+        :return: (数据, 压缩标志)
+        """
+        if compression == COMPRESSION_NONE or not data:
+            return data, 0
+        sample = data[:COMPRESSION_PROBE_SIZE]
+        if len(zlib.compress(sample, 1)) > len(sample) * COMPRESSION_PROBE_RATIO:
+            return data, 0
+        if compression == COMPRESSION_LZMA:
+            compressed = lzma.compress(data, preset=6)
+        else:
+            compressed = zlib.compress(data, 6)
+        if len(compressed) > len(data) * (1 - COMPRESSION_MIN_SAVING):
+            return data, 0
+        return compressed, COMPRESSION_FLAGS[compression]
+
+    @staticmethod
+    def decompress_chunk(data, flags, header):
+        """解压一个分块，解压结果不能超过分块大小"""
+        compression_flags = flags & (RECORD_ZLIB | RECORD_LZMA)
+        if not compression_flags:
+            return data
+        if compression_flags != COMPRESSION_FLAGS.get(header.compression):
+            raise ValueError("加密文件已损坏")
+        try:
+            if compression_flags == RECORD_LZMA:
+                decompressor = lzma.LZMADecompressor()
+                plaintext = decompressor.decompress(data, header.chunk_size + 1)
+            else:
+                decompressor = zlib.decompressobj()
+                plaintext = decompressor.decompress(data, header.chunk_size + 1)
+        except (lzma.LZMAError, zlib.error):
+            raise ValueError("加密文件已损坏") from None
+        if len(plaintext) > header.chunk_size or not decompressor.eof:
+            raise ValueError("加密文件已损坏")
+        return plaintext
+
+    @staticmethod
+    def encrypt_stream(src, dst, key, header, progress_callback=None, hasher=None):
+        """
+        流式加密，内存中最多同时保留两个分块
+        :param src: 以二进制方式打开的明文文件
+        :param dst: 以二进制方式打开的输出文件
+        :param key: 密钥
+        :param header: ContainerHeader
+        :param progress_callback: 每写完一个分块回调已读取的明文字节数
+        :param hasher: 不为空时同时用明文更新该哈希对象，省去单独读一遍文件
+        """
+        dst.write(header.packed)
+        chunk_size = header.chunk_size
+        current = src.read(chunk_size)
+        index = 0
+        done = 0
+        while True:
+            # 预读下一块才能判断当前块是否为最后一块
+            following = src.read(chunk_size) if len(current) == chunk_size else b""
+            if hasher:
+                hasher.update(current)
+            payload, flags = CryptoContainer.compress_chunk(current, header.compression)
+            if not following:
+                flags |= RECORD_FINAL
+            dst.write(CryptoContainer.seal_record(key, header, index, flags, payload))
+            done += len(current)
+            if progress_callback:
+                progress_callback(done)
+            if flags & RECORD_FINAL:
+                return
+            current = following
+            index += 1
+
+    @staticmethod
+    def iter_records(src, header):
+        """
+        依次读取记录，不解密
+        :return: 生成 (分块序号, 标志, 密文, 标签)
+        """
+        index = 0
+        while True:
+            prefix = src.read(RECORD_STRUCT.size)
+            if len(prefix) < RECORD_STRUCT.size:
+                raise ValueError("加密文件不完整")
+            flags, length = RECORD_STRUCT.unpack(prefix)
+            if length > header.chunk_size:
+                raise ValueError("加密文件已损坏")
+            body = src.read(length + TAG_SIZE)
+            if len(body) < length + TAG_SIZE:
+                raise ValueError("加密文件不完整")
+            yield index, flags, body[:length], body[length:]
+            if flags & RECORD_FINAL:
+                if src.read(1):
+                    raise ValueError("加密文件末尾存在多余数据")
+                return
+            index += 1
+
+    @staticmethod
+    def decrypt_stream(src, dst, key, header, progress_callback=None):
+        """
+        流式解密容器格式，src 的读取位置应在文件头之后
+        """
+        done = 0
+        for index, flags, ciphertext, tag in CryptoContainer.iter_records(src, header):
+            plaintext = CryptoContainer.open_record(key, header, index, flags, ciphertext, tag)
+            plaintext = CryptoContainer.decompress_chunk(plaintext, flags, header)
+            dst.write(plaintext)
+            done += len(plaintext)
+            if progress_callback:
+                progress_callback(done)
+
+    @staticmethod
+    def decrypt_legacy_stream(src, dst, key):
+        """
+        流式解密旧格式（16 字节 IV + AES-CBC + PKCS7 填充），
+        最后一段明文留到读完后去除填充
+        """
+        iv = src.read(AES.block_size)
+        if len(iv) < AES.block_size:
+            raise ValueError("加密文件不完整")
+        cipher = AES.new(key, AES.MODE_CBC, iv)
+        previous = b""
+        while block := src.read(LEGACY_READ_SIZE):
+            dst.write(previous)
+            previous = cipher.decrypt(block)
+        try:
+            dst.write(unpad(previous, AES.block_size))
+        except ValueError:
+            raise ValueError("密码错误或加密文件已损坏") from None
+
+    @staticmethod
+    def run_parallel(count, workers, task):
+        """
+        把 count 个分块按 PARALLEL_TASK_CHUNKS 一组分给线程池，在途任务数有上限，内存占用固定。
+        AES 和 pread/pwrite 执行时都会释放 GIL，线程即可利用多核
+        :param task: task(起始分块序号, 结束分块序号)
+        """
+        jobs = ((first, min(first + PARALLEL_TASK_CHUNKS, count)) for first in range(0, count, PARALLEL_TASK_CHUNKS))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for _ in HashUtil.imap_unordered(executor, task, jobs, workers, window=workers * 2):
+                pass
+
+    @staticmethod
+    def encrypt_parallel(src, dst, key, header, file_size, workers, hasher=None):
+        """
+        文件内并行加密：除最后一块外每条记录长度固定，可以直接算出每个分块的输出位置，
+        各线程独立读取、加密并按偏移写回
+        :param hasher: 不为空时按分块顺序用明文更新该哈希对象
+        """
+        chunk_size = header.chunk_size
+        record_size = RECORD_STRUCT.size + chunk_size + TAG_SIZE
+        base = len(header.packed)
+        count = max(1, -(-file_size // chunk_size))
+        dst.write(header.packed)
+        reader = PositionalFile(src)
+        writer = PositionalFile(dst)
+        ordered = OrderedHasher(hasher, workers * PARALLEL_TASK_CHUNKS * 2) if hasher else None
+
+        def task(first, last):
+            try:
+                for index in range(first, last):
+                    if ordered:
+                        ordered.wait_turn(index)
+                    final = index == count - 1
+                    data = reader.read_at(index * chunk_size, chunk_size)
+                    if len(data) != (file_size - index * chunk_size if final else chunk_size):
+                        raise ValueError("文件在加密过程中被修改")
+                    flags = RECORD_FINAL if final else 0
+                    writer.write_at(base + index * record_size,
+                                    CryptoContainer.seal_record(key, header, index, flags, data))
+                    if ordered:
+                        ordered.update(index, data)
+            except BaseException:
+                if ordered:
+                    ordered.abort()
+                raise
+
+        CryptoContainer.run_parallel(count, workers, task)
+
+    @staticmethod
+    def decrypt_parallel(src, dst, key, header, file_size, workers):
+        """
+        文件内并行解密，由文件大小推算记录数和每条记录的位置，
+        每条记录的长度和结束标志都会校验，布局不符即视为损坏
+        """
+        chunk_size = header.chunk_size
+        record_size = RECORD_STRUCT.size + chunk_size + TAG_SIZE
+        base = len(header.packed)
+        payload = file_size - base
+        count = max(1, -(-payload // record_size))
+        last_record_size = payload - (count - 1) * record_size
+        if last_record_size < RECORD_STRUCT.size + TAG_SIZE:
+            raise ValueError("加密文件不完整")
+        reader = PositionalFile(src)
+        writer = PositionalFile(dst)
+
+        def task(first, last):
+            for index in range(first, last):
+                final = index == count - 1
+                length = last_record_size if final else record_size
+                record = reader.read_at(base + index * record_size, length)
+                flags, ciphertext_length = RECORD_STRUCT.unpack_from(record)
+                if bool(flags & RECORD_FINAL) != final or ciphertext_length != length - RECORD_STRUCT.size - TAG_SIZE:
+                    raise ValueError("加密文件已损坏")
+                plaintext = CryptoContainer.open_record(key, header, index, flags,
+                                                        record[RECORD_STRUCT.size:length - TAG_SIZE],
+                                                        record[length - TAG_SIZE:])
+                writer.write_at(index * chunk_size, plaintext)
+
+        CryptoContainer.run_parallel(count, workers, task)
+
+    @staticmethod
+    def encrypt_file(src_path, dst_path, key, header, workers=1, hasher=None, durable=False):
+        """
+        加密单个文件，先写临时文件再改名为目标文件，失败时只删除临时文件
+        :param workers: 大于 1、文件不小于 PARALLEL_THRESHOLD 且不压缩时在文件内部并行
+        :param hasher: 不为空时用明文更新该哈希对象
+        :param durable: 改名后同步所在目录；文件内容总是在关闭前同步，批量提交时只需再同步目录
+        """
+        temp_path = dst_path + TEMP_SUFFIX
+        try:
+            file_size = os.path.getsize(src_path)
+            with open(src_path, "rb", buffering=0) as src, open(temp_path, "wb", buffering=0) as dst:
+                if workers > 1 and file_size >= PARALLEL_THRESHOLD and header.fixed_records:
+                    CryptoContainer.encrypt_parallel(src, dst, key, header, file_size, workers, hasher)
+                else:
+                    CryptoContainer.encrypt_stream(src, dst, key, header, hasher=hasher)
+                os.fsync(dst.fileno())
+            FsUtil.commit_temp(temp_path, dst_path, durable)
+        except BaseException:
+            FsUtil.remove_quietly(temp_path)
+            raise
+
+    @staticmethod
+    def decrypt_file(src_path, dst_path, key_provider, workers=1, durable=False):
+        """
+        解密单个文件，自动识别容器格式与旧格式，先写临时文件再改名为目标文件，失败时只删除临时文件
+        :param key_provider: key_provider(文件头) 返回密钥，旧格式文件传入 None
+        :param workers: 大于 1、文件不小于 PARALLEL_THRESHOLD 且记录长度固定时在文件内部并行
+        :param durable: 改名后同步所在目录；文件内容总是在关闭前同步，批量提交时只需再同步目录
+        """
+        temp_path = dst_path + TEMP_SUFFIX
+        try:
+            file_size = os.path.getsize(src_path)
+            with open(src_path, "rb", buffering=0) as src, open(temp_path, "wb", buffering=0) as dst:
+                header = ContainerHeader.read(src)
+                key = key_provider(header)
+                if header and workers > 1 and file_size >= PARALLEL_THRESHOLD and header.fixed_records:
+                    CryptoContainer.decrypt_parallel(src, dst, key, header, file_size, workers)
+                elif header:
+                    CryptoContainer.decrypt_stream(src, dst, key, header)
+                else:
+                    CryptoContainer.decrypt_legacy_stream(src, dst, key)
+                os.fsync(dst.fileno())
+            FsUtil.commit_temp(temp_path, dst_path, durable)
+        except BaseException:
+            FsUtil.remove_quietly(temp_path)
+            raise
+
+
+def encrypt_files_worker(file_jobs, key, salt, iterations, compression=COMPRESSION_NONE,
+                         durability=DURABILITY_FILE, with_record=False, chunk_workers=1):
+    """
+    进程池工作函数，依次加密一批文件，成功后删除原文件，必须定义在模块顶层以便序列化
+    :param file_jobs: [(文件路径, 已有 .enc 对应的明文摘要或 None, 已有 .enc 的密钥校验值或 None)]，
+                      摘要不为空时先计算文件摘要，一致说明内容未变，直接删除原文件而不重新加密；
+                      调用方需先确认已有 .enc 由当前密码生成
+    :param key: 由 salt 和 iterations 派生的密钥
+    :param salt: 本次加密的随机盐，与迭代次数一起写入每个文件的文件头
+    :param compression: 加密前的压缩算法，已压缩格式的文件（按扩展名判断）不压缩
+    :param durability: 为 DURABILITY_FILE 时同步 .enc 所在目录后立即删除原文件，
+                       其他策略下原文件由调用方在批量同步目录之后删除
+    :param with_record: 是否计算明文摘要并返回清单记录，不使用加密清单时省去摘要计算
+    :param chunk_workers: 大文件在文件内部并行的线程数
+    :return: [(文件路径, 错误信息或 None, 清单记录或 None)]，
+             清单记录为 (大小, 修改时间ns, SHA256 摘要, .enc 大小, .enc 修改时间ns, 密钥校验值)
+    """
+    key_check = key_check_value(key) if with_record else None
+    results = []
+    for file_path, known_digest, known_key_check in file_jobs:
+        try:
+            # 读取内容前获取文件信息，加密过程中文件被修改时下次会重新比较摘要
+            stat = os.stat(file_path)
+            enc_path = file_path + ".enc"
+            if known_digest and HashUtil.hash_file(file_path, ["SHA256"])["SHA256"] == known_digest:
+                digest, file_key_check = known_digest, known_key_check
+            else:
+                file_key_check = key_check
+                file_compression = compression
+                if os.path.splitext(file_path)[1].lower() in COMPRESSED_EXTENSIONS:
+                    file_compression = COMPRESSION_NONE
+                header = ContainerHeader(salt, iterations, len(key), compression=file_compression)
+                hasher = HashUtil.new_hasher("SHA256") if with_record else None
+                CryptoContainer.encrypt_file(file_path, enc_path, key, header, chunk_workers, hasher,
+                                             durability == DURABILITY_FILE)
+                digest = hasher.hexdigest() if hasher else None
+            record = None
+            if with_record:
+                enc_stat = os.stat(enc_path)
+                record = (stat.st_size, stat.st_mtime_ns, digest, enc_stat.st_size, enc_stat.st_mtime_ns,
+                          file_key_check)
+            if durability == DURABILITY_FILE:
+                os.remove(file_path)
+            results.append((file_path, None, record))
+        except Exception as e:
+            results.append((file_path, str(e), None))
+    return results
+
+
+def container_key_provider(password, legacy_key_length):
+    """
+    按文件头中的盐、迭代次数和密钥长度派生（或从缓存取出）密钥；
+    旧格式文件没有文件头，使用固定盐和界面上选择的密钥长度
+    """
+    def provide(header):
+        if header is None:
+            return KEY_CACHE.get(password, LEGACY_SALT, DEFAULT_KDF_ITERATIONS, legacy_key_length)
+        return KEY_CACHE.get(password, header.salt, header.iterations, header.key_length)
+    return provide
+
+
+def decrypt_files_worker(file_paths, password, legacy_key_length, durability=DURABILITY_FILE, chunk_workers=1):
+    """
+    进程池工作函数，依次解密一批 .enc 文件，成功后删除加密文件
+    :param legacy_key_length: 旧格式文件的密钥字节数
+    :param durability: 为 DURABILITY_FILE 时同步解密结果所在目录后立即删除加密文件，其他策略下由调用方删除
+    :param chunk_workers: 大文件在文件内部并行的线程数
+    :return: [(文件路径, 错误信息或 None, None)]，与加密的结果格式一致
+    """
+    key_provider = container_key_provider(password, legacy_key_length)
+    results = []
+    for file_path in file_paths:
+        try:
+            CryptoContainer.decrypt_file(file_path, file_path[:-len(".enc")], key_provider, chunk_workers,
+                                         durability == DURABILITY_FILE)
+            if durability == DURABILITY_FILE:
+                os.remove(file_path)
+            results.append((file_path, None, None))
+        except Exception as e:
+            results.append((file_path, str(e), None))
+    return results
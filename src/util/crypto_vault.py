@@ -0,0 +1,262 @@
+import json
+import os
+import struct
+import zlib
+
+from loguru import logger
+
+from src.util.crypto_container import (
+    ContainerHeader, CryptoContainer, KEY_CACHE, DEFAULT_CHUNK_SIZE, RECORD_FINAL, RECORD_STRUCT, TAG_SIZE, TEMP_SUFFIX
+)
+from src.util.fs_util import FsUtil
+
+# 保险库格式：把整个目录打包成一个加密文件
+#   文件头：与分块加密容器相同，魔数不同
+#   数据记录：所有文件内容首尾相接组成一条数据流，按分块大小切分加密，除最后一块外长度固定，
+#            因此任意偏移所在的记录位置都能直接算出，提取单个文件只需解密它覆盖的几个分块
+#   索引记录：zlib 压缩的 JSON 索引 [[相对路径, 大小, 修改时间ns, 数据流偏移]]，分块序号接在数据记录之后，
+#            带 RECORD_INDEX 标志，最后一块带结束标志
+#   尾部：魔数、数据分块数、索引起始偏移（明文，索引记录的序号与标志都经过认证，篡改后无法解密）
+VAULT_MAGIC = b"FSVLT\x00"
+VAULT_SUFFIX = ".fsvault"
+TRAILER_MAGIC = b"FSVTRL\x00\x00"
+TRAILER_STRUCT = struct.Struct("<8sQQ")
+RECORD_INDEX = 0x02
+
+
+class CryptoVault:
+
+    @staticmethod
+    def collect_files(root, exclude=()):
+        """
+        递归收集目录下的文件
+        :param exclude: 不打包的文件绝对路径（例如保险库自身）
+        :return: [("/" 分隔的相对路径, 绝对路径, 大小)]
+        """
+        files = []
+        stack = [("", root)]
+        while stack:
+            prefix, directory = stack.pop()
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    rel_path = prefix + entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append((rel_path + "/", entry.path))
+                    elif entry.is_file(follow_symlinks=False) and os.path.abspath(entry.path) not in exclude:
+                        files.append((rel_path, entry.path, entry.stat(follow_symlinks=False).st_size))
+        return files
+
+    @staticmethod
+    def pack(root, vault_path, key, salt, iterations, chunk_size=DEFAULT_CHUNK_SIZE,
+             progress_callback=None, is_interrupted=None):
+        """
+        把目录下的所有文件顺序写入一个保险库，先写临时文件，同步到磁盘后再替换目标文件
+        :param key: 由 salt 和 iterations 派生的密钥
+        :param progress_callback: 回调 (已读取字节数, 总字节数)
+        :param is_interrupted: 返回 True 时停止并删除临时文件
+        :return: (打包的文件数, [(文件路径, 错误信息)])，被中断时返回 None
+        """
+        temp_path = vault_path + TEMP_SUFFIX
+        files = CryptoVault.collect_files(root, {os.path.abspath(vault_path), os.path.abspath(temp_path)})
+        total_bytes = sum(size for _, _, size in files)
+        header = ContainerHeader(salt, iterations, len(key), chunk_size, magic=VAULT_MAGIC)
+        entries = []
+        errors = []
+        buffer = bytearray()
+        chunk_index = 0
+        offset = 0
+        try:
+            with open(temp_path, "wb") as out:
+                out.write(header.packed)
+
+                def write_full_chunks():
+                    nonlocal chunk_index
+                    while len(buffer) >= chunk_size:
+                        out.write(CryptoContainer.seal_record(key, header, chunk_index, 0, bytes(buffer[:chunk_size])))
+                        del buffer[:chunk_size]
+                        chunk_index += 1
+
+                for rel_path, file_path, _ in files:
+                    if is_interrupted and is_interrupted():
+                        break
+                    start = offset
+                    try:
+                        with open(file_path, "rb") as src:
+                            mtime_ns = os.fstat(src.fileno()).st_mtime_ns
+                            while data := src.read(chunk_size):
+                                buffer += data
+                                offset += len(data)
+                                write_full_chunks()
+                                if progress_callback:
+                                    progress_callback(offset, total_bytes)
+                    except OSError as e:
+                        # 已读入的部分留在数据流中，不写入索引即可
+                        logger.warning(f"打包文件失败：{file_path}，{str(e)}")
+                        errors.append((file_path, str(e)))
+                        continue
+                    entries.append((rel_path, offset - start, mtime_ns, start))
+
+                if is_interrupted and is_interrupted():
+                    out.close()
+                    FsUtil.remove_quietly(temp_path)
+                    return None
+
+                if buffer:
+                    out.write(CryptoContainer.seal_record(key, header, chunk_index, 0, bytes(buffer)))
+                    chunk_index += 1
+                data_chunks = chunk_index
+                index_offset = out.tell()
+                index_json = json.dumps(entries, ensure_ascii=False, separators=(",", ":"))
+                index_data = zlib.compress(index_json.encode("utf-8"))
+                pieces = [index_data[i:i + chunk_size] for i in range(0, len(index_data), chunk_size)]
+                for i, piece in enumerate(pieces):
+                    flags = RECORD_INDEX | (RECORD_FINAL if i == len(pieces) - 1 else 0)
+                    out.write(CryptoContainer.seal_record(key, header, data_chunks + i, flags, piece))
+                out.write(TRAILER_STRUCT.pack(TRAILER_MAGIC, data_chunks, index_offset))
+                out.flush()
+                os.fsync(out.fileno())
+            FsUtil.commit_temp(temp_path, vault_path, durable=True)
+        except BaseException:
+            FsUtil.remove_quietly(temp_path)
+            raise
+        return len(entries), errors
+
+
+class VaultReader:
+    """
+    读取保险库：打开时只解密索引，提取文件时按偏移定位并解密需要的分块
+    """
+
+    def __init__(self, vault_path, password):
+        self.file = open(vault_path, "rb")
+        try:
+            self.header = ContainerHeader.read(self.file, VAULT_MAGIC)
+            if not self.header:
+                raise ValueError("不是有效的保险库文件")
+            file_size = os.fstat(self.file.fileno()).st_size
+            index_end = file_size - TRAILER_STRUCT.size
+            if index_end < len(self.header.packed):
+                raise ValueError("保险库文件不完整")
+            self.file.seek(index_end)
+            magic, self.data_chunks, self.index_offset = TRAILER_STRUCT.unpack(self.file.read(TRAILER_STRUCT.size))
+            if magic != TRAILER_MAGIC or not len(self.header.packed) <= self.index_offset <= index_end:
+                raise ValueError("保险库文件不完整")
+            self.key = KEY_CACHE.get(password, self.header.salt, self.header.iterations, self.header.key_length)
+            self.record_size = RECORD_STRUCT.size + self.header.chunk_size + TAG_SIZE
+            # 最近解密的数据分块，按偏移顺序提取相邻的小文件时每个分块只解密一次
+            self.cached_chunk = (None, b"")
+            self.entries = self.read_index(index_end)
+        except BaseException:
+            self.file.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.file.close()
+
+    def read_record(self, index, position):
+        """
+        读取并解密 position 处的记录
+        :return: (标志, 明文, 下一条记录的位置)
+        """
+        self.file.seek(position)
+        prefix = self.file.read(RECORD_STRUCT.size)
+        if len(prefix) < RECORD_STRUCT.size:
+            raise ValueError("保险库文件不完整")
+        flags, length = RECORD_STRUCT.unpack(prefix)
+        if length > self.header.chunk_size:
+            raise ValueError("保险库文件已损坏")
+        body = self.file.read(length + TAG_SIZE)
+        if len(body) < length + TAG_SIZE:
+            raise ValueError("保险库文件不完整")
+        plaintext = CryptoContainer.open_record(self.key, self.header, index, flags, body[:length], body[length:])
+        return flags, plaintext, position + RECORD_STRUCT.size + length + TAG_SIZE
+
+    def read_index(self, index_end):
+        """:return: [(相对路径, 大小, 修改时间ns, 数据流偏移)]"""
+        pieces = []
+        index = self.data_chunks
+        position = self.index_offset
+        while True:
+            flags, data, position = self.read_record(index, position)
+            if not flags & RECORD_INDEX:
+                raise ValueError("保险库文件已损坏")
+            pieces.append(data)
+            if flags & RECORD_FINAL:
+                break
+            index += 1
+        if position != index_end:
+            raise ValueError("保险库文件已损坏")
+        return [tuple(entry) for entry in json.loads(zlib.decompress(b"".join(pieces)).decode("utf-8"))]
+
+    def read_chunk(self, index):
+        if self.cached_chunk[0] == index:
+            return self.cached_chunk[1]
+        if index >= self.data_chunks:
+            raise ValueError("保险库文件已损坏")
+        flags, data, _ = self.read_record(index, len(self.header.packed) + index * self.record_size)
+        if flags or (index < self.data_chunks - 1 and len(data) != self.header.chunk_size):
+            raise ValueError("保险库文件已损坏")
+        self.cached_chunk = (index, data)
+        return data
+
+    def iter_range(self, offset, size):
+        """逐块生成数据流中 [offset, offset+size) 的明文"""
+        chunk_size = self.header.chunk_size
+        end = offset + size
+        while offset < end:
+            index, start = divmod(offset, chunk_size)
+            data = self.read_chunk(index)[start:start + end - offset]
+            if not data:
+                raise ValueError("保险库文件已损坏")
+            yield data
+            offset += len(data)
+
+    @staticmethod
+    def safe_path(dest, rel_path):
+        """把索引中的相对路径转换为目标目录下的路径，拒绝绝对路径和 .. 等越界路径"""
+        parts = rel_path.split("/")
+        if any(part in ("", ".", "..") or os.sep in part or (os.altsep and os.altsep in part) for part in parts) \
+                or os.path.isabs(rel_path) or os.path.splitdrive(rel_path)[0]:
+            raise ValueError(f"保险库中的路径不安全：{rel_path}")
+        return os.path.join(dest, *parts)
+
+    def extract(self, dest, entries=None, progress_callback=None, is_interrupted=None):
+        """
+        提取文件到目标目录，按数据流偏移顺序提取，整体是一次顺序读取；
+        每个文件写完后才替换目标位置的同名文件
+        :param entries: 要提取的索引项，为空时提取全部
+        :param progress_callback: 回调 (已提取文件数, 总文件数)
+        :param is_interrupted: 返回 True 时停止
+        :return: [(相对路径, 错误信息)]
+        """
+        entries = sorted(self.entries if entries is None else entries, key=lambda entry: entry[3])
+        errors = []
+        for done, (rel_path, size, mtime_ns, offset) in enumerate(entries, start=1):
+            if is_interrupted and is_interrupted():
+                break
+            try:
+                target = self.safe_path(dest, rel_path)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                # 先写临时文件，解密或认证失败时目标位置原有的文件保持不变
+                temp_path = target + TEMP_SUFFIX
+                try:
+                    with open(temp_path, "wb") as out:
+                        for data in self.iter_range(offset, size):
+                            out.write(data)
+                    os.utime(temp_path, ns=(mtime_ns, mtime_ns))
+                    FsUtil.commit_temp(temp_path, target)
+                except BaseException:
+                    FsUtil.remove_quietly(temp_path)
+                    raise
+            except (OSError, ValueError) as e:
+                logger.warning(f"提取文件失败：{rel_path}，{str(e)}")
+                errors.append((rel_path, str(e)))
+            if progress_callback:
+                progress_callback(done, len(entries))
+        return errors
@@ -0,0 +1,215 @@
+import hashlib
+import math
+import os
+
+import numpy as np
+
+# 差异分析的块大小范围，实际块大小约为文件大小的平方根
+DELTA_MIN_BLOCK_SIZE = 4 * 1024
+DELTA_MAX_BLOCK_SIZE = 1024 * 1024
+# 滚动校验和每次向量化处理的窗口起点数量
+ROLLING_CHUNK_SIZE = 4 * 1024 * 1024
+# 候选筛选位图按弱校验和的低 22 位索引
+WEAK_FILTER_BITS = 22
+
+
+class DeltaUtil:
+    """
+    rsync 风格的块级差异分析
+    以文件1为基准按固定块计算弱校验和与强哈希，在文件2的每个偏移上用滚动弱校验和寻找候选块，
+    强哈希确认后视为匹配；文件2中未被匹配覆盖的区间即为差异区间
+    """
+
+    @staticmethod
+    def choose_block_size(file_size):
+        """按文件大小的平方根选取 2 的幂作为块大小"""
+        if file_size <= 0:
+            return DELTA_MIN_BLOCK_SIZE
+        block_size = 1 << round(math.log2(math.sqrt(file_size)))
+        return min(max(block_size, DELTA_MIN_BLOCK_SIZE), DELTA_MAX_BLOCK_SIZE)
+
+    @staticmethod
+    def strong_hash(data):
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+    @staticmethod
+    def block_weak_checksums(blocks):
+        """
+        计算若干完整块的 rsync 弱校验和
+        :param blocks: 形状为 (块数, 块大小) 的 uint8 数组
+        :return: uint32 数组，低 16 位为 a，高 16 位为 b
+        """
+        block_size = blocks.shape[1]
+        a = blocks.sum(axis=1, dtype=np.int64)
+        # 权重为 块大小-j，结果不超过 2^53，用浮点矩阵乘法精确且快
+        weights = np.arange(block_size, 0, -1, dtype=np.float64)
+        b = (blocks.astype(np.float64) @ weights).astype(np.int64)
+        return ((a & 0xFFFF) | ((b & 0xFFFF) << 16)).astype(np.uint32)
+
+    @staticmethod
+    def rolling_weak_checksums(data, block_size):
+        """
+        用前缀和一次性计算每个偏移上长度为 block_size 的窗口的弱校验和，
+        与逐字节滚动更新的结果相同
+        :param data: uint8 数组
+        :return: 长度为 len(data)-block_size+1 的 uint32 数组
+        """
+        count = len(data) - block_size + 1
+        if count <= 0:
+            return np.empty(0, dtype=np.uint32)
+        # a、b 只保留低 16 位，直接用 uint16 的溢出回绕做模运算，内存带宽减半
+        positions = np.arange(len(data), dtype=np.uint16)
+        prefix = np.zeros(len(data) + 1, dtype=np.uint16)
+        np.cumsum(data, dtype=np.uint16, out=prefix[1:])
+        weighted = np.zeros(len(data) + 1, dtype=np.uint16)
+        np.cumsum(np.multiply(data, positions, dtype=np.uint16), dtype=np.uint16, out=weighted[1:])
+        a = prefix[block_size:] - prefix[:count]
+        # sum((block_size - j) * x[k + j]) = (block_size + k) * a - sum(i * x[i])
+        b = (positions[:count] + np.uint16(block_size & 0xFFFF)) * a - (weighted[block_size:] - weighted[:count])
+        return a.astype(np.uint32) | (b.astype(np.uint32) << 16)
+
+    @staticmethod
+    def read_range(file, offset, length):
+        file.seek(offset)
+        return np.frombuffer(file.read(length), dtype=np.uint8)
+
+    @staticmethod
+    def build_signature(file, file_size, block_size):
+        """
+        计算基准文件每个完整块的签名
+        :return: ({弱校验和: {强哈希: 块序号}}, (候选筛选位图, 排序后的弱校验和数组), [每块强哈希])
+        """
+        signature = {}
+        strong_hashes = []
+        blocks_per_read = max(1, ROLLING_CHUNK_SIZE // block_size)
+        full_blocks = file_size // block_size
+        for first in range(0, full_blocks, blocks_per_read):
+            count = min(blocks_per_read, full_blocks - first)
+            data = DeltaUtil.read_range(file, first * block_size, count * block_size)
+            weak_values = DeltaUtil.block_weak_checksums(data.reshape(count, block_size))
+            for i, weak in enumerate(weak_values.tolist()):
+                strong = DeltaUtil.strong_hash(data[i * block_size:(i + 1) * block_size])
+                strong_hashes.append(strong)
+                signature.setdefault(weak, {}).setdefault(strong, first + i)
+        weak_sorted = np.array(sorted(signature), dtype=np.uint32)
+        weak_filter = np.zeros(1 << WEAK_FILTER_BITS, dtype=bool)
+        weak_filter[weak_sorted & ((1 << WEAK_FILTER_BITS) - 1)] = True
+        return signature, (weak_filter, weak_sorted), strong_hashes
+
+    @staticmethod
+    def find_candidates(weak_values, weak_index):
+        """
+        找出弱校验和出现在签名中的窗口偏移：先用位图粗筛，再对少量候选做精确查找
+        """
+        weak_filter, weak_sorted = weak_index
+        candidates = np.flatnonzero(weak_filter[weak_values & ((1 << WEAK_FILTER_BITS) - 1)])
+        values = weak_values[candidates]
+        positions = np.minimum(np.searchsorted(weak_sorted, values), len(weak_sorted) - 1)
+        return candidates[weak_sorted[positions] == values]
+
+    @staticmethod
+    def search_range(file, start, end, block_size, signature, weak_index, matches):
+        """
+        在文件2的 [start, end) 区间内用滚动弱校验和寻找匹配块，匹配块互不重叠，
+        找到后从块尾继续搜索
+        :param matches: 结果列表，追加 (文件2中的偏移, 长度)
+        """
+        next_free = start
+        last_start = end - block_size
+        window_start = start
+        while window_start <= last_start:
+            window_end = min(window_start + ROLLING_CHUNK_SIZE, last_start + 1)
+            data = DeltaUtil.read_range(file, window_start, window_end - window_start + block_size - 1)
+            weak_values = DeltaUtil.rolling_weak_checksums(data, block_size)
+            candidates = DeltaUtil.find_candidates(weak_values, weak_index)
+            position = np.searchsorted(candidates, next_free - window_start)
+            while position < len(candidates):
+                offset = int(candidates[position])
+                block_index = signature[int(weak_values[offset])].get(
+                    DeltaUtil.strong_hash(data[offset:offset + block_size]))
+                if block_index is None:
+                    position += 1
+                    continue
+                matches.append((window_start + offset, block_size))
+                next_free = window_start + offset + block_size
+                position = np.searchsorted(candidates, next_free - window_start)
+            window_start = window_end
+
+    @staticmethod
+    def analyze(file1, file2, block_size=None):
+        """
+        分析文件2相对文件1的块级差异
+        先按对齐位置比较同序号块的强哈希，只在未匹配的区间内做滚动搜索，
+        就地修改的大文件通常只需顺序读两遍
+        :param file1: 基准文件
+        :param file2: 待分析文件
+        :param block_size: 块大小，为空时按文件大小自动选择
+        :return: {"block_size", "matched_blocks", "total_blocks", "match_percent",
+                  "diff_ranges": [(起始, 结束)], "diff_bytes"}，区间为文件2中的字节偏移，左闭右开
+        """
+        size1 = os.path.getsize(file1)
+        size2 = os.path.getsize(file2)
+        block_size = block_size or DeltaUtil.choose_block_size(max(size1, size2))
+
+        with open(file1, "rb") as f1, open(file2, "rb") as f2:
+            signature, weak_index, strong_hashes = DeltaUtil.build_signature(f1, size1, block_size)
+
+            # 对齐位置的快速比较
+            matches = []
+            f2.seek(0)
+            for index, strong in enumerate(strong_hashes):
+                data = f2.read(block_size)
+                if len(data) < block_size:
+                    break
+                if DeltaUtil.strong_hash(data) == strong:
+                    matches.append((index * block_size, block_size))
+
+            # 在未匹配的区间内滚动搜索（处理插入、删除造成的偏移）
+            if signature:
+                gaps = DeltaUtil.complement(matches, size2)
+                for gap_start, gap_end in gaps:
+                    DeltaUtil.search_range(f2, gap_start, gap_end, block_size, signature, weak_index, matches)
+
+            # 文件1末尾不足一块的部分只与文件2的末尾比较
+            tail = size1 % block_size
+            if tail and size2 >= tail:
+                f1.seek(size1 - tail)
+                f2.seek(size2 - tail)
+                overlapped = any(offset + length > size2 - tail for offset, length in matches)
+                if not overlapped and f1.read(tail) == f2.read(tail):
+                    matches.append((size2 - tail, tail))
+
+        diff_ranges = DeltaUtil.complement(matches, size2)
+        total_blocks = -(-size2 // block_size)
+        matched_blocks = len(matches)
+        if total_blocks:
+            match_percent = min(100.0, matched_blocks * 100.0 / total_blocks)
+        else:
+            match_percent = 100.0 if size1 == 0 else 0.0
+        return {
+            "block_size": block_size,
+            "matched_blocks": matched_blocks,
+            "total_blocks": total_blocks,
+            "match_percent": match_percent,
+            "diff_ranges": diff_ranges,
+            "diff_bytes": sum(end - start for start, end in diff_ranges),
+        }
+
+    @staticmethod
+    def complement(matches, size, start=0):
+        """
+        计算 [start, size) 中未被匹配块覆盖的区间
+        :param matches: [(偏移, 长度)]
+        :return: 合并后的 [(起始, 结束)]
+        """
+        gaps = []
+        position = start
+        for offset, length in sorted(matches):
+            if offset + length <= position:
+                continue
+            if offset > position:
+                gaps.append((position, offset))
+            position = max(position, offset + length)
+        if position < size:
+            gaps.append((position, size))
+        return gaps
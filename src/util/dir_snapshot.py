@@ -0,0 +1,218 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from loguru import logger
+
+from src.util.hash_util import HashUtil, IO_MODE_READINTO, DEFAULT_BLOCK_SIZE, hash_file_worker
+from src.util.sqlite_helper import SQLiteHelper
+
+SNAPSHOT_SUFFIX = ".fssnap"
+SNAPSHOT_HASH_TYPE = "SHA256"
+
+
+class DirSnapshot(SQLiteHelper):
+    """
+    目录快照：记录每个文件的相对路径、大小、修改时间和可选的 SHA256 摘要，保存为单个 SQLite 文件。
+    路径统一用 "/" 分隔，在其他系统上生成的快照也能直接比较。
+    再次保存到同一快照时只重新计算大小或修改时间变化的文件的摘要；
+    信任目录修改时间时，修改时间未变的目录直接复用上次的文件记录，不再逐个读取文件信息
+    """
+    VERSION = 1
+
+    def __init__(self, snapshot_path):
+        super().__init__(snapshot_path)
+        self.snapshot_path = snapshot_path
+        self.create_table("meta", {
+            "key": "TEXT PRIMARY KEY",
+            "value": "TEXT NOT NULL",
+        })
+        self.create_table("dirs", {
+            "path": "TEXT PRIMARY KEY",
+            "mtime_ns": "INTEGER NOT NULL",
+        })
+        self.create_table("files", {
+            "path": "TEXT PRIMARY KEY",
+            "size": "INTEGER NOT NULL",
+            "mtime_ns": "INTEGER NOT NULL",
+            "digest": "TEXT",
+        })
+
+    @staticmethod
+    def is_snapshot(path):
+        return bool(path) and path.lower().endswith(SNAPSHOT_SUFFIX) and os.path.isfile(path)
+
+    @staticmethod
+    def to_native(rel_path):
+        return rel_path.replace("/", os.sep) if os.sep != "/" else rel_path
+
+    def query(self, sql, params=()):
+        conn = None
+        try:
+            conn = self.db_pool.get_connection()
+            return conn.execute(sql, params).fetchall()
+        except Exception as e:
+            logger.warning(f"读取快照失败：{str(e)}")
+            return []
+        finally:
+            if conn is not None:
+                self.db_pool.release_connection(conn)
+
+    def read_meta(self):
+        """:return: {"root", "created", "hash_type", "version"}"""
+        return dict(self.query("SELECT key, value FROM meta"))
+
+    def load(self):
+        """
+        读取快照中的文件记录，路径转换为本机分隔符
+        :return: {相对路径: (大小, 修改时间ns, 摘要或 None)}
+        """
+        return {self.to_native(path): (size, mtime_ns, digest)
+                for path, size, mtime_ns, digest in self.query("SELECT path, size, mtime_ns, digest FROM files")}
+
+    def save(self, root, hash_type, dirs, files):
+        """
+        用新的记录整体替换快照内容
+        :param dirs: {"/" 分隔的相对目录: 修改时间ns}
+        :param files: {"/" 分隔的相对路径: (大小, 修改时间ns, 摘要或 None)}
+        """
+        conn = None
+        try:
+            conn = self.db_pool.get_connection()
+            conn.execute("DELETE FROM dirs")
+            conn.execute("DELETE FROM files")
+            conn.execute("DELETE FROM meta")
+            conn.executemany("INSERT INTO dirs (path, mtime_ns) VALUES (?, ?)", dirs.items())
+            conn.executemany("INSERT INTO files (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)",
+                             ((path, *record) for path, record in files.items()))
+            conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", [
+                ("root", os.path.abspath(root)),
+                ("created", str(time.time_ns())),
+                ("hash_type", hash_type or ""),
+                ("version", str(self.VERSION)),
+            ])
+            conn.commit()
+            conn.execute("VACUUM")
+        except Exception as e:
+            if conn is not None:
+                conn.rollback()
+            logger.warning(f"保存快照失败：{str(e)}")
+            raise
+        finally:
+            if conn is not None:
+                self.db_pool.release_connection(conn)
+
+    @staticmethod
+    def scan(root, previous_dirs, previous_files, trust_dir_mtime=False, is_interrupted=None):
+        """
+        遍历目录，尽量复用上一次快照的记录
+        :param previous_dirs: 上次的 {相对目录: 修改时间ns}
+        :param previous_files: 上次的 {相对路径: (大小, 修改时间ns, 摘要)}
+        :param trust_dir_mtime: 目录修改时间未变时直接复用该目录下的文件记录。
+                                目录修改时间只反映条目的增删改名，文件被原地改写时不会变化
+        :param is_interrupted: 返回 True 时停止遍历
+        :return: (dirs, files, 复用的目录数)，files 中的摘要仅在大小和修改时间都未变时保留
+        """
+        children = {}
+        if trust_dir_mtime:
+            for rel_dir in previous_dirs:
+                if rel_dir:
+                    children.setdefault(rel_dir.rpartition("/")[0], []).append(rel_dir)
+            files_by_dir = {}
+            for rel_path in previous_files:
+                files_by_dir.setdefault(rel_path.rpartition("/")[0], []).append(rel_path)
+
+        dirs = {}
+        files = {}
+        reused_dirs = 0
+        stack = [""]
+        while stack:
+            if is_interrupted and is_interrupted():
+                break
+            rel_dir = stack.pop()
+            directory = os.path.join(root, rel_dir) if rel_dir else root
+            try:
+                dir_mtime = os.stat(directory).st_mtime_ns
+            except OSError as e:
+                logger.warning(f"读取目录失败：{directory}，{str(e)}")
+                continue
+            dirs[rel_dir] = dir_mtime
+
+            if trust_dir_mtime and previous_dirs.get(rel_dir) == dir_mtime:
+                reused_dirs += 1
+                for rel_path in files_by_dir.get(rel_dir, []):
+                    files[rel_path] = previous_files[rel_path]
+                stack.extend(children.get(rel_dir, []))
+                continue
+
+            prefix = rel_dir + "/" if rel_dir else ""
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        rel_path = prefix + entry.name
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(rel_path)
+                            elif entry.is_file(follow_symlinks=False):
+                                stat = entry.stat(follow_symlinks=False)
+                                previous = previous_files.get(rel_path)
+                                digest = previous[2] if previous and previous[:2] == (
+                                    stat.st_size, stat.st_mtime_ns) else None
+                                files[rel_path] = (stat.st_size, stat.st_mtime_ns, digest)
+                        except OSError as e:
+                            logger.warning(f"读取文件信息失败：{entry.path}，{str(e)}")
+            except OSError as e:
+                logger.warning(f"读取目录失败：{directory}，{str(e)}")
+        return dirs, files, reused_dirs
+
+    def capture(self, root, with_digest=False, trust_dir_mtime=False, workers=None,
+                io_mode=IO_MODE_READINTO, block_size=DEFAULT_BLOCK_SIZE,
+                progress_callback=None, is_interrupted=None):
+        """
+        生成或增量刷新快照；快照原来记录的是同一目录时复用其中的记录
+        :param with_digest: 是否记录 SHA256 摘要
+        :param trust_dir_mtime: 见 scan
+        :param workers: 计算摘要的进程数，为空时等于 CPU 核心数
+        :param progress_callback: 计算摘要时回调 (已完成数, 总数)
+        :param is_interrupted: 返回 True 时停止，快照保持原样
+        :return: {"files", "dirs", "reused_dirs", "hashed"}，被中断时返回 None
+        """
+        meta = self.read_meta()
+        if meta.get("root") == os.path.abspath(root):
+            previous_dirs = dict(self.query("SELECT path, mtime_ns FROM dirs"))
+            previous_files = {path: (size, mtime_ns, digest) for path, size, mtime_ns, digest in
+                              self.query("SELECT path, size, mtime_ns, digest FROM files")}
+        else:
+            previous_dirs, previous_files = {}, {}
+
+        dirs, files, reused_dirs = self.scan(root, previous_dirs, previous_files, trust_dir_mtime, is_interrupted)
+        if is_interrupted and is_interrupted():
+            return None
+
+        pending = [rel_path for rel_path, record in files.items() if record[2] is None] if with_digest else []
+        if pending:
+            def iter_jobs():
+                for rel_path in pending:
+                    if is_interrupted and is_interrupted():
+                        return
+                    yield os.path.join(root, rel_path), [SNAPSHOT_HASH_TYPE], io_mode, block_size
+
+            prefix_length = len(os.path.join(root, ""))
+            workers = workers or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for done, (file_path, hashes, error) in enumerate(
+                        HashUtil.imap_unordered(executor, hash_file_worker, iter_jobs(), workers), start=1):
+                    if error:
+                        logger.warning(f"计算快照摘要失败：{file_path}，{error}")
+                    else:
+                        rel_path = file_path[prefix_length:].replace(os.sep, "/")
+                        files[rel_path] = files[rel_path][:2] + (hashes[SNAPSHOT_HASH_TYPE],)
+                    if progress_callback:
+                        progress_callback(done, len(pending))
+            if is_interrupted and is_interrupted():
+                return None
+        elif not with_digest:
+            files = {rel_path: record[:2] + (None,) for rel_path, record in files.items()}
+
+        self.save(root, SNAPSHOT_HASH_TYPE if with_digest else "", dirs, files)
+        return {"files": len(files), "dirs": len(dirs), "reused_dirs": reused_dirs, "hashed": len(pending)}
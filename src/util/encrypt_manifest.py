@@ -0,0 +1,129 @@
+import hmac
+import os
+
+from loguru import logger
+
+from src.util.common_util import CommonUtil
+from src.util.crypto_container import ContainerHeader, KEY_CACHE, key_check_value
+from src.util.sqlite_helper import SQLiteHelper
+
+
+class EncryptManifest(SQLiteHelper):
+    """
+    加密清单：记录每个源文件加密时的大小、修改时间、SHA256 摘要，生成的 .enc 文件的大小和修改时间，以及密钥校验值。
+    再次加密同一目录时，源文件与清单一致、.enc 文件未被改动且由当前密码和密钥长度生成的视为未变化，不再重新加密
+    """
+    TABLE_NAME = "encrypt_manifest"
+    DIGEST_TYPE = "SHA256"
+
+    def __init__(self, db_name=None):
+        super().__init__(db_name or CommonUtil.get_sqlite_path())
+        self.create_table(self.TABLE_NAME, {
+            "path": "TEXT PRIMARY KEY",
+            "size": "INTEGER NOT NULL",
+            "mtime_ns": "INTEGER NOT NULL",
+            "digest": "TEXT NOT NULL",
+            "enc_size": "INTEGER NOT NULL",
+            "enc_mtime_ns": "INTEGER NOT NULL",
+            "key_check": "TEXT NOT NULL DEFAULT ''",
+        })
+        self.add_key_check_column()
+
+    def add_key_check_column(self):
+        """旧版本的清单没有密钥校验值，补上该列；这些记录的校验值为空，下次加密时都会重新加密"""
+        conn = None
+        try:
+            conn = self.db_pool.get_connection()
+            columns = [row[1] for row in conn.execute(f"PRAGMA table_info({self.TABLE_NAME})").fetchall()]
+            if "key_check" not in columns:
+                conn.execute(f"ALTER TABLE {self.TABLE_NAME} ADD COLUMN key_check TEXT NOT NULL DEFAULT ''")
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"升级加密清单失败：{str(e)}")
+        finally:
+            if conn is not None:
+                self.db_pool.release_connection(conn)
+
+    def load(self, folder_path):
+        """
+        读取目录下所有文件的清单记录
+        :return: {源文件绝对路径: (大小, 修改时间ns, 摘要, .enc 大小, .enc 修改时间ns, 密钥校验值)}
+        """
+        prefix = os.path.join(os.path.abspath(folder_path), "")
+        conn = None
+        try:
+            conn = self.db_pool.get_connection()
+            # 用范围查询代替 LIKE，路径中的 % 和 _ 不需要转义，也能使用主键索引
+            rows = conn.execute(
+                f"SELECT path, size, mtime_ns, digest, enc_size, enc_mtime_ns, key_check FROM {self.TABLE_NAME} "
+                f"WHERE path >= ? AND path < ?", (prefix, prefix + "\U0010ffff")).fetchall()
+            return {path: tuple(record) for path, *record in rows}
+        except Exception as e:
+            logger.warning(f"读取加密清单失败：{str(e)}")
+            return {}
+        finally:
+            if conn is not None:
+                self.db_pool.release_connection(conn)
+
+    def store(self, records):
+        """
+        写入一批清单记录
+        :param records: [(源文件绝对路径, (大小, 修改时间ns, 摘要, .enc 大小, .enc 修改时间ns, 密钥校验值))]
+        """
+        if not records:
+            return
+        conn = None
+        try:
+            conn = self.db_pool.get_connection()
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {self.TABLE_NAME} "
+                f"(path, size, mtime_ns, digest, enc_size, enc_mtime_ns, key_check) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(path, *record) for path, record in records])
+            conn.commit()
+        except Exception as e:
+            logger.warning(f"写入加密清单失败：{str(e)}")
+        finally:
+            if conn is not None:
+                self.db_pool.release_connection(conn)
+
+    @staticmethod
+    def check(file_path, file_size, file_mtime_ns, record, password, key_length):
+        """
+        对照清单判断源文件是否需要重新加密
+        :param record: load 返回的记录，没有时为 None
+        :param password: 本次加密的密码
+        :param key_length: 本次加密的密钥字节数
+        :return: "unchanged"：大小和修改时间都未变；"verify"：大小相同但修改时间变了，需要比较摘要；
+                 "changed"：没有记录、.enc 文件缺失或被改动、大小不同、或 .enc 不是用当前密码和密钥长度生成的
+        """
+        if not record:
+            return "changed"
+        size, mtime_ns, _, enc_size, enc_mtime_ns, key_check = record
+        enc_path = file_path + ".enc"
+        try:
+            enc_stat = os.stat(enc_path)
+        except OSError:
+            return "changed"
+        if (enc_stat.st_size, enc_stat.st_mtime_ns) != (enc_size, enc_mtime_ns) or file_size != size:
+            return "changed"
+        if not EncryptManifest.key_matches(enc_path, key_check, password, key_length):
+            return "changed"
+        return "unchanged" if file_mtime_ns == mtime_ns else "verify"
+
+    @staticmethod
+    def key_matches(enc_path, key_check, password, key_length):
+        """
+        .enc 文件是否由当前密码和密钥长度生成：按文件头中的盐和迭代次数派生密钥，与清单中的校验值比较。
+        同一次加密的文件共用一个盐，密钥只派生一次
+        """
+        if not key_check:
+            return False
+        try:
+            with open(enc_path, "rb") as file:
+                header = ContainerHeader.read(file)
+        except (OSError, ValueError):
+            return False
+        if not header or header.key_length != key_length:
+            return False
+        key = KEY_CACHE.get(password, header.salt, header.iterations, header.key_length)
+        return hmac.compare_digest(key_check_value(key), key_check)
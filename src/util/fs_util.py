@@ -0,0 +1,37 @@
+import os
+
+
+class FsUtil:
+    """
+    与业务无关的文件系统辅助方法：临时文件改名提交、同步目录到磁盘
+    """
+
+    @staticmethod
+    def commit_temp(temp_path, dst_path, durable=False):
+        """临时文件改名为目标文件，改名是原子的，目标文件要么是旧内容要么是完整的新内容"""
+        os.replace(temp_path, dst_path)
+        if durable:
+            FsUtil.fsync_directory(os.path.dirname(os.path.abspath(dst_path)))
+
+    @staticmethod
+    def fsync_directory(path):
+        """同步目录项，使改名和删除持久化；Windows 不支持打开目录，由文件系统自行保证"""
+        if os.name == "nt":
+            return
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def remove_quietly(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
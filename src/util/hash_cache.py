@@ -0,0 +1,226 @@
+import os
+import threading
+import time
+
+from loguru import logger
+
+from src.util.common_util import CommonUtil
+from src.util.sqlite_helper import SQLiteHelper
+
+
+class HashCache(SQLiteHelper):
+    """
+    持久化的文件哈希缓存
+    以 (路径, 大小, 修改时间, inode, 算法) 判断文件是否变化，未变化时直接复用摘要，
+    超过容量上限后按最近访问时间淘汰（LRU）
+    """
+    TABLE_NAME = "hash_cache"
+    MAX_ENTRIES = 200000
+    # 每写入多少条检查一次容量
+    TRIM_INTERVAL = 256
+
+    def __init__(self, db_name=None, max_entries=MAX_ENTRIES):
+        super().__init__(db_name or CommonUtil.get_sqlite_path())
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.writes_since_trim = 0
+        self.stats_lock = threading.Lock()
+        self.create_table(self.TABLE_NAME, {
+            "path": "TEXT NOT NULL",
+            "algorithm": "TEXT NOT NULL",
+            "size": "INTEGER NOT NULL",
+            "mtime_ns": "INTEGER NOT NULL",
+            "inode": "INTEGER NOT NULL",
+            "digest": "TEXT NOT NULL",
+            "last_access": "INTEGER NOT NULL",
+            "PRIMARY KEY": "(path, algorithm)",
+        })
+        self.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.TABLE_NAME}_last_access "
+                     f"ON {self.TABLE_NAME} (last_access)")
+
+    @staticmethod
+    def file_key(file_path):
+        """
+        读取文件的缓存键，必须在读取文件内容之前获取，
+        这样计算过程中文件被修改时，写入的旧键不会在下次命中
+        :return: (绝对路径, 大小, 修改时间ns, inode)
+        """
+        stat = os.stat(file_path)
+        return os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+    def execute(self, sql, params=()):
+        conn = None
+        try:
+            conn = self.db_pool.get_connection()
+            conn.execute(sql, params)
+            conn.commit()
+        except Exception as e:
+            logger.warning(f"执行SQL失败：{str(e)}")
+        finally:
+            if conn is not None:
+                self.db_pool.release_connection(conn)
+
+    def lookup(self, key, hash_types):
+        """
+        查询缓存
+        :param key: file_key 返回的缓存键
+        :param hash_types: 哈希类型列表
+        :return: {哈希类型: 摘要}，只包含命中的类型
+        """
+        path, size, mtime_ns, inode = key
+        found = {}
+        conn = None
+        try:
+            conn = self.db_pool.get_connection()
+            placeholders = ", ".join(["?" for _ in hash_types])
+            rows = conn.execute(
+                f"SELECT algorithm, digest FROM {self.TABLE_NAME} "
+                f"WHERE path = ? AND size = ? AND mtime_ns = ? AND inode = ? AND algorithm IN ({placeholders})",
+                (path, size, mtime_ns, inode, *hash_types)).fetchall()
+            found = dict(rows)
+            if found:
+                conn.execute(
+                    f"UPDATE {self.TABLE_NAME} SET last_access = ? WHERE path = ? AND algorithm IN ({placeholders})",
+                    (time.time_ns(), path, *found.keys()))
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"查询哈希缓存失败：{str(e)}")
+        finally:
+            if conn is not None:
+                self.db_pool.release_connection(conn)
+
+        with self.stats_lock:
+            self.hits += len(found)
+            self.misses += len(hash_types) - len(found)
+        return found
+
+    def store(self, key, hashes):
+        """
+        写入缓存
+        :param key: 计算前通过 file_key 获取的缓存键
+        :param hashes: {哈希类型: 摘要}
+        """
+        if not hashes:
+            return
+        path, size, mtime_ns, inode = key
+        now = time.time_ns()
+        conn = None
+        try:
+            conn = self.db_pool.get_connection()
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {self.TABLE_NAME} "
+                f"(path, algorithm, size, mtime_ns, inode, digest, last_access) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(path, hash_type, size, mtime_ns, inode, digest, now) for hash_type, digest in hashes.items()])
+            conn.commit()
+        except Exception as e:
+            logger.warning(f"写入哈希缓存失败：{str(e)}")
+        finally:
+            if conn is not None:
+                self.db_pool.release_connection(conn)
+
+        with self.stats_lock:
+            self.writes_since_trim += len(hashes)
+            need_trim = self.writes_since_trim >= self.TRIM_INTERVAL
+            if need_trim:
+                self.writes_since_trim = 0
+        if need_trim:
+            self.trim()
+
+    def trim(self):
+        """按最近访问时间淘汰超出容量上限的记录"""
+        self.execute(
+            f"DELETE FROM {self.TABLE_NAME} WHERE rowid IN ("
+            f"SELECT rowid FROM {self.TABLE_NAME} ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,))
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats_text(self):
+        return f"缓存命中: {self.hits}，未命中: {self.misses}"
+
+
+class TreeHashCheckpoint(SQLiteHelper):
+    """
+    树哈希的分块检查点
+    每完成一个分块就记录其摘要，中断后再次计算时跳过已完成的分块；
+    文件的大小、修改时间或 inode 变化后旧检查点自动作废
+    """
+    TABLE_NAME = "tree_hash_chunk"
+
+    def __init__(self, db_name=None):
+        super().__init__(db_name or CommonUtil.get_sqlite_path())
+        self.create_table(self.TABLE_NAME, {
+            "path": "TEXT NOT NULL",
+            "chunk_size": "INTEGER NOT NULL",
+            "chunk_index": "INTEGER NOT NULL",
+            "size": "INTEGER NOT NULL",
+            "mtime_ns": "INTEGER NOT NULL",
+            "inode": "INTEGER NOT NULL",
+            "digest": "BLOB NOT NULL",
+            "PRIMARY KEY": "(path, chunk_size, chunk_index)",
+        })
+
+    def load(self, key, chunk_size):
+        """
+        读取已完成的分块，同时清除与当前文件状态不符的旧检查点
+        :param key: HashCache.file_key 返回的缓存键
+        :param chunk_size: 分块大小
+        :return: {分块序号: 摘要}
+        """
+        path, size, mtime_ns, inode = key
+        conn = None
+        try:
+            conn = self.db_pool.get_connection()
+            conn.execute(
+                f"DELETE FROM {self.TABLE_NAME} WHERE path = ? AND NOT (size = ? AND mtime_ns = ? AND inode = ?)",
+                (path, size, mtime_ns, inode))
+            conn.commit()
+            rows = conn.execute(
+                f"SELECT chunk_index, digest FROM {self.TABLE_NAME} WHERE path = ? AND chunk_size = ?",
+                (path, chunk_size)).fetchall()
+            return {index: bytes(digest) for index, digest in rows}
+        except Exception as e:
+            logger.warning(f"读取树哈希检查点失败：{str(e)}")
+            return {}
+        finally:
+            if conn is not None:
+                self.db_pool.release_connection(conn)
+
+    def save(self, key, chunk_size, chunks):
+        """
+        保存一批已完成的分块
+        :param chunks: [(分块序号, 摘要)]
+        """
+        if not chunks:
+            return
+        path, size, mtime_ns, inode = key
+        conn = None
+        try:
+            conn = self.db_pool.get_connection()
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {self.TABLE_NAME} "
+                f"(path, chunk_size, chunk_index, size, mtime_ns, inode, digest) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(path, chunk_size, index, size, mtime_ns, inode, digest) for index, digest in chunks])
+            conn.commit()
+        except Exception as e:
+            logger.warning(f"保存树哈希检查点失败：{str(e)}")
+        finally:
+            if conn is not None:
+                self.db_pool.release_connection(conn)
+
+    def clear(self, key):
+        """计算完成后删除该文件的检查点"""
+        conn = None
+        try:
+            conn = self.db_pool.get_connection()
+            conn.execute(f"DELETE FROM {self.TABLE_NAME} WHERE path = ?", (key[0],))
+            conn.commit()
+        except Exception as e:
+            logger.warning(f"删除树哈希检查点失败：{str(e)}")
+        finally:
+            if conn is not None:
+                self.db_pool.release_connection(conn)
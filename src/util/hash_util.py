@@ -0,0 +1,409 @@
+import hashlib
+import mmap
+import os
+import queue
+import threading
+import time
+import zlib
+from concurrent.futures import FIRST_COMPLETED, wait
+
+# 快速指纹：只采样文件大小、头尾和内部若干位置，作为完整摘要之前的廉价筛选
+QUICK_HASH_NAME = "QUICK"
+QUICK_SAMPLE_SIZE = 64 * 1024
+QUICK_INTERIOR_SAMPLES = 6
+# 支持的哈希类型（界面显示顺序）
+HASH_TYPES = ["MD5", "SHA1", "SHA256", "CRC32", QUICK_HASH_NAME]
+# 读取方式：read 每块分配新对象，readinto 复用预分配缓冲区，mmap 内存映射零拷贝
+IO_MODE_READ = "read"
+IO_MODE_READINTO = "readinto"
+IO_MODE_MMAP = "mmap"
+IO_MODES = [IO_MODE_READINTO, IO_MODE_MMAP, IO_MODE_READ]
+# 可选的读取块大小（MB）
+BLOCK_SIZES_MB = [1, 2, 4, 8]
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024
+# 流水线模式的缓冲区数量
+PIPELINE_DEPTH = 4
+# 树哈希的分块大小
+TREE_CHUNK_SIZE = 64 * 1024 * 1024
+TREE_HASH_NAME = "TREE-SHA256"
+# 清单（sha256sum/md5sum 格式）中摘要长度与算法的对应关系
+MANIFEST_HASH_TYPES = {32: "MD5", 40: "SHA1", 64: "SHA256"}
+
+
+class Crc32Hasher:
+    """
+    为 zlib.crc32 提供与 hashlib 对象一致的 update/hexdigest 接口
+    """
+    def __init__(self):
+        self.value = 0
+
+    def update(self, data):
+        self.value = zlib.crc32(data, self.value)
+
+    def hexdigest(self):
+        return format(self.value & 0xFFFFFFFF, "08x").upper()
+
+
+class HashUtil:
+
+    # 根据哈希类型创建哈希对象
+    @staticmethod
+    def new_hasher(hash_type):
+        if hash_type == "MD5":
+            return hashlib.md5()
+        if hash_type == "SHA1":
+            return hashlib.sha1()
+        if hash_type == "SHA256":
+            return hashlib.sha256()
+        if hash_type == "CRC32":
+            return Crc32Hasher()
+        raise ValueError(f"不支持的哈希类型：{hash_type}")
+
+    # 计算单个文件的哈希值
+    @staticmethod
+    def hash_file(file_path, hash_types, io_mode=IO_MODE_READINTO, block_size=DEFAULT_BLOCK_SIZE):
+        """
+        顺序读取文件并计算所选的哈希值
+        :param file_path: 文件路径
+        :param hash_types: 哈希类型列表，如 ["MD5", "SHA256"]
+        :param io_mode: 读取方式，见 IO_MODES
+        :param block_size: 读取块大小
+        :return: {哈希类型: 十六进制结果}
+        """
+        results, hash_types = HashUtil.split_quick_fingerprint(file_path, hash_types)
+        if not hash_types:
+            return results
+        hashers = {hash_type: HashUtil.new_hasher(hash_type) for hash_type in hash_types}
+        updaters = [hasher.update for hasher in hashers.values()]
+        for block in HashUtil.iter_blocks(file_path, io_mode, block_size):
+            for update in updaters:
+                update(block)
+        results.update({hash_type: hasher.hexdigest() for hash_type, hasher in hashers.items()})
+        return results
+
+    # 快速指纹不需要完整读取文件，从类型列表中单独计算
+    @staticmethod
+    def split_quick_fingerprint(file_path, hash_types):
+        """
+        :return: (已计算的结果, 其余需要完整读取文件的哈希类型)
+        """
+        if QUICK_HASH_NAME not in hash_types:
+            return {}, hash_types
+        remaining_types = [hash_type for hash_type in hash_types if hash_type != QUICK_HASH_NAME]
+        return {QUICK_HASH_NAME: HashUtil.quick_fingerprint(file_path)}, remaining_types
+
+    # 计算快速指纹
+    @staticmethod
+    def quick_fingerprint(file_path, sample_size=QUICK_SAMPLE_SIZE, interior_samples=QUICK_INTERIOR_SAMPLES):
+        """
+        对文件大小、开头和结尾各 sample_size 字节以及均匀分布的内部采样计算 BLAKE2b，
+        文件不超过采样总量时读取整个文件。
+        指纹不同说明文件一定不同；指纹相同只说明很可能相同，除非文件已被完整采样
+        :return: 32 位十六进制
+        """
+        with open(file_path, "rb") as f:
+            file_size = os.fstat(f.fileno()).st_size
+            hasher = hashlib.blake2b(file_size.to_bytes(8, "little"), digest_size=16)
+            sample_count = interior_samples + 2
+            if HashUtil.is_fully_sampled(file_size, sample_size, interior_samples):
+                while chunk := f.read(DEFAULT_BLOCK_SIZE):
+                    hasher.update(chunk)
+            else:
+                for index in range(sample_count):
+                    f.seek((file_size - sample_size) * index // (sample_count - 1))
+                    hasher.update(f.read(sample_size))
+        return hasher.hexdigest()
+
+    # 快速指纹是否覆盖了整个文件
+    @staticmethod
+    def is_fully_sampled(file_size, sample_size=QUICK_SAMPLE_SIZE, interior_samples=QUICK_INTERIOR_SAMPLES):
+        return file_size <= sample_size * (interior_samples + 2)
+
+    # 按指定方式逐块读取文件
+    @staticmethod
+    def iter_blocks(file_path, io_mode=IO_MODE_READINTO, block_size=DEFAULT_BLOCK_SIZE, buffer_count=1):
+        """
+        按指定的读取方式逐块产出文件内容
+        readinto 模式在 buffer_count 个预分配缓冲区间轮换，调用方最多只能同时持有
+        buffer_count 块，更早的块会被后续读取覆盖
+        :param file_path: 文件路径
+        :param io_mode: 读取方式，见 IO_MODES
+        :param block_size: 读取块大小
+        :param buffer_count: readinto 模式的缓冲区数量
+        :return: bytes 或 memoryview 的生成器
+        """
+        with open(file_path, "rb") as f:
+            if io_mode == IO_MODE_MMAP:
+                file_size = os.fstat(f.fileno()).st_size
+                if file_size == 0:
+                    return
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                view = memoryview(mapped)
+                try:
+                    for offset in range(0, file_size, block_size):
+                        yield view[offset:offset + block_size]
+                finally:
+                    view.release()
+                    try:
+                        mapped.close()
+                    except BufferError:
+                        # 调用方仍持有切片，映射在切片释放后由垃圾回收关闭
+                        pass
+            elif io_mode == IO_MODE_READINTO:
+                buffers = [bytearray(block_size) for _ in range(buffer_count)]
+                views = [memoryview(buffer) for buffer in buffers]
+                index = 0
+                while length := f.readinto(buffers[index]):
+                    yield views[index][:length]
+                    index = (index + 1) % buffer_count
+            else:
+                while chunk := f.read(block_size):
+                    yield chunk
+
+    # 流水线方式计算单个文件的多种哈希
+    @staticmethod
+    def hash_file_pipeline(file_path, hash_types, progress_callback=None, io_mode=IO_MODE_READINTO,
+                           block_size=DEFAULT_BLOCK_SIZE, depth=PIPELINE_DEPTH):
+        """
+        一个读取线程把数据填入可复用的缓冲区，每种算法一个摘要线程并行消费。
+        hashlib 和 zlib.crc32 处理大块数据时会释放 GIL，总耗时接近最慢的单个算法。
+        :param file_path: 文件路径
+        :param hash_types: 哈希类型列表
+        :param progress_callback: 进度回调 callback(已处理字节数, 文件总字节数)
+        :param io_mode: 读取方式，见 IO_MODES
+        :param block_size: 每个缓冲区的大小
+        :param depth: 缓冲区数量，决定读取线程最多领先摘要线程多少块
+        :return: {哈希类型: 十六进制结果}
+        """
+        results, hash_types = HashUtil.split_quick_fingerprint(file_path, hash_types)
+        if not hash_types:
+            return results
+        hashers = {hash_type: HashUtil.new_hasher(hash_type) for hash_type in hash_types}
+        # 读取线程每取一块占用一个名额，所有摘要线程处理完该块后归还。
+        # 各摘要线程按顺序处理，缓冲区也按顺序归还，因此 readinto 轮换覆盖的总是已处理完的块
+        free_slots = threading.Semaphore(depth)
+        digest_queues = [queue.Queue() for _ in hashers]
+        lock = threading.Lock()
+        errors = []
+
+        def release(pending):
+            with lock:
+                pending[0] -= 1
+                is_free = pending[0] == 0
+            if is_free:
+                free_slots.release()
+
+        def digest(hasher, digest_queue):
+            while (item := digest_queue.get()) is not None:
+                block, pending = item
+                try:
+                    if not errors:
+                        hasher.update(block)
+                except Exception as e:
+                    errors.append(e)
+                finally:
+                    release(pending)
+
+        threads = [threading.Thread(target=digest, args=(hasher, digest_queue), daemon=True)
+                   for hasher, digest_queue in zip(hashers.values(), digest_queues)]
+        for thread in threads:
+            thread.start()
+
+        blocks = HashUtil.iter_blocks(file_path, io_mode, block_size, buffer_count=depth)
+        try:
+            file_size = os.path.getsize(file_path)
+            processed_size = 0
+            while not errors:
+                free_slots.acquire()
+                block = next(blocks, None)
+                if block is None:
+                    break
+                pending = [len(digest_queues)]
+                for digest_queue in digest_queues:
+                    digest_queue.put((block, pending))
+
+                processed_size += len(block)
+                if progress_callback:
+                    progress_callback(processed_size, file_size)
+        finally:
+            for digest_queue in digest_queues:
+                digest_queue.put(None)
+            for thread in threads:
+                thread.join()
+            block = None
+            blocks.close()
+
+        if errors:
+            raise errors[0]
+        results.update({hash_type: hasher.hexdigest() for hash_type, hasher in hashers.items()})
+        return results
+
+    # 计算树哈希的单个分块
+    @staticmethod
+    def hash_tree_chunk(file_path, chunk_index, chunk_size=TREE_CHUNK_SIZE, block_size=DEFAULT_BLOCK_SIZE):
+        """
+        计算文件第 chunk_index 个分块的叶子摘要 SHA256(0x00 || 数据)，
+        每次调用独立打开文件，可在多个线程中并行执行
+        :return: (分块序号, 摘要 bytes)
+        """
+        hasher = hashlib.sha256(b"\x00")
+        buffer = bytearray(min(block_size, chunk_size))
+        view = memoryview(buffer)
+        remaining = chunk_size
+        with open(file_path, "rb") as f:
+            f.seek(chunk_index * chunk_size)
+            while remaining > 0:
+                length = f.readinto(view[:min(remaining, len(buffer))])
+                if not length:
+                    break
+                hasher.update(view[:length])
+                remaining -= length
+        return chunk_index, hasher.digest()
+
+    # 由叶子摘要计算 Merkle 根
+    @staticmethod
+    def merkle_root(leaves):
+        """
+        按 RFC 6962 的方式两两合并：内部节点为 SHA256(0x01 || 左 || 右)，
+        奇数个节点时最后一个直接提升到上一层，空文件的根为 SHA256("")
+        :param leaves: 按分块顺序排列的叶子摘要列表
+        :return: 十六进制的根摘要
+        """
+        if not leaves:
+            return hashlib.sha256().hexdigest()
+        level = list(leaves)
+        while len(level) > 1:
+            next_level = [hashlib.sha256(b"\x01" + level[i] + level[i + 1]).digest()
+                          for i in range(0, len(level) - 1, 2)]
+            if len(level) % 2:
+                next_level.append(level[-1])
+            level = next_level
+        return level[0].hex()
+
+    # 测试各读取方式的吞吐量
+    @staticmethod
+    def benchmark_io(file_path, hash_type="SHA256", block_size=DEFAULT_BLOCK_SIZE):
+        """
+        对同一文件依次用各读取方式计算一次哈希，返回吞吐量。
+        首先完整预读一遍，使各方式都在同样的页缓存状态下比较
+        :return: {读取方式: MB/s}
+        """
+        file_size = os.path.getsize(file_path)
+        HashUtil.hash_file(file_path, ["CRC32"], IO_MODE_READINTO, block_size)
+        results = {}
+        for io_mode in IO_MODES:
+            start_time = time.perf_counter()
+            HashUtil.hash_file(file_path, [hash_type], io_mode, block_size)
+            elapsed = max(time.perf_counter() - start_time, 1e-9)
+            results[io_mode] = file_size / 1024 / 1024 / elapsed
+        return results
+
+    # 生成清单中的一行
+    @staticmethod
+    def format_manifest_line(digest, relative_path):
+        """
+        生成与 sha256sum 兼容的一行：<摘要>  <相对路径>，路径统一使用 /，
+        含反斜杠或换行的路径按 GNU coreutils 的规则转义并在行首加反斜杠
+        """
+        relative_path = relative_path.replace(os.sep, "/")
+        if "\\" in relative_path or "\n" in relative_path or "\r" in relative_path:
+            escaped = relative_path.replace("\\", "\\\\").replace("\n", "\\n").replace("\r", "\\r")
+            return f"\\{digest}  {escaped}\n"
+        return f"{digest}  {relative_path}\n"
+
+    # 解析清单中的一行
+    @staticmethod
+    def parse_manifest_line(line):
+        """
+        解析 sha256sum/md5sum 格式的一行，兼容二进制标记 "<摘要> *<路径>"
+        :return: (小写摘要, 相对路径)，空行或注释返回 None，格式错误抛出 ValueError
+        """
+        line = line.rstrip("\r\n")
+        if not line.strip() or line.startswith("#"):
+            return None
+        escaped = line.startswith("\\")
+        if escaped:
+            line = line[1:]
+        digest, separator, relative_path = line.partition(" ")
+        if not separator or len(digest) not in MANIFEST_HASH_TYPES or not relative_path:
+            raise ValueError(f"无法解析的清单行：{line}")
+        if relative_path[0] in " *":
+            relative_path = relative_path[1:]
+        if escaped:
+            relative_path = (relative_path.replace("\\\\", "\0").replace("\\n", "\n")
+                             .replace("\\r", "\r").replace("\0", "\\"))
+        int(digest, 16)
+        return digest.lower(), relative_path
+
+    # 展开文件和目录
+    @staticmethod
+    def collect_files(paths):
+        """
+        将文件和目录（递归）展开为文件列表，保持输入顺序并去重
+        :param paths: 文件或目录路径列表
+        :return: 文件路径列表
+        """
+        files = []
+        seen = set()
+        for path in paths:
+            if os.path.isdir(path):
+                candidates = (os.path.join(root, name)
+                              for root, _, names in os.walk(path)
+                              for name in sorted(names))
+            elif os.path.isfile(path):
+                candidates = (path,)
+            else:
+                continue
+            for file_path in candidates:
+                if file_path not in seen:
+                    seen.add(file_path)
+                    files.append(file_path)
+        return files
+
+    # 有界窗口的并行执行
+    @staticmethod
+    def imap_unordered(executor, func, jobs, workers, window=None):
+        """
+        向执行器提交任务，同一时刻最多 window 个任务在途，按完成顺序产出结果，
+        避免一次性提交数十万个任务占满内存
+        :param executor: ThreadPoolExecutor 或 ProcessPoolExecutor
+        :param func: 任务函数，调用方式为 func(*job)
+        :param jobs: 参数元组的可迭代对象，可以是惰性的生成器
+        :param workers: 创建执行器时指定的工作数
+        :param window: 在途任务上限，默认为 workers 的 4 倍
+        """
+        if window is None:
+            window = max(1, workers * 4)
+        iterator = iter(jobs)
+        pending = set()
+        for job in iterator:
+            pending.add(executor.submit(func, *job))
+            if len(pending) >= window:
+                break
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+            for job in iterator:
+                pending.add(executor.submit(func, *job))
+                if len(pending) >= window:
+                    break
+
+
+def hash_file_worker(file_path, hash_types, io_mode=IO_MODE_READINTO, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    进程池工作函数，必须定义在模块顶层以便序列化
+    :return: (文件路径, 哈希结果, 错误信息)
+    """
+    try:
+        return file_path, HashUtil.hash_file(file_path, hash_types, io_mode, block_size), None
+    except Exception as e:
+        return file_path, {}, str(e)
+
+
+def hash_files_worker(file_paths, hash_types, io_mode=IO_MODE_READINTO, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    进程池工作函数，在同一个任务中依次计算多个文件
+    :return: [(文件路径, 哈希结果, 错误信息)]
+    """
+    return [hash_file_worker(file_path, hash_types, io_mode, block_size) for file_path in file_paths]